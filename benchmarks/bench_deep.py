@@ -0,0 +1,140 @@
+"""
+Benchmark of tree algorithms on very deep ASTs
+
+Builds path shaped trees (every node has a single child) of the given
+depth and reports time and peak memory (tracemalloc) of sexp and of the
+mapping of isomorphic subtrees (isomap) with explicit stacks and with
+the previous recursive implementations. The recursive versions run in a
+thread with a large stack and a raised recursion limit.
+Additionally, the complete diff of a long chained expression is timed.
+
+Usage:
+    python benchmarks/bench_deep.py [--depth 2000] [--terms 10000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_diff as cd
+
+from code_diff.ast            import default_create_node
+from code_diff.gumtree        import NodeMapping
+from code_diff.gumtree.isomap import _map_recursively
+
+
+def path_tree(depth):
+    node = default_create_node("leaf", [], text = "x")
+    for i in range(depth): node = default_create_node("node_%d" % (i % 7), [node])
+    return node
+
+
+def chain(num_terms, last = ""):
+    return "x = " + " + ".join("a%d" % i for i in range(num_terms)) + last + "\n"
+
+
+# Previous implementation (recursive) ------------------------------------
+
+def recursive_sexp(node):
+    name = node.text if node.text is not None else node.type
+
+    child_sexp = []
+    for child in node.children:
+        text = recursive_sexp(child)
+        text = ["  " + t for t in text.splitlines()]
+        child_sexp.append("\n".join(text))
+
+    if len(child_sexp) == 0:
+        return name
+
+    return "%s {\n%s\n}" % (name, " ".join(child_sexp))
+
+
+def recursive_map(mapping, source_node, target_node):
+    mapping.add(source_node, target_node)
+
+    for i, source_child in enumerate(source_node.children):
+        recursive_map(mapping, source_child, target_node.children[i])
+
+
+def run_deep(fn):
+    # Runs fn in a thread with enough stack for the recursive implementations
+    result = {}
+
+    def _run():
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(10 ** 6)
+        try:
+            result["value"] = fn()
+        finally:
+            sys.setrecursionlimit(limit)
+
+    threading.stack_size(512 * 1024 * 1024)
+    thread = threading.Thread(target = _run)
+    thread.start()
+    thread.join()
+    return result["value"]
+
+
+# Benchmark ----------------------------------------------------------------
+
+def measure(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = run_deep(fn)
+        best   = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    run_deep(fn)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak, result
+
+
+def report(name, elapsed, peak):
+    print("%-16s %8.3f s  %8.1f MB peak" % (name, elapsed, peak / (1024 * 1024)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depth", type = int, default = 2000)
+    parser.add_argument("--terms", type = int, default = 10000)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    source, target = path_tree(args.depth), path_tree(args.depth)
+    print("path trees: depth %d" % args.depth)
+
+    outputs = {}
+    for name, fn in [("sexp", lambda: source.sexp()), ("sexp recursive", lambda: recursive_sexp(source))]:
+        elapsed, peak, outputs[name] = measure(fn, args.repeat)
+        report(name, elapsed, peak)
+
+    assert outputs["sexp"] == outputs["sexp recursive"], "Outputs differ"
+
+    def _mapping(map_fn):
+        mapping = NodeMapping()
+        map_fn(mapping, source, target)
+        return list(mapping)
+
+    for name, map_fn in [("map", _map_recursively), ("map recursive", recursive_map)]:
+        elapsed, peak, outputs[name] = measure(lambda: _mapping(map_fn), args.repeat)
+        report(name, elapsed, peak)
+
+    assert outputs["map"] == outputs["map recursive"], "Mappings differ"
+
+    print("chained expression: %d terms" % args.terms)
+    source_code, target_code = chain(args.terms), chain(args.terms, " + b")
+
+    elapsed, peak, _ = measure(lambda: cd.difference(source_code, target_code, lang = "python").edit_script(), 1)
+    report("edit_script", elapsed, peak)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of subtree hash engines
+
+Recomputes the subtree hashes of a large AST bottom-up with each
+hash engine and reports the throughput as well as the number of
+distinct subtree hashes (as a sanity check for collisions).
+
+Usage:
+    python benchmarks/bench_hash.py [--lang python] [--lines 20000] [--repeat 3] [file]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_diff.ast     import parse_ast
+from code_diff.hashing import Mix64Hash, LegacyStringHash
+
+from bench_memory import synthetic_module
+
+
+def postorder(ast):
+    output = []
+    stack  = [ast]
+    while len(stack) > 0:
+        node = stack.pop()
+        output.append(node)
+        stack.extend(node.children)
+    return output[::-1]
+
+
+def rehash(nodes, engine):
+    hashes = {}
+    for node in nodes:
+        label = node.type if node.text is None else node.text
+        hashes[node] = engine(label, [hashes[c] for c in node.children])
+    return hashes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file", nargs = "?")
+    parser.add_argument("--lang", default = "python")
+    parser.add_argument("--lines", type = int, default = 20000)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "r") as f: source = f.read()
+    else:
+        source = synthetic_module(args.lines)
+
+    nodes = postorder(parse_ast(source, lang = args.lang))
+    print("Nodes: %d" % len(nodes))
+
+    for engine in [LegacyStringHash(), Mix64Hash()]:
+        timings = []
+        for _ in range(args.repeat):
+            start  = time.perf_counter()
+            hashes = rehash(nodes, engine)
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        print("%-12s %8.3fs %12.0f nodes/s %10d distinct hashes" % (
+            engine.name, best, len(nodes) / best, len(set(hashes.values()))
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark of the top-down phase of gumtree_isomap on large files
+
+Generates a flat Python file with many small statements (most nodes
+have a height of 1 to 3) and a copy with a few changed statements.
+Reports the time of gumtree_isomap with hash buckets and of the
+previous implementation which compared all pairs of each height level
+(the candidate selection is shared by both). Both mappings are checked
+to be identical.
+
+Usage:
+    python benchmarks/bench_isomap.py [--statements 6000] [--changes 20] [--repeat 3]
+"""
+import argparse
+import heapq
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_diff as cd
+
+from code_diff.gumtree.isomap import (gumtree_isomap, NodeMapping, NodeMultiMapping, create_default_heuristic,
+                                        _select_candidates, _index_iso_nodes, _map_recursively)
+
+
+def generate_pair(num_statements, num_changes, seed = 0):
+    rng = random.Random(seed)
+
+    templates = [
+        "x{0} = y{1} + {2}",
+        "self.a{0} = a{0}",
+        "call{1}(x{0}, {2})",
+        "items{0}[{2}] = value{1}",
+    ]
+
+    lines = [rng.choice(templates).format(rng.randrange(500), rng.randrange(50), rng.randrange(10))
+                for _ in range(num_statements)]
+
+    changed = list(lines)
+    for _ in range(num_changes):
+        changed[rng.randrange(len(changed))] = "changed%d = %d" % (rng.randrange(10), rng.randrange(10))
+
+    return "\n".join(lines) + "\n", "\n".join(changed) + "\n"
+
+
+# Previous implementation (pairwise comparison per height level) ---------------
+
+class _LegacyHeap:
+
+    def __init__(self, start_node):
+        self._heap = []
+        self.element_count = 0
+        self.push(start_node)
+
+    def push(self, x, seed = 0):
+        heapq.heappush(self._heap, (-x.subtree_height, x.subtree_hash, self.element_count, seed, x))
+        self.element_count += 1
+
+    def max(self):
+        if len(self._heap) == 0: return 0
+        return -self._heap[0][0]
+
+    def pop(self):
+        current_head = self.max()
+        while len(self._heap) > 0 and self.max() == current_head:
+            yield heapq.heappop(self._heap)[-1]
+
+
+def _legacy_open(heap, node):
+    for n, child in enumerate(node.children): heap.push(child, seed = n)
+
+
+def legacy_isomap(source_ast, target_ast, min_height = 1):
+    isomorphic_mapping, candidate_mapping = NodeMapping(), NodeMultiMapping()
+    source_index, target_index = _index_iso_nodes(source_ast), _index_iso_nodes(target_ast)
+    source_open, target_open = _LegacyHeap(source_ast), _LegacyHeap(target_ast)
+
+    while max(source_open.max(), target_open.max()) > min_height:
+        if source_open.max() > target_open.max():
+            for c in list(source_open.pop()): _legacy_open(source_open, c)
+            continue
+
+        if source_open.max() < target_open.max():
+            for c in list(target_open.pop()): _legacy_open(target_open, c)
+            continue
+
+        source_candidates, target_candidates = list(source_open.pop()), list(target_open.pop())
+
+        for source_node, target_node in itertools.product(source_candidates, target_candidates):
+            if source_node.isomorph(target_node):
+                if source_index[source_node] > 1 or target_index[target_node] > 1:
+                    candidate_mapping.add(source_node, target_node)
+                else:
+                    _map_recursively(isomorphic_mapping, source_node, target_node)
+
+        for source_node in source_candidates:
+            if (source_node, None) not in isomorphic_mapping and (source_node, None) not in candidate_mapping:
+                _legacy_open(source_open, source_node)
+
+        for target_node in target_candidates:
+            if (None, target_node) not in isomorphic_mapping and (None, target_node) not in candidate_mapping:
+                _legacy_open(target_open, target_node)
+
+    heuristic = create_default_heuristic(isomorphic_mapping)
+    for source_node, target_node in _select_candidates(candidate_mapping, heuristic):
+        _map_recursively(isomorphic_mapping, source_node, target_node)
+
+    return isomorphic_mapping
+
+
+# Benchmark ----------------------------------------------------------------
+
+def measure(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = fn()
+        best   = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--statements", type = int, default = 6000)
+    parser.add_argument("--changes", type = int, default = 20)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    source, target = generate_pair(args.statements, args.changes)
+    source_ast = cd.parse_ast(source, lang = "python")
+    target_ast = cd.parse_ast(target, lang = "python")
+
+    print("nodes: %d source, %d target" % (source_ast.subtree_weight, target_ast.subtree_weight))
+
+    results = {}
+    for name, fn in [("buckets", gumtree_isomap), ("pairwise", legacy_isomap)]:
+        elapsed, mapping = measure(lambda: fn(source_ast, target_ast), args.repeat)
+        results[name] = set(mapping)
+        print("%-10s %8.3f s  (%d pairs)" % (name, elapsed, len(mapping)))
+
+    assert results["buckets"] == results["pairwise"], "Mappings differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark of node mappings: set based multi-mapping vs one-to-one tables
+
+Maps all nodes of a generated Python file onto a copy and reports
+the memory retained by the mapping (tracemalloc), the time of the
+partner lookups and membership checks performed by gumtree_editmap
+and chawathe, and the time of chawathe on the complete mapping.
+The previous NodeMapping (defaultdict of sets in both directions,
+lookups through generators) is included for comparison.
+
+Usage:
+    python benchmarks/bench_mapping.py [--functions 3000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_diff as cd
+
+from code_diff.traversal        import preorder
+from code_diff.gumtree          import chawathe
+from code_diff.gumtree.utils    import NodeMapping
+
+
+def generate(num_functions, offset = 0):
+    return "".join(
+        "def f%d(a, b):\n    x = a + %d\n    return g(x, b)\n\n" % (i, i + offset)
+            for i in range(num_functions))
+
+
+# Previous implementation (sets in both directions) -------------------------
+
+class LegacyNodeMapping:
+
+    def __init__(self):
+        self._src_to_dst = defaultdict(set)
+        self._dst_to_src = defaultdict(set)
+        self._length = 0
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple): key = (key, None)
+
+        src_key, dst_key = key
+
+        if src_key is not None and dst_key is not None:
+            return dst_key in self._src_to_dst[src_key]
+
+        if src_key is None and dst_key is None:
+            return self.__iter__()
+
+        if src_key is None:
+            return ((src, dst_key) for src in self._dst_to_src[dst_key])
+
+        if dst_key is None:
+            return ((src_key, dst) for dst in self._src_to_dst[src_key])
+
+    def __iter__(self):
+
+        def _iter_maps():
+            for k, V in self._src_to_dst.items():
+                for v in V: yield (k, v)
+
+        return _iter_maps()
+
+    def __contains__(self, key):
+        if not isinstance(key, tuple): key = (key, None)
+
+        src_key, dst_key = key
+
+        if src_key is not None and dst_key is not None:
+            return self[src_key, dst_key]
+
+        return next(self[src_key, dst_key], None) is not None
+
+    def __len__(self):
+        return self._length
+
+    def add(self, src, dst):
+        if not self[src, dst]:
+            self._src_to_dst[src].add(dst)
+            self._dst_to_src[dst].add(src)
+            self._length += 1
+
+    # Accessors of the one-to-one mapping as previously used by editmap and chawathe
+
+    def dst_of(self, src):
+        result = next(self[src, None], None)
+        return None if result is None else result[1]
+
+    def src_of(self, dst):
+        result = next(self[None, dst], None)
+        return None if result is None else result[0]
+
+    def is_mapped(self, src = None, dst = None):
+        if src is None: return (None, dst) in self
+        if dst is None: return (src, None) in self
+        return self[src, dst]
+
+    def replace(self, src, dst):
+        # Only used by chawathe for the (unmapped) fake roots
+        self.add(src, dst)
+
+
+# Benchmark ----------------------------------------------------------------
+
+def build(mapping_cls, pairs):
+    mapping = mapping_cls()
+    for source_node, target_node in pairs: mapping.add(source_node, target_node)
+    return mapping
+
+
+def retained_memory(mapping_cls, pairs):
+    gc.collect()
+    tracemalloc.start()
+    mapping = build(mapping_cls, pairs)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(mapping) == len(pairs)
+    return retained
+
+
+def lookups(mapping, pairs):
+    found = 0
+    for source_node, target_node in pairs:
+        found += mapping.is_mapped(source_node)
+        found += mapping.is_mapped(dst = target_node)
+        found += mapping.dst_of(source_node) is target_node
+        found += mapping.src_of(target_node) is source_node
+        found += mapping.is_mapped(source_node, target_node)
+    return found
+
+
+def measure(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = fn()
+        best   = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type = int, default = 3000)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    source_ast = cd.parse_ast(generate(args.functions), lang = "python")
+    target_ast = cd.parse_ast(generate(args.functions, offset = 1), lang = "python")
+
+    pairs = list(zip(preorder(source_ast), preorder(target_ast)))
+    print("nodes: %d source, %d target, %d pairs" % (source_ast.subtree_weight, target_ast.subtree_weight, len(pairs)))
+
+    scripts = {}
+    for name, mapping_cls in [("tables", NodeMapping), ("sets", LegacyNodeMapping)]:
+        memory = retained_memory(mapping_cls, pairs)
+        mapping = build(mapping_cls, pairs)
+
+        lookup_time, found = measure(lambda: lookups(mapping, pairs), args.repeat)
+        assert found == 5 * len(pairs)
+
+        script_time, script = measure(
+            lambda: chawathe.compute_chawathe_edit_script(build(mapping_cls, pairs), source_ast, target_ast),
+            args.repeat)
+        scripts[name] = repr(script)
+
+        print("%-7s %8.1f MB  lookups %7.3f s  chawathe %7.3f s" % (
+            name, memory / (1024 * 1024), lookup_time, script_time))
+
+    assert scripts["tables"] == scripts["sets"], "Edit scripts differ"
+
+
+if __name__ == "__main__":
+    main()
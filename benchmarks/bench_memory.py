@@ -0,0 +1,115 @@
+"""
+Memory benchmark: ASTNode trees vs. compact array based trees
+
+Parses large source files with both representations and reports
+the peak RSS of the parsing process as well as the memory retained
+by the parsed trees. Every measurement runs in a fresh interpreter.
+
+Usage:
+    python benchmarks/bench_memory.py [--lang python] [--lines 20000] [file ...]
+
+If no files are given, a synthetic Python module is generated.
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+
+def synthetic_module(lines):
+    chunks = []
+    count  = 0
+    i      = 0
+    while count < lines:
+        chunks.append(
+            "def function_%d(a, b, c = None):\n"
+            "    result = a + b * %d\n"
+            "    if c is not None:\n"
+            "        result = result - c.value(\"%d\")\n"
+            "    return [result, a, b]\n"
+            "\n" % (i, i, i)
+        )
+        count += 6
+        i     += 1
+    return "".join(chunks)
+
+
+def measure(path, lang, compact, trace):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from code_diff.ast import parse_ast
+
+    with open(path, "r") as f: source = f.read()
+
+    # Tracing allocations inflates the RSS. Therefore, peak RSS and
+    # retained memory are measured in separate processes.
+    gc.collect()
+    if trace: tracemalloc.start()
+
+    tree = parse_ast(source, lang = lang, compact = compact)
+    gc.collect()
+    assert tree is not None
+
+    if trace:
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(json.dumps({"retained": retained}))
+    else:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # kB on Linux
+        print(json.dumps({"peak_rss": peak_rss * 1024}))
+
+
+def run_isolated(path, lang, compact, trace):
+    cmd = [sys.executable, os.path.abspath(__file__), "--measure", path, "--lang", lang]
+    if compact: cmd.append("--compact")
+    if trace: cmd.append("--trace")
+    output = subprocess.check_output(cmd)
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def _mb(value):
+    return "%8.1f MB" % (value / (1024 * 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs = "*")
+    parser.add_argument("--lang", default = "python")
+    parser.add_argument("--lines", type = int, default = 20000)
+    parser.add_argument("--measure")
+    parser.add_argument("--compact", action = "store_true")
+    parser.add_argument("--trace", action = "store_true")
+    args = parser.parse_args()
+
+    if args.measure:
+        return measure(args.measure, args.lang, args.compact, args.trace)
+
+    files = args.files
+    tmp   = None
+
+    if len(files) == 0:
+        tmp = tempfile.NamedTemporaryFile("w", suffix = ".py", delete = False)
+        tmp.write(synthetic_module(args.lines))
+        tmp.close()
+        files = [tmp.name]
+
+    try:
+        print("%-30s %-8s %12s %12s" % ("file", "mode", "peak RSS", "retained"))
+        for path in files:
+            for compact in [False, True]:
+                peak_rss = run_isolated(path, args.lang, compact, False)["peak_rss"]
+                retained = run_isolated(path, args.lang, compact, True)["retained"]
+                print("%-30s %-8s %12s %12s" % (
+                    os.path.basename(path)[:30], "compact" if compact else "ast",
+                    _mb(peak_rss), _mb(retained)
+                ))
+    finally:
+        if tmp is not None: os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
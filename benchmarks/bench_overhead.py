@@ -0,0 +1,57 @@
+"""
+Benchmark of the fixed per-call overhead of difference
+
+Diffs tiny snippets repeatedly and reports the time per call for
+the one-shot difference function (which reuses a default session)
+and for a session that is set up once. Setting up config and parser
+per call (the previous behavior) is reported as a baseline.
+
+Usage:
+    python benchmarks/bench_overhead.py [--lang python] [--calls 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_diff as cd
+
+
+SNIPPETS = {
+    "python": ("x = a + b", "x = a - b"),
+    "java": ("int x = a + b;", "int x = a - b;"),
+    "javascript": ("let x = a + b;", "let x = a - b;"),
+}
+
+
+def measure(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls): fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lang", default = "python")
+    parser.add_argument("--calls", type = int, default = 2000)
+    args = parser.parse_args()
+
+    source, target = SNIPPETS[args.lang]
+    differ = cd.Differ(args.lang)
+
+    candidates = [
+        ("fresh session", lambda: cd.Differ(args.lang).difference(source, target)),
+        ("difference", lambda: cd.difference(source, target, lang = args.lang)),
+        ("Differ", lambda: differ.difference(source, target)),
+    ]
+
+    for name, fn in candidates:
+        fn()
+        per_call = measure(fn, args.calls)
+        print("%-14s %8.1f us/call" % (name, per_call * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Parse throughput: token based vs. native AST construction
+
+Parses synthetic inputs for Python, Java and JavaScript (or given
+files) with both modes and reports the throughput in AST nodes per
+second.
+
+Usage:
+    python benchmarks/bench_parse.py [--lines 5000] [--repeat 3] [--lang python java javascript]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_diff.ast import parse_ast
+
+from bench_memory import synthetic_module
+
+
+def synthetic_java(lines):
+    methods = []
+    for i in range(max(1, lines // 6)):
+        methods.append(
+            "    public int method%d(int a, int b) {\n"
+            "        int x = a * %d + b;\n"
+            "        if (x > 10) { x = x - 1; }\n"
+            "        return helper(x, \"value %d\");\n"
+            "    }\n\n" % (i, i, i)
+        )
+    return "public class Test {\n" + "".join(methods) + "}\n"
+
+
+def synthetic_javascript(lines):
+    functions = []
+    for i in range(max(1, lines // 6)):
+        functions.append(
+            "function test%d(a, b) {\n"
+            "    let x = a * %d + b;\n"
+            "    if (x > 10) { x = x - 1; }\n"
+            "    return helper(x, 'value %d');\n"
+            "}\n\n" % (i, i, i)
+        )
+    return "".join(functions)
+
+
+GENERATORS = {
+    "python": synthetic_module,
+    "java": synthetic_java,
+    "javascript": synthetic_javascript,
+}
+
+
+def count_nodes(ast):
+    return ast.subtree_weight
+
+
+def measure(source, lang, native, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ast   = parse_ast(source, lang = lang, native = native, cache = False)
+        timings.append(time.perf_counter() - start)
+    return count_nodes(ast), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lang", nargs = "+", default = list(GENERATORS.keys()))
+    parser.add_argument("--lines", type = int, default = 5000)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    for lang in args.lang:
+        source = GENERATORS[lang](args.lines)
+
+        for native in [False, True]:
+            nodes, best = measure(source, lang, native, args.repeat)
+            print("%-10s %-7s %8d nodes %8.3fs %12.0f nodes/s" % (
+                lang, "native" if native else "tokens", nodes, best, nodes / best
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark of compute_edit_mapping with min_height retries and fast paths
+
+Diffs many small statement pairs that share no subtree higher than a
+leaf (the isomap has to be retried with a lower min_height) and pairs
+where the source is a single leaf. Reports the time of the current
+implementation (resumed isomap, editmap skipped if it cannot extend the
+isomap) and of the previous one, which recomputed the isomap from
+scratch for every retry and always ran the editmap. Both mappings
+are checked to be identical.
+
+Usage:
+    python benchmarks/bench_retry.py [--pairs 500] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_diff as cd
+
+from code_diff.gumtree import compute_edit_mapping, gumtree_isomap, gumtree_editmap, TopDownMatcher
+
+
+def generate_pairs(num_pairs):
+    retry_pairs, leaf_pairs = [], []
+
+    for i in range(num_pairs):
+        source_ast = cd.parse_ast("result%d = call%d(a%d, [b%d, c%d])\n" % (i, i, i, i, i), lang = "python")
+        target_ast = cd.parse_ast("value%d = other%d(x%d, [y%d, z%d])\n" % (i, i, i, i, i), lang = "python")
+        retry_pairs.append((source_ast, target_ast))
+
+        statement = target_ast.children[0]
+        leaf_pairs.append((statement.children[0].children[0], statement))
+
+    return retry_pairs, leaf_pairs
+
+
+# Previous implementation ---------------------------------------------------
+
+def legacy_isomap(source_ast, target_ast, min_height = 1):
+    isomap = gumtree_isomap(source_ast, target_ast, min_height)
+
+    while len(isomap) == 0 and min_height > 0:
+        min_height -= 1
+        isomap = gumtree_isomap(source_ast, target_ast, min_height)
+
+    return isomap
+
+
+def legacy_edit_mapping(source_ast, target_ast, min_height = 1, max_size = 1000, min_dice = 0.5):
+    isomap = legacy_isomap(source_ast, target_ast, min_height)
+    return gumtree_editmap(isomap, source_ast, target_ast, max_size, min_dice)
+
+
+def resumable_isomap(source_ast, target_ast, min_height = 1):
+    matcher = TopDownMatcher(source_ast, target_ast)
+    isomap  = matcher.match(min_height)
+
+    while len(isomap) == 0 and min_height > 0:
+        min_height -= 1
+        isomap = matcher.match(min_height)
+
+    return isomap
+
+
+# Benchmark ----------------------------------------------------------------
+
+def measure(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        gc.collect()
+        start  = time.perf_counter()
+        result = fn()
+        best   = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type = int, default = 500)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    retry_pairs, leaf_pairs = generate_pairs(args.pairs)
+
+    benchmarks = [
+        ("isomap with retries", retry_pairs, resumable_isomap, legacy_isomap),
+        ("edit mapping with retries", retry_pairs, compute_edit_mapping, legacy_edit_mapping),
+        ("edit mapping of single leaf source", leaf_pairs, compute_edit_mapping, legacy_edit_mapping),
+    ]
+
+    for title, pairs, current_fn, previous_fn in benchmarks:
+        print("%s: %d pairs" % (title, len(pairs)))
+
+        results = {}
+        for name, fn in [("current", current_fn), ("previous", previous_fn)]:
+            elapsed, mappings = measure(lambda: [set(fn(s, t)) for s, t in pairs], args.repeat)
+            results[name] = mappings
+            print("  %-10s %8.3f s" % (name, elapsed))
+
+        assert results["current"] == results["previous"], "Mappings differ"
+
+
+if __name__ == "__main__":
+    main()
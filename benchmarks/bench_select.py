@@ -0,0 +1,112 @@
+"""
+Benchmark of the candidate selection of gumtree_isomap
+
+Generates files with many repeated subtrees (copies of a boilerplate
+`__eq__` method) such that most isomorphic pairs are ambiguous.
+Reports the time to score and select all candidate pairs with the
+previous approach (subtree_dice per pair and a full sort) and with the
+dice index (interval counts per source node and a heap).
+
+Usage:
+    python benchmarks/bench_select.py [--methods 2000] [--copies 150] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_diff as cd
+
+from code_diff.gumtree         import isomap
+from code_diff.gumtree.isomap  import NodeMultiMapping, create_default_heuristic, _score_candidates, _select_candidates
+from code_diff.gumtree.utils   import np
+
+
+def generate(num_methods, num_copies, offset = 0):
+    # Unique methods are mapped top-down. Copies of the boilerplate
+    # method are ambiguous and have to be selected by their dice score.
+    boilerplate = "    def __eq__(self, other):\n%s        return True\n" % "".join(
+        "        if self.f%d != other.f%d: return False\n" % (k, k) for k in range(8))
+
+    methods = []
+    for i in range(num_methods):
+        methods.append("    def m%d(self, a%d):\n        self.v%d = a%d + %d\n" % (i, i, i, i, i + offset))
+        if i % max(1, num_methods // num_copies) == 0: methods.append(boilerplate)
+
+    return "class A:\n" + "\n".join(methods)
+
+
+def collect_candidates(source_ast, target_ast):
+    # Runs the top-down phase and captures the candidates and the mapping before selection
+    captured = {}
+    original = isomap._select_candidates
+
+    def capture(candidate_mapping, heuristic = None, scores = None):
+        captured["candidates"] = candidate_mapping
+        return iter(())
+
+    isomap._select_candidates = capture
+    try:
+        mapping = isomap.gumtree_isomap(source_ast, target_ast)
+    finally:
+        isomap._select_candidates = original
+
+    return captured.get("candidates", NodeMultiMapping()), mapping
+
+
+def legacy_selection(candidates, mapping):
+    heuristic = create_default_heuristic(mapping)
+    pairs = sorted(candidates, key = lambda p: heuristic(*p), reverse = True)
+
+    source_seen, target_seen, selected = set(), set(), []
+    for source_node, target_node in pairs:
+        if source_node in source_seen: continue
+        source_seen.add(source_node)
+        if target_node in target_seen: continue
+        target_seen.add(target_node)
+        selected.append((source_node, target_node))
+
+    return selected
+
+
+def indexed_selection(candidates, mapping):
+    return list(_select_candidates(candidates, scores = _score_candidates(candidates, mapping)))
+
+
+def measure(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = fn()
+        best   = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--methods", type = int, default = 2000)
+    parser.add_argument("--copies", type = int, default = 150)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    source_ast = cd.parse_ast(generate(args.methods, args.copies), lang = "python")
+    target_ast = cd.parse_ast(generate(args.methods, args.copies + 10), lang = "python")
+
+    candidates, mapping = collect_candidates(source_ast, target_ast)
+
+    print("nodes: %d source, %d target, %d candidate pairs (numpy: %s)" % (
+        source_ast.subtree_weight, target_ast.subtree_weight, len(candidates), np is not None))
+
+    results = {}
+    for name, fn in [("indexed", indexed_selection), ("legacy", legacy_selection)]:
+        elapsed, selected = measure(lambda: fn(candidates, mapping), args.repeat)
+        results[name] = selected
+        print("%-8s %8.3f s  (%d selected)" % (name, elapsed, len(selected)))
+
+    assert results["indexed"] == results["legacy"], "Selections differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark of tree traversals on large ASTs
+
+Builds a balanced AST with the given number of nodes and reports
+the time for a complete traversal with the previous list based BFS
+and the traversals of code_diff.traversal. Additionally, compares
+the previous set based dice computation with the Euler tour based one.
+
+Usage:
+    python benchmarks/bench_traversal.py [--nodes 100000] [--fanout 4] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_diff.ast       import default_create_node
+from code_diff.traversal      import bfs, level_order, preorder, postorder, traversal_index
+from code_diff.gumtree.utils  import NodeMapping, subtree_dice
+
+
+def balanced_tree(num_nodes, fanout):
+    num_leaves = num_nodes * (fanout - 1) // fanout + 1
+    level = [default_create_node("leaf", [], text = "x") for _ in range(num_leaves)]
+    count = len(level)
+
+    while len(level) > 1:
+        level = [default_create_node("node", level[i:i + fanout]) for i in range(0, len(level), fanout)]
+        count += len(level)
+
+    return level[0], count
+
+
+def list_bfs(tree):
+    queue = [tree]
+    while len(queue) > 0:
+        node = queue.pop(0)
+        yield node
+        queue.extend(node.children)
+
+
+def set_dice(A, B, mapping):
+    DA, DB = set(A.descandents()), set(B.descandents())
+    mapped = {}
+    for a, b in mapping: mapped.setdefault(a, set()).add(b)
+
+    mapped_children = set(m for t1 in DA if t1 in mapped for m in mapped[t1])
+    return 2 * len(mapped_children & DB) / (len(DA) + len(DB))
+
+
+def build_index(tree):
+    tree.__dict__.pop("_traversal_index", None)
+    return traversal_index(tree)
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type = int, default = 100000)
+    parser.add_argument("--fanout", type = int, default = 4)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    tree, count = balanced_tree(args.nodes, args.fanout)
+    print("Nodes: %d" % count)
+
+    candidates = [
+        ("list bfs", lambda: sum(1 for _ in list_bfs(tree))),
+        ("bfs", lambda: sum(1 for _ in bfs(tree))),
+        ("level_order", lambda: sum(len(level) for level in level_order(tree))),
+        ("preorder", lambda: sum(1 for _ in preorder(tree))),
+        ("postorder", lambda: sum(1 for _ in postorder(tree))),
+        ("index build", lambda: build_index(tree)),
+        ("index cached", lambda: sum(1 for _ in traversal_index(tree).postorder)),
+    ]
+
+    for name, fn in candidates:
+        print("%-14s %8.4fs" % (name, measure(fn, args.repeat)))
+
+    # Dice between the first subtrees of two isomorphic trees
+    other, _ = balanced_tree(args.nodes, args.fanout)
+    mapping  = NodeMapping()
+    for a, b in zip(preorder(tree), preorder(other)): mapping.add(a, b)
+
+    A, B = tree.children[0], other.children[0]
+    print("%-14s %8.4fs" % ("set dice", measure(lambda: set_dice(A, B, mapping), args.repeat)))
+    print("%-14s %8.4fs" % ("tour dice", measure(lambda: subtree_dice(A, B, mapping), args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Load test of the asyncio front-end
+
+Fires concurrent diff requests of a synthetic workload (generated
+Python files with a single changed function) at an AsyncDiffer and
+reports request latencies, rejected requests and the lag of the event
+loop. The lag is measured by a heartbeat task and shows whether the
+loop stays responsive while diffs are computed.
+
+Usage:
+    python benchmarks/load_async.py [--requests 200] [--rate 50] [--functions 200]
+                                    [--executor thread] [--concurrency 4] [--max-pending 32]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_diff as cd
+
+
+def generate_pair(num_functions, rng):
+    functions = [
+        "def f%d(a, b):\n    x = a + b * %d\n    return x\n\n" % (i, i) for i in range(num_functions)
+    ]
+    source = "".join(functions)
+
+    changed = rng.randrange(num_functions)
+    functions[changed] = functions[changed].replace("a + b", "a - b")
+
+    return source, "".join(functions)
+
+
+def percentile(values, p):
+    if len(values) == 0: return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+async def heartbeat(interval, lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+
+async def run(args):
+    rng   = random.Random(0)
+    pairs = [generate_pair(args.functions, rng) for _ in range(16)]
+
+    latencies, rejected, failed = [], 0, 0
+    lags, stop = [], asyncio.Event()
+
+    async with cd.AsyncDiffer("python", executor = args.executor, max_workers = args.concurrency,
+                               max_concurrency = args.concurrency, max_pending = args.max_pending,
+                               output = "edit_script") as differ:
+
+        async def request(source, target):
+            nonlocal rejected, failed
+            start = time.perf_counter()
+            try:
+                await differ.difference(source, target)
+            except cd.DiffOverloadedError:
+                rejected += 1
+                return
+            except Exception:
+                failed += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+        beat  = asyncio.ensure_future(heartbeat(0.01, lags, stop))
+        start = time.perf_counter()
+        tasks = []
+
+        for i in range(args.requests):
+            tasks.append(asyncio.ensure_future(request(*pairs[i % len(pairs)])))
+            await asyncio.sleep(1.0 / args.rate)
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await beat
+
+    print("requests    %d in %.2fs (%d rejected, %d failed)" % (args.requests, elapsed, rejected, failed))
+    print("latency     p50 %.1f ms  p95 %.1f ms  p99 %.1f ms" % tuple(
+        1000 * percentile(latencies, p) for p in (0.5, 0.95, 0.99)))
+    print("loop lag    p50 %.1f ms  max %.1f ms" % (1000 * percentile(lags, 0.5), 1000 * max(lags, default = 0)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type = int, default = 200)
+    parser.add_argument("--rate", type = float, default = 50, help = "requests per second")
+    parser.add_argument("--functions", type = int, default = 200, help = "functions per file")
+    parser.add_argument("--executor", default = "thread", choices = ["thread", "process"])
+    parser.add_argument("--concurrency", type = int, default = 4)
+    parser.add_argument("--max-pending", type = int, default = 32)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
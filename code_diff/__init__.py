@@ -1,15 +1,33 @@
-from code_tokenize.lang import load_from_lang_config
-from code_tokenize.tokens import match_type
-
-from .ast     import parse_ast
-from .utils   import cached_property
-from .sstubs  import SStubPattern, classify_sstub
-from .gumtree import compute_edit_script, EditScript, Update
+import io
+import asyncio
+import threading
+
+from collections import deque
+
+from code_ast.parsers        import ASTParser
+from code_tokenize.lang      import load_from_lang_config
+from code_tokenize.tokenizer import create_tokenizer
+
+from .ast         import parse_ast, build_ast, build_native_ast, supports_native
+from .ast         import attach_source, source_buffer
+from .incremental import parse_pair, parse_source, parse_incremental
+from .cache       import ParseCache, enable_parse_cache, disable_parse_cache, default_parse_cache
+from .store       import DirectoryStore, SQLiteStore
+from .utils       import cached_property, TypeMatcher, compile_type_matcher
+from .prefilter   import changed_window, shift_rows
+from .instrument  import span, instrument, Recorder, add_listener, remove_listener
+from .sstubs      import SStubPattern, classify_sstub
+from .classify    import ChangeKind, ChangeResult, token_signature
+from .batch       import difference_many, BatchResult
+from .aio         import adifference, AsyncDiffer, DiffOverloadedError
+from .gumtree     import compute_edit_script, compute_edit_mapping, restrict_mapping
+from .gumtree     import EditScript, EditStats, Update
+from .memo        import DiffMemo
 
 
 # Main method --------------------------------------------------------
 
-def difference(source, target, lang = "guess", **kwargs):
+def difference(source, target, lang = "guess", compact = False, incremental = False, **kwargs):
     """
     Computes the smallest difference between source and target
 
@@ -38,6 +56,36 @@ def difference(source, target, lang = "guess", **kwargs):
         be selected to silent any warning.
         Default: raise (Raises an exception)
 
+    compact : bool
+        Whether the ASTs should be stored in a compact
+        array based representation (see code_diff.compact).
+        Saves memory for large files.
+        Default: False
+
+    incremental : bool
+        Whether the target should be parsed incrementally
+        by editing the parse tree of the source. Unchanged
+        subtrees of the source AST are reused. Helpful if
+        source and target are large and only differ slightly.
+        Cannot be combined with compact.
+        Default: False
+
+    native : bool
+        Whether ASTs should be built directly from the
+        tree-sitter tree instead of the token sequence
+        of code_tokenize. Faster but only supported for
+        Python, Java and JavaScript.
+        Default: False
+
+    prefilter : bool
+        Whether only the changed window of lines should be
+        parsed. The window is expanded to top-level boundaries
+        (unindented lines). Falls back to parsing the complete
+        code if a window cannot be parsed without errors or
+        the change affects the top level. Helpful for large
+        files with small changes. Cannot be combined with incremental.
+        Default: False
+
     **kwargs : dict
         Further config option that are specific to
         the underlying AST parser. See code_tokenize
@@ -51,20 +99,336 @@ def difference(source, target, lang = "guess", **kwargs):
     
     """
     
-    config     = load_from_lang_config(lang, **kwargs)
-    source_ast = parse_ast(source, lang = lang, **kwargs)
-    target_ast = parse_ast(target, lang = lang, **kwargs)
+    return default_differ(lang, compact = compact, incremental = incremental, **kwargs).difference(source, target)
+
+
+def diff_regions(source, target, lang = "guess", **kwargs):
+    """
+    Computes all minimal regions in which source and target differ
+
+    In contrast to difference, the AST walk does not stop at the first
+    node with several changed children. Children are aligned by their
+    subtree hashes and every changed region is reported separately.
+    Each region can be edit scripted independently.
+
+    Parameters
+    ----------
+    source : str
+        Source code which should be compared
+    
+    target : str
+        Comparison target as a code string
+
+    lang : [python, java, javascript, ...]
+        Programming language of both code snippets
+
+    **kwargs : dict
+        Further options (see difference)
+
+    Returns
+    -------
+    list[ASTDiff]
+        All changed regions in order of the source code.
+        Empty if source and target are identical.
+
+    """
+    return default_differ(lang, **kwargs).diff_regions(source, target)
+
+
+def compare(source, target, lang = "guess", **kwargs):
+    """
+    Classifies the change between source and target without raising for unchanged code
+
+    The token streams of both snippets are compared first
+    (comments are ignored). Only if the token streams differ,
+    ASTs are built (from the same tokens) and diffed.
+
+    Parameters
+    ----------
+    source : str
+        Source code which should be compared
+    
+    target : str
+        Comparison target as a code string
+
+    lang : [python, java, javascript, ...]
+        Programming language of both code snippets
+
+    **kwargs : dict
+        Further options (see difference)
+
+    Returns
+    -------
+    ChangeResult
+        The kind of the change (IDENTICAL, FORMATTING or STRUCTURAL)
+        and the smallest code change for STRUCTURAL changes.
+
+    """
+    return default_differ(lang, **kwargs).compare(source, target)
+
+
+# Diff session --------------------------------------------------------
+
+class Differ:
+    """
+    Reusable session to compute code differences for a single language
+
+    Holds the language config, the compiled statement matcher
+    and a tree-sitter parser which are otherwise set up for
+    every call of difference. Sessions are thread-safe but
+    parse one snippet at a time.
+
+    Parameters
+    ----------
+    lang : [python, java, javascript, ...]
+        Programming language of the code snippets
+
+    compact : bool
+        Whether ASTs are stored compactly (see difference)
+
+    incremental : bool
+        Whether targets are parsed incrementally (see difference)
+
+    cache : ParseCache | bool
+        Parse cache for this session. If None, the global
+        parse cache is used if enabled. False disables caching.
+        Default: None
+
+    native : bool
+        Whether ASTs are built directly from the tree-sitter
+        tree (see parse_ast)
+        Default: False
+
+    prefilter : bool
+        Whether only the changed window of lines should be parsed
+        (see difference)
+        Default: False
+
+    **kwargs : dict
+        Config options for the tokenizer (see code_tokenize)
+
+    """
+
+    def __init__(self, lang = "guess", compact = False, incremental = False, cache = None, native = False,
+                    prefilter = False, **kwargs):
+        if compact and incremental:
+            raise ValueError("Incremental parsing is not supported for compact ASTs.")
+
+        if prefilter and incremental:
+            raise ValueError("The line prefilter cannot be combined with incremental parsing.")
+
+        self.lang        = lang
+        self.compact     = compact
+        self.incremental = incremental
+        self.cache       = cache
+        self.native      = native and supports_native(lang, **kwargs)
+        self.prefilter   = prefilter
+        self.kwargs      = kwargs
+
+        self.config       = load_from_lang_config(lang, **kwargs)
+        self.parse_config = load_from_lang_config(lang, **dict(kwargs, syntax_error = "ignore"))
+        self.statement_matcher = compile_type_matcher(tuple(self.config.statement_types))
+
+        self._parser    = None
+        self._tokenizer = None
+        self._lock      = threading.Lock()
+
+    def _setup_parser(self):
+        if self._parser is not None: return
+
+        if self.lang == "guess":
+            raise NotImplementedError("Guessing the language automatically is currently not implemented. Please specify a language with the lang keyword")
+
+        self._parser    = ASTParser(self.parse_config.lang)
+        self._tokenizer = create_tokenizer(self.parse_config)
+
+    def _parse(self, source_code):
+        if len(source_code.strip()) == 0:
+            raise ValueError("The code string is empty. Cannot tokenize anything empty: %s" % source_code)
+
+        with span("parse", self.lang):
+            with self._lock:
+                self._setup_parser()
+
+                with span("tree_sitter"):
+                    tree, code_lines = self._parser.parse(source_code)
+
+                if self.native:
+                    ast = build_native_ast(tree.root_node, code_lines, self.lang, compact = self.compact)
+                    return attach_source(ast, source_code)
+
+                with span("tokenize"):
+                    ast_tokens = self._tokenizer(tree.root_node, code_lines, visitors = list(self.parse_config.visitors))
+
+            return attach_source(build_ast(ast_tokens, compact = self.compact), source_code)
+
+    def _tokenize(self, source_code):
+        if len(source_code.strip()) == 0:
+            raise ValueError("The code string is empty. Cannot tokenize anything empty: %s" % source_code)
+
+        with self._lock:
+            self._setup_parser()
+
+            with span("tree_sitter"):
+                tree, code_lines = self._parser.parse(source_code)
+
+            with span("tokenize"):
+                return self._tokenizer(tree.root_node, code_lines, visitors = list(self.parse_config.visitors))
+
+    def parse(self, source_code):
+        """Parses the given source code into its AST (see parse_ast)"""
+        cache = self.cache if self.cache is not None else default_parse_cache()
+
+        if cache is None or cache is False:
+            return self._parse(source_code)
+
+        return cache.parse(source_code, lang = self.lang, compact = self.compact,
+                            parse_fn = self._parse, **self.kwargs)
+
+    def parse_pair(self, source, target):
+        """Parses source and target code (incrementally if enabled)"""
+        if not self.incremental:
+            return self.parse(source), self.parse(target)
+
+        with span("parse", self.lang, incremental = True), self._lock:
+            self._setup_parser()
+            source = parse_source(self._parser, self.parse_config, source)
+            if source.ast is None: return None, None
+
+            target = parse_incremental(self._parser, self.parse_config, source, target)
+
+        return source.ast, target.ast
+
+    def difference(self, source, target):
+        """Computes the smallest difference between source and target (see difference)"""
+        with span("difference", self.lang):
+            if self.prefilter:
+                diff = self._window_difference(source, target)
+                if diff is not None: return diff
+
+            return self._full_difference(source, target)
+
+    def _full_difference(self, source, target):
+        diff = self._diff_asts(source, *self.parse_pair(source, target))
+
+        if diff is None:
+            raise ValueError("Source and Target AST are identical.")
+
+        return diff
+
+    def _diff_asts(self, source, source_ast, target_ast):
+        # Returns None if both ASTs are identical
+        if source_ast is None or target_ast is None:
+            raise ValueError("Source / Target AST seems to be empty: %s" % source)
+
+        # Concretize Diff
+        with span("diff_search", nodes = source_ast.subtree_weight + target_ast.subtree_weight):
+            source_ast, target_ast = diff_search(source_ast, target_ast)
+
+        if source_ast is None: return None
+
+        return ASTDiff(self.config, source_ast, target_ast, self.statement_matcher)
+
+    def compare(self, source, target):
+        """Classifies the change from source to target and diffs structural changes (see compare)"""
+        if source == target: return ChangeResult(ChangeKind.IDENTICAL)
+
+        with span("compare", self.lang):
+            source_tokens = self._tokenize(source)
+            target_tokens = self._tokenize(target)
+
+            if token_signature(source_tokens) == token_signature(target_tokens):
+                return ChangeResult(ChangeKind.FORMATTING)
+
+            # Tokens are reused to build the ASTs (instead of parsing again)
+            source_ast = attach_source(build_ast(source_tokens, compact = self.compact), source)
+            target_ast = attach_source(build_ast(target_tokens, compact = self.compact), target)
+
+            diff = self._diff_asts(source, source_ast, target_ast)
+
+        # Token streams can differ for identical ASTs (e.g. newlines vs. semicolons)
+        if diff is None: return ChangeResult(ChangeKind.FORMATTING)
+
+        return ChangeResult(ChangeKind.STRUCTURAL, diff)
+
+    def _parse_window(self, code, full_code, start_row):
+        if len(code.strip()) == 0: return None
+
+        ast = self._parse(code)
+        if ast is None or ast.parent is not None or ast.backend.has_error: return None
+
+        return attach_source(shift_rows(ast, start_row), full_code)
+
+    def _window_difference(self, source, target):
+        # Returns None if the window cannot be diffed independently
+        window = changed_window(source, target, self.lang)
+        if window is None: return None
+
+        source_ast = self._parse_window(window.source_code, source, window.start)
+        target_ast = self._parse_window(window.target_code, target, window.start)
+        if source_ast is None or target_ast is None: return None
+
+        window_roots = (source_ast, target_ast)
+
+        with span("diff_search", nodes = source_ast.subtree_weight + target_ast.subtree_weight):
+            source_ast, target_ast = diff_search(source_ast, target_ast)
+
+        if source_ast is None: return None
+
+        # Changes on the top level have to be diffed in the complete file.
+        # This includes type changes that the edit script climbs up to a
+        # window root to find a common root (see ASTDiff._edit_script).
+        source_root, target_root = source_ast, target_ast
+        while source_root.type != target_root.type:
+            if source_root.parent is None or target_root.parent is None: break
+            source_root, target_root = source_root.parent, target_root.parent
+
+        if source_root in window_roots or target_root in window_roots: return None
+
+        def full_diff():
+            return self._full_difference(source, target)
+
+        return WindowDiff(self.config, source_ast, target_ast, self.statement_matcher, full_diff)
+
+    def diff_regions(self, source, target):
+        """Computes all minimal regions in which source and target differ (see diff_regions)"""
+        source_ast, target_ast = self.parse_pair(source, target)
+
+        if source_ast is None or target_ast is None:
+            raise ValueError("Source / Target AST seems to be empty: %s" % source)
+
+        return ASTDiff(self.config, source_ast, target_ast, self.statement_matcher).regions()
+
+
+# Sessions are only shared for configurations of plain values (language and flags).
+# Other options (e.g. a ParseCache or custom visitors) get a new session
+# per call. Otherwise, every such call would keep a session alive.
 
-    if source_ast is None or target_ast is None:
-        raise ValueError("Source / Target AST seems to be empty: %s" % source)
+_DEFAULT_DIFFERS = {}
+_DEFAULT_DIFFERS_LOCK = threading.Lock()
 
-    # Concretize Diff
-    source_ast, target_ast = diff_search(source_ast, target_ast)
+_VALUE_TYPES = (type(None), bool, int, float, str)
 
-    if source_ast is None:
-        raise ValueError("Source and Target AST are identical.")
 
-    return ASTDiff(config, source_ast, target_ast)
+def default_differ(lang = "guess", **kwargs):
+    """Returns the shared session for the given language and options"""
+    if not all(_is_value(value) for value in kwargs.values()):
+        return Differ(lang, **kwargs)
+
+    key = (lang, tuple(sorted(kwargs.items())))
+
+    try:
+        return _DEFAULT_DIFFERS[key]
+    except KeyError:
+        with _DEFAULT_DIFFERS_LOCK:
+            if key not in _DEFAULT_DIFFERS:
+                _DEFAULT_DIFFERS[key] = Differ(lang, **kwargs)
+            return _DEFAULT_DIFFERS[key]
+
+
+def _is_value(value):
+    if isinstance(value, tuple): return all(_is_value(v) for v in value)
+    return isinstance(value, _VALUE_TYPES)
 
 
 # Diff Search --------------------------------------------------------
@@ -73,9 +437,9 @@ def difference(source, target, lang = "guess", **kwargs):
 def diff_search(source_ast, target_ast):
     if source_ast is None or source_ast.isomorph(target_ast): return None, None
 
-    queue = [(source_ast, target_ast)]
+    queue = deque([(source_ast, target_ast)])
     while len(queue) > 0:
-        source_node, target_node = queue.pop(0)
+        source_node, target_node = queue.popleft()
 
         if len(source_node.children) != len(target_node.children):
             return (source_node, target_node)
@@ -93,6 +457,103 @@ def diff_search(source_ast, target_ast):
             return (source_node, target_node)
 
 
+# Region Search --------------------------------------------------------
+# Align children by subtree hash and descend into every changed child.
+# A node becomes a region if its changes cannot be attributed
+# to pairs of children (e.g. a child was inserted or deleted).
+
+def region_search(source_ast, target_ast, stats = None):
+    if source_ast is None or source_ast.isomorph(target_ast): return []
+
+    regions = []
+    stack   = [(source_ast, target_ast)]
+
+    while len(stack) > 0:
+        source_node, target_node = stack.pop()
+        changed_children = _changed_children(source_node, target_node, stats)
+
+        if changed_children is None:
+            regions.append((source_node, target_node))
+        else:
+            stack.extend(reversed(changed_children))
+
+    return regions
+
+
+def _changed_children(source_node, target_node, stats = None):
+    source_children, target_children = source_node.children, target_node.children
+
+    if source_node.type != target_node.type: return None
+    if len(source_children) == 0 or len(target_children) == 0: return None
+
+    changed = []
+    last_source, last_target = 0, 0
+
+    anchors = _align_children(source_children, target_children, stats)
+    anchors.append((len(source_children), len(target_children)))
+
+    for source_ix, target_ix in anchors:
+        source_gap = source_children[last_source:source_ix]
+        target_gap = target_children[last_target:target_ix]
+
+        if len(source_gap) != len(target_gap): return None
+
+        for source_child, target_child in zip(source_gap, target_gap):
+            if source_child.type != target_child.type: return None
+            changed.append((source_child, target_child))
+
+        last_source, last_target = source_ix + 1, target_ix + 1
+
+    if len(changed) == 0: return None
+
+    return changed
+
+
+def _align_children(source_children, target_children, stats = None):
+    """Longest common subsequence of isomorph children as index pairs"""
+
+    n, m = len(source_children), len(target_children)
+
+    prefix = 0
+    while prefix < min(n, m) and source_children[prefix].isomorph(target_children[prefix]):
+        prefix += 1
+
+    suffix = 0
+    while (suffix < min(n, m) - prefix
+            and source_children[n - suffix - 1].isomorph(target_children[m - suffix - 1])):
+        suffix += 1
+
+    source_mid = source_children[prefix:n - suffix]
+    target_mid = target_children[prefix:m - suffix]
+
+    if stats is not None: stats.observe("regions.lcs", len(source_mid) * len(target_mid))
+
+    lengths = [[0] * (len(target_mid) + 1) for _ in range(len(source_mid) + 1)]
+    for i, x in enumerate(source_mid):
+        for j, y in enumerate(target_mid):
+            if x.isomorph(y):
+                lengths[i + 1][j + 1] = lengths[i][j] + 1
+            else:
+                lengths[i + 1][j + 1] = max(lengths[i + 1][j], lengths[i][j + 1])
+
+    middle = []
+    i, j = len(source_mid), len(target_mid)
+    while i > 0 and j > 0:
+        if source_mid[i - 1].isomorph(target_mid[j - 1]):
+            middle.append((prefix + i - 1, prefix + j - 1))
+            i, j = i - 1, j - 1
+        elif lengths[i - 1][j] >= lengths[i][j - 1]:
+            i -= 1
+        else:
+            j -= 1
+
+    result = [(i, i) for i in range(prefix)]
+    result.extend(reversed(middle))
+    result.extend((n - suffix + k, m - suffix + k) for k in range(suffix))
+
+    return result
+
+
 # AST Difference --------------------------------------------------------
 
 class ASTDiff:
@@ -119,6 +580,14 @@ class ASTDiff:
 
     target_text : str
         Target text for converting source to target
+
+    source_code, target_code : str
+        Exact source text of the changed AST nodes
+        (including whitespace and comments)
+
+    source_span, target_span : memoryview
+        UTF-8 encoded source text of the changed AST nodes
+        (a slice of the parsed source without copying)
     
     Methods
     -------
@@ -138,24 +607,51 @@ class ASTDiff:
         Python code. Running the function on code in another language
         will cause an exception.
 
+    regions : list[ASTDiff]
+        Splits the difference into all minimal changed regions.
+        Each region can be edit scripted independently.
+        edit_script(per_region = True) stitches the edit
+        scripts of all regions into a single script.
+
     statement_diff : ASTDiff
         raises the AST difference to the statement level
     
     root_diff : ASTDiff
         raises the AST difference to the root level (of each code snippet)
 
+    edit_script(explain = True) : EditScript
+        additionally attaches the algorithm counters of the
+        computation as edit_script.stats (see EditStats)
+
+    edit_script(reuse_root = True) : EditScript
+        computes the edit script from the root level mapping
+        (restricted to the changed subtrees) instead of running
+        GumTree on the changed subtrees. Diffs of all levels
+        share computed mappings and scripts (see memo).
+
     
     """
 
-    def __init__(self, config, source_ast, target_ast):
+    def __init__(self, config, source_ast, target_ast, statement_matcher = None, memo = None):
         self.config     = config
         self.source_ast = source_ast
         self.target_ast = target_ast
+        self._memo      = memo
+
+        if statement_matcher is None:
+            statement_matcher = compile_type_matcher(tuple(config.statement_types))
+        self.statement_matcher = statement_matcher
+
+    @property
+    def memo(self):
+        """Memo shared by all diffs derived from this diff (see DiffMemo)"""
+        if self._memo is None: self._memo = DiffMemo()
+        return self._memo
 
     @cached_property
     def is_single_statement(self):
-        return (is_single_statement(self.config.statement_types, self.source_ast)
-                    and is_single_statement(self.config.statement_types, self.target_ast))
+        return (is_single_statement(self.statement_matcher, self.source_ast)
+                    and is_single_statement(self.statement_matcher, self.target_ast))
 
     @cached_property
     def source_text(self):
@@ -165,24 +661,43 @@ class ASTDiff:
     def target_text(self):
         return tokenize_tree(self.target_ast)
 
+    @property
+    def source_span(self):
+        return _node_span(self.source_ast)
+
+    @property
+    def target_span(self):
+        return _node_span(self.target_ast)
+
+    @cached_property
+    def source_code(self):
+        return str(self.source_span, "utf-8")
+
+    @cached_property
+    def target_code(self):
+        return str(self.target_span, "utf-8")
+
     def statement_diff(self):
-        source_stmt = parent_statement(self.config.statement_types, self.source_ast)
-        target_stmt = parent_statement(self.config.statement_types, self.target_ast)
+        source_stmt = parent_statement(self.statement_matcher, self.source_ast)
+        target_stmt = parent_statement(self.statement_matcher, self.target_ast)
 
         if source_stmt is None or target_stmt is None: 
             raise ValueError("AST diff is not enclosed in a statement")
         
-        return ASTDiff(self.config, source_stmt, target_stmt)
+        return self._derive(source_stmt, target_stmt)
+
+    def _derive(self, source_ast, target_ast):
+        return ASTDiff(self.config, source_ast, target_ast, self.statement_matcher, self.memo)
 
     def root_diff(self):
-        return ASTDiff(self.config, ast_root(self.source_ast), ast_root(self.target_ast))
+        return self._derive(ast_root(self.source_ast), ast_root(self.target_ast))
 
     def sstub_pattern(self):
         if self.config.lang != "python":
             raise ValueError("SStuB can currently only be computed for Python code.")
         
-        if (parent_statement(self.config.statement_types, self.source_ast) is None
-                or parent_statement(self.config.statement_types, self.target_ast) is None):
+        if (parent_statement(self.statement_matcher, self.source_ast) is None
+                or parent_statement(self.statement_matcher, self.target_ast) is None):
             return SStubPattern.NO_STMT                
 
         if not self.is_single_statement:
@@ -190,7 +705,25 @@ class ASTDiff:
         
         return classify_sstub(*diff_search(self.source_ast, self.target_ast))
 
-    def edit_script(self):
+    def regions(self, stats = None):
+        return [self._derive(source_ast, target_ast)
+                    for source_ast, target_ast in region_search(self.source_ast, self.target_ast, stats)]
+
+    def edit_script(self, per_region = False, explain = False, reuse_root = False):
+        stats = EditStats() if explain else None
+
+        with span("edit_script", self.config.lang, per_region = per_region):
+            # Scripts can be shared with the memo. Therefore, we return a copy.
+            edit_script = EditScript(self._edit_script(per_region, stats, reuse_root))
+
+        if explain: edit_script.stats = stats
+        return edit_script
+
+    def _edit_script(self, per_region, stats = None, reuse_root = False):
+
+        if per_region:
+            return _stitch_edit_scripts(region._edit_script(False, stats, reuse_root)
+                                            for region in self.regions(stats))
 
         source_ast, target_ast = self.source_ast, self.target_ast
 
@@ -207,10 +740,80 @@ class ASTDiff:
             source_ast = source_ast.parent
             target_ast = target_ast.parent
 
-        return compute_edit_script(source_ast, target_ast)
+        def compute():
+            return compute_edit_script(source_ast, target_ast, stats = stats,
+                                        mapping = self._edit_mapping(source_ast, target_ast, reuse_root))
+
+        # Counters are only collected by a fresh computation
+        if stats is not None:
+            if reuse_root: return compute()
+            return compute_edit_script(source_ast, target_ast, stats = stats)
+
+        return self.memo.get(("script", source_ast, target_ast, reuse_root), compute)
+
+    def _edit_mapping(self, source_ast, target_ast, reuse_root):
+        # Returns None if the mapping should be computed by compute_edit_script
+        source_root, target_root = ast_root(source_ast), ast_root(target_ast)
+        is_root = source_ast is source_root and target_ast is target_root
+
+        if not (reuse_root or is_root): return None
+        if len(source_root.children) == 0 or len(target_root.children) == 0: return None
+
+        mapping = self.memo.get(("mapping", source_root, target_root),
+                                    lambda: compute_edit_mapping(source_root, target_root))
+
+        if is_root: return mapping
+
+        return restrict_mapping(mapping, source_ast, target_ast)
+
+    async def aedit_script(self, per_region = False, explain = False, reuse_root = False, executor = None):
+        """Computes the edit script in an executor without blocking the event loop (see edit_script)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.edit_script, per_region, explain, reuse_root)
 
     def __repr__(self):
-        return "%s -> %s" % (self.source_text, self.target_text)
+        return "%s -> %s" % (tokenize_tree(self.source_ast, REPR_MAX_LENGTH),
+                                tokenize_tree(self.target_ast, REPR_MAX_LENGTH))
+
+
+REPR_MAX_LENGTH = 1000
+
+
+class WindowDiff(ASTDiff):
+    """
+    Difference computed on the changed window of the code (see Differ)
+
+    The ASTs only cover the changed window of lines (with positions
+    relative to the complete code). Root diffs are computed on
+    the complete code.
+    """
+
+    def __init__(self, config, source_ast, target_ast, statement_matcher, full_diff_fn, memo = None):
+        super().__init__(config, source_ast, target_ast, statement_matcher, memo)
+        self.full_diff_fn = full_diff_fn
+
+    def _derive(self, source_ast, target_ast):
+        return WindowDiff(self.config, source_ast, target_ast, self.statement_matcher, self.full_diff_fn, self.memo)
+
+    def root_diff(self):
+        return self.memo.get(("full_diff",), self.full_diff_fn).root_diff()
+
+
+def _node_span(node):
+    buffer = source_buffer(node)
+
+    if buffer is None:
+        raise ValueError("The AST is not related to any source code")
+
+    return buffer.node_span(node)
+
+
+def _stitch_edit_scripts(edit_scripts):
+    # Regions are disjoint subtrees. Therefore, edit scripts
+    # of different regions do not interfere.
+    operations = []
+    for edit_script in edit_scripts: operations.extend(edit_script)
+    return EditScript(operations)
 
     
 
@@ -218,34 +821,64 @@ class ASTDiff:
 # AST Utils -----------------------------------------------------------
 
 def is_single_statement(statement_types, ast):
+    info = _statement_info(statement_types, ast)
+    if info[1] is None: return False
 
-    if parent_statement(statement_types, ast) is None: return False
-        
-    def is_statement_type(node_type):
-        return any(match_type(r, node_type) for r in statement_types)
+    # Test if any other statement as child (only computed for queried nodes)
+    if info[2] is None: info[2] = _contains_statement(info[0], ast)
+    return not info[2]
 
-    # Test if any other statement as child
-    queue = list(ast.children)
-    while len(queue) > 0:
-        node = queue.pop(0)
-        if is_statement_type(node.type): return False
 
-        queue.extend(node.children)
-    
-    return True
+def parent_statement(statement_types, ast):
+    return _statement_info(statement_types, ast)[1]
 
 
-def parent_statement(statement_types, ast):
-    
-    def is_statement_type(node_type):
-        return any(match_type(r, node_type) for r in statement_types)
+def _statement_matcher(statement_types):
+    if isinstance(statement_types, TypeMatcher): return statement_types
+    return compile_type_matcher(tuple(statement_types))
 
-    # Test if node in statement
-    parent_node = ast
-    while parent_node is not None and not is_statement_type(parent_node.type):
-        parent_node = parent_node.parent
-    
-    return parent_node
+
+# Statement annotation ------------------------------------------------
+# Queried nodes and their ancestors are annotated with their enclosing
+# statement (the node itself or the nearest statement ancestor).
+# A query climbs only until it reaches an annotated ancestor.
+# Whether a descendant is a statement is computed on demand for the
+# queried node.
+
+def _statement_info(statement_types, ast):
+    matcher = _statement_matcher(statement_types)
+
+    # Info: [matcher, enclosing statement, contains statement (None if unknown), root]
+    path, node = [], ast
+    enclosing, root = None, None
+
+    while node is not None:
+        info = getattr(node, "_statement_info", None)
+        if info is not None and info[0] is matcher and info[3].parent is None:
+            enclosing, root = info[1], info[3]
+            break
+
+        path.append(node)
+        node = node.parent
+
+    if root is None: root = path[-1]
+
+    for node in reversed(path):
+        if matcher(node.type): enclosing = node
+        node._statement_info = [matcher, enclosing, None, root]
+
+    return ast._statement_info
+
+
+def _contains_statement(matcher, ast):
+    stack = list(ast.children)
+
+    while len(stack) > 0:
+        node = stack.pop()
+        if matcher(node.type): return True
+        stack.extend(node.children)
+
+    return False
 
 
 def ast_root(ast):
@@ -257,18 +890,58 @@ def ast_root(ast):
     return parent_node
 
 
-def tokenize_tree(ast):
-    tokens = []
+def tokenize_tree(ast, max_length = None):
+    """
+    Joins all tokens of the AST with single spaces
+
+    Parameters
+    ----------
+    ast : ASTNode
+        Root of the subtree that should be tokenized
+
+    max_length : int
+        If given, the output is cut after max_length
+        characters (and marked with ...)
+        Default: None
 
-    # Test if any other statement as child
-    if ast.text: tokens.append(ast.text)
+    """
+    output = io.StringIO()
+    complete = write_tokens(ast, output.write, max_length)
 
-    for child in ast.children:
-        tokens.append(tokenize_tree(child))
-    
-    return " ".join(tokens)
+    text = output.getvalue()
+    return text if complete else text[:max_length] + "..."
 
 
+def write_tokens(ast, write, max_length = None):
+    """
+    Streams the tokens of the AST to the given write function
+
+    Produces the same output as joining the token texts of
+    every node and the outputs of its children with spaces.
+    Returns False if the output was stopped after max_length characters.
+    """
+    length = 0
+    stack  = [(ast, 0)]
+
+    while len(stack) > 0:
+        node, ix = stack.pop()
+
+        if ix == 0 and node.text:
+            write(node.text)
+            length += len(node.text)
+
+        if max_length is not None and length > max_length: return False
+
+        if ix < len(node.children):
+            if ix > 0 or node.text:
+                write(" ")
+                length += 1
+
+            stack.append((node, ix + 1))
+            stack.append((node.children[ix], 0))
+
+    return True
+
 
 def is_compatible_root(root_candidate, source_ast):
     return not equal_text(source_ast, root_candidate) and root_candidate.type != "block"
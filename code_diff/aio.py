@@ -0,0 +1,200 @@
+import sys
+import asyncio
+import functools
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .batch import _init_worker, _resolve_output, _run_single
+
+# Asyncio front-end ----------------------------------------------------------------
+# Diffs of large files block for a long time. To keep an event loop
+# responsive, diffs are computed in an executor and awaited.
+#
+# Cancelling an awaiting task cancels the diff if it has not started yet.
+# Diffs that are already running cannot be interrupted. Their result is
+# discarded and their concurrency slot is released once they finish.
+
+
+class DiffOverloadedError(RuntimeError):
+    """Raised if too many diffs are waiting for a free slot"""
+    pass
+
+
+async def adifference(source, target, lang = "guess", executor = None, **kwargs):
+    """
+    Computes the smallest difference between source and target without blocking the event loop
+
+    Parameters
+    ----------
+    source, target, lang, **kwargs
+        See difference
+
+    executor : concurrent.futures.Executor
+        Executor to run the diff in. Has to be able to return
+        ASTDiff objects (e.g. a thread pool).
+        Default: None (default executor of the event loop)
+
+    Returns
+    -------
+    ASTDiff
+        The smallest code change (see difference)
+
+    """
+    from . import default_differ
+
+    differ = default_differ(lang, **kwargs)
+    loop   = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, differ.difference, source, target)
+
+
+class AsyncDiffer:
+    """
+    Asyncio diff service with bounded concurrency
+
+    At most max_concurrency diffs run at the same time. Further requests
+    wait for a free slot. If max_pending requests are already waiting,
+    new requests are rejected with DiffOverloadedError (backpressure).
+
+    Parameters
+    ----------
+    lang : [python, java, javascript, ...]
+        Programming language of the code snippets
+
+    executor : [thread, process] or concurrent.futures.Executor
+        Executor to compute diffs in. Process workers hold a warm
+        diff session but can only return serialized outputs.
+        Default: thread
+
+    max_workers : int
+        Number of workers of a created executor
+        Default: None (executor default)
+
+    max_concurrency : int
+        Maximal number of diffs running at the same time
+        Default: max_workers or 4
+
+    max_pending : int
+        Maximal number of requests waiting for a slot. None for unbounded.
+        Default: None
+
+    output : [diff, edit_script, sstub, text] or callable
+        Result of difference (see difference_many). Process
+        executors require a serialized output.
+        Default: diff for threads, edit_script for processes
+
+    **kwargs : dict
+        Further options of the diff session (see Differ)
+
+    """
+
+    def __init__(self, lang = "guess", executor = "thread", max_workers = None, max_concurrency = None,
+                    max_pending = None, output = None, **kwargs):
+        if output is None: output = "edit_script" if executor == "process" else "diff"
+
+        self.lang        = lang
+        self.output      = output
+        self.max_pending = max_pending
+        self._output_fn  = _resolve_output(output)
+        self._owned      = isinstance(executor, str)
+        self._process    = executor == "process"
+
+        if executor == "thread":
+            executor = ThreadPoolExecutor(max_workers)
+        elif executor == "process":
+            if self._output_fn is None:
+                raise ValueError("ASTDiff objects cannot be sent between processes. Choose a serialized output.")
+            executor = ProcessPoolExecutor(max_workers, initializer = _init_worker,
+                                            initargs = (lang, kwargs, output))
+        elif isinstance(executor, str):
+            raise ValueError("Unknown executor %r. Choose thread, process or an Executor." % executor)
+
+        if max_concurrency is None: max_concurrency = max_workers or 4
+
+        self.executor        = executor
+        self.max_concurrency = max_concurrency
+
+        self._differ    = None if self._process else _session(lang, kwargs)
+        self._semaphore = None # Created in the event loop of the first request
+        self._futures   = set()
+        self._waiting   = 0
+
+    @property
+    def pending(self):
+        """Number of requests waiting for a free slot"""
+        return self._waiting
+
+    async def _submit(self, fn, *args):
+        if self.max_pending is not None and self._waiting >= self.max_pending:
+            raise DiffOverloadedError("%d diff requests are already waiting" % self._waiting)
+
+        if self._semaphore is None: self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        # The slot is released when the work finished (not when the caller stops waiting)
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        future.add_done_callback(functools.partial(_release, loop, self._semaphore))
+
+        return await asyncio.wrap_future(future, loop = loop)
+
+    async def difference(self, source, target):
+        """Computes the difference between source and target (see difference)"""
+        if self._process: return await self._submit(_run_single, source, target)
+
+        return await self._submit(self._thread_difference, source, target)
+
+    def _thread_difference(self, source, target):
+        diff = self._differ.difference(source, target)
+        return self._output_fn(diff) if self._output_fn is not None else diff
+
+    async def edit_script(self, diff, per_region = False):
+        """Computes the edit script of the given ASTDiff (see ASTDiff.edit_script)"""
+        if self._process:
+            raise ValueError("Edit scripts of ASTDiff objects can only be computed by thread executors.")
+
+        return await self._submit(diff.edit_script, per_region)
+
+    def close(self, wait = True):
+        """Shuts down the executor if it was created by this service"""
+        if not self._owned: return
+
+        if sys.version_info >= (3, 9):
+            self.executor.shutdown(wait = wait, cancel_futures = True)
+            return
+
+        # Python 3.8 does not support cancel_futures
+        for future in list(self._futures): future.cancel()
+        self.executor.shutdown(wait = wait)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.close)
+
+
+def _session(lang, kwargs):
+    from . import Differ
+    return Differ(lang, **kwargs)
+
+
+def _release(loop, semaphore, future):
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # Event loop is already closed
+        pass
@@ -1,6 +1,13 @@
 import code_tokenize as ct
 
-from collections import defaultdict
+from collections import defaultdict, deque
+
+from code_ast.parsers   import ASTParser, match_span
+from code_tokenize.lang import load_from_lang_config
+
+from .hashing    import subtree_hash
+from .traversal  import bfs
+from .instrument import span
 
 # AST Node ----------------------------------------------------------------
 
@@ -29,9 +36,10 @@ class ASTNode(object):
     
     Subtree Attributes
     ------------------
-    subtree_hash : str
-        A hash string representing the subtree of the AST node
-        Two subtrees are isomorph if they have the same subtree hash.
+    subtree_hash : int
+        A 64-bit hash representing the subtree of the AST node
+        (see code_diff.hashing). Two subtrees are isomorph if
+        they have the same subtree hash.
     
     subtree_height : int
         Longest path from this node to a leaf node
@@ -64,27 +72,39 @@ class ASTNode(object):
 
     def sexp(self):
         name = self.text if self.text is not None else self.type
+        if len(self.children) == 0: return name
 
-        child_sexp = []
-        for child in self.children:
-            text = child.sexp()
-            text = ["  " + t for t in text.splitlines()]
-            child_sexp.append("\n".join(text))
-        
-        if len(child_sexp) == 0:
-            return name
+        # Written in preorder with an explicit stack. Every line is indented
+        # by the depth of the node that starts it. The lines of all nodes
+        # below the root are normalized with splitlines.
+        output = [name, " {\n"]
+        stack  = [(None, 0, False)]
+        stack.extend((child, 1, i > 0) for i, child in reversed(list(enumerate(self.children))))
+
+        while len(stack) > 0:
+            node, depth, continued = stack.pop()
+
+            if node is None: # Closes the node opened at depth
+                output.append("\n" + "  " * depth + "}")
+                continue
+
+            if continued: output.append(" ")
+
+            name  = node.text if node.text is not None else node.type
+            lines = (name + " {").splitlines() if len(node.children) > 0 else name.splitlines()
+
+            if len(lines) > 0: output.append("  " + lines[0])
+            for line in lines[1:]: output.append("\n" + "  " * depth + line)
 
-        return "%s {\n%s\n}" % (name, " ".join(child_sexp))
+            if len(node.children) > 0:
+                output.append("\n" + "  " * depth)
+                stack.append((None, depth, False))
+                stack.extend((child, depth + 1, i > 0) for i, child in reversed(list(enumerate(node.children))))
+
+        return "".join(output)
         
     def __iter__(self):
-        def _self_bfs_search():
-            queue = [self]
-            while len(queue) > 0:
-                current = queue.pop(0)
-                yield current
-                queue.extend(current.children)
-
-        return _self_bfs_search()
+        return bfs(self)
 
     def __repr__(self):
         attrs = {"type": self.type, "text": self.text}
@@ -97,26 +117,122 @@ def default_create_node(type, children, text = None, position = None):
     # Subtree metrics
     height = 1
     weight = 1
-    hash_str = []
+    child_hashes = []
 
     for child in children:
         child.parent = new_node # Set parent relation
         height       = max(child.subtree_height + 1, height)
         weight      += child.subtree_weight
-        hash_str.append(str(child.subtree_hash))
+        child_hashes.append(child.subtree_hash)
     
     new_node.subtree_height = height
     new_node.subtree_weight = weight
 
     # WL hash subtree representation
     base_str = new_node.type if new_node.text is None else new_node.text
-    hash_str.insert(0, base_str)
-    hash_str = "_".join(hash_str)
-    new_node.subtree_hash = hash(hash_str)
+    new_node.subtree_hash = subtree_hash(base_str, child_hashes)
 
     return new_node
 
 
+def copy_ast(ast):
+    """
+    Copies the given AST
+
+    The copy shares the backend nodes with the original AST
+    while all ASTNodes (and parent relations) are new. Subtree
+    metrics are copied and not recomputed.
+    """
+    root  = None
+    stack = [(ast, None)]
+
+    while len(stack) > 0:
+        node, parent = stack.pop()
+
+        copy = ASTNode(node.type, text = node.text, position = node.position, parent = parent)
+        copy.subtree_hash   = node.subtree_hash
+        copy.subtree_height = node.subtree_height
+        copy.subtree_weight = node.subtree_weight
+
+        if hasattr(node, "backend"): copy.backend = node.backend
+
+        if parent is None:
+            root = copy
+        else:
+            parent.children.append(copy)
+
+        for child in reversed(node.children):
+            stack.append((child, copy))
+
+    return root
+
+
+# Source buffer ----------------------------------------------------------------
+# The root of a parsed AST keeps a reference to the parsed source code.
+# Source spans of nodes are then memoryview slices of the encoded source
+# (tree-sitter positions are byte based).
+
+class SourceBuffer:
+    """Source code of a parsed AST"""
+
+    def __init__(self, source_code):
+        self.source_code = source_code
+        self._data  = None
+        self._lines = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = memoryview(self.source_code.encode("utf-8"))
+        return self._data
+
+    def _line_offsets(self):
+        if self._lines is None:
+            data   = self.data.obj
+            offset = data.find(b"\n")
+            lines  = [0]
+
+            while offset != -1:
+                lines.append(offset + 1)
+                offset = data.find(b"\n", offset + 1)
+
+            self._lines = lines
+        return self._lines
+
+    def byte_offset(self, point):
+        row, column = point
+        return self._line_offsets()[row] + column
+
+    def span(self, start, end):
+        """
+        Returns the bytes between start and end without copying
+
+        Start and end can be byte offsets or (row, column) points.
+        """
+        if isinstance(start, tuple): start = self.byte_offset(start)
+        if isinstance(end, tuple): end = self.byte_offset(end)
+        return self.data[start:end]
+
+    def text(self, start, end):
+        return str(self.span(start, end), "utf-8")
+
+    def node_span(self, node):
+        return self.span(*node.position)
+
+
+def attach_source(ast, source_code):
+    """Attaches the source code to the root of the AST"""
+    if ast is not None: ast.source_buffer = SourceBuffer(source_code)
+    return ast
+
+
+def source_buffer(node):
+    """Returns the source buffer of the tree containing the node (or None)"""
+    while node.parent is not None:
+        node = node.parent
+    return getattr(node, "source_buffer", None)
+
+
 def _node_key(node):
     return (node.type, node.start_point, node.end_point)
 
@@ -127,7 +243,7 @@ class TokensToAST:
         self.create_node_fn = create_node_fn
 
         self.root_node = None
-        self.waitlist = []
+        self.waitlist = deque()
         self.node_index = {}
         self.child_count = defaultdict(int)
 
@@ -189,7 +305,7 @@ class TokensToAST:
 
         while self.root_node is None:
             while len(self.waitlist) > 0:
-                current_node = self.waitlist.pop(0)
+                current_node = self.waitlist.popleft()
                 self._create_node(current_node)
 
             self._open_root_if_not_complete(current_node)
@@ -205,7 +321,7 @@ class BottomUpParser:
     def __init__(self, create_node_fn):
         
         self.create_node_fn = create_node_fn
-        self.waitlist    = [] # Invariant: All children have been processed
+        self.waitlist    = deque() # Invariant: All children have been processed
         self.open_index  = {} 
         self.node_index  = {} # Nodes that have been processed
 
@@ -244,9 +360,9 @@ class BottomUpParser:
 
     def _open_descandents(self, node):
 
-        queue = [node]
+        queue = deque([node])
         while len(queue) > 0:
-            current_node = queue.pop(0)
+            current_node = queue.popleft()
 
             has_opened = False
             for child in current_node.children:
@@ -284,7 +400,7 @@ class BottomUpParser:
         root_node = self._init_lists(tokens)
 
         while len(self.waitlist) > 0:
-            self._create_node(self.waitlist.pop(0))
+            self._create_node(self.waitlist.popleft())
         
         if _node_key(root_node) not in self.node_index:
             return None
@@ -292,12 +408,159 @@ class BottomUpParser:
         return self.node_index[_node_key(root_node)]
 
 
+
+
+_IGNORED = object()
+_NO_LEAF = object()
+
+
+class TreeCursorParser:
+    """
+    Builds the AST with a single postorder walk over the tree-sitter tree
+
+    Tokens are only used to identify the leaves of the AST (and their text).
+    The parser produces the same AST as the BottomUpParser: comments are
+    skipped and an inner node is only created if all of its non-comment
+    children could be created.
+    """
+
+    def __init__(self, create_node_fn):
+        self.create_node_fn = create_node_fn
+
+    def _should_ignore(self, node):
+        return node.type == "comment"
+
+    def _create_node(self, ast_node, children, text = None):
+        position = (ast_node.start_point, ast_node.end_point)
+        current_node = self.create_node_fn(ast_node.type, children, text = text, position = position)
+        current_node.backend = ast_node
+        return current_node
+
+    def _reuse_node(self, ast_node):
+        # Hook for subclasses to provide an already processed subtree
+        return None
+
+    def __call__(self, tokens, root = None):
+        token_index = {}
+
+        for token in tokens:
+            if not hasattr(token, 'ast_node'): continue
+            if root is None: root = token.ast_node
+            if self._should_ignore(token.ast_node): continue
+            token_index[token.ast_node] = token
+
+        if root is None: return None
+
+        def leaf_text(ast_node):
+            try:
+                return token_index[ast_node].text
+            except KeyError:
+                return _NO_LEAF
+
+        return self._walk(root, leaf_text)
+
+    def _walk(self, root, leaf_text):
+        while root.parent is not None:
+            root = root.parent
+
+        cursor = root.walk()
+        frames = [] # Created children and completeness of all open nodes
+
+        while True:
+            ast_node = cursor.node
+            current  = self._reuse_node(ast_node)
+
+            if current is None:
+                text = leaf_text(ast_node)
+
+                if text is not _NO_LEAF:
+                    current = self._create_node(ast_node, [], text)
+                elif self._should_ignore(ast_node):
+                    current = _IGNORED
+                elif cursor.goto_first_child():
+                    frames.append([[], True])
+                    continue
+                else:
+                    current = self._create_node(ast_node, [])
+
+            # Close all nodes whose children have been processed
+            while True:
+                if len(frames) == 0:
+                    return current if current is not _IGNORED else None
+
+                frame = frames[-1]
+                if current is None:
+                    frame[1] = False
+                elif current is not _IGNORED:
+                    frame[0].append(current)
+
+                if cursor.goto_next_sibling(): break
+
+                cursor.goto_parent()
+                children, complete = frames.pop()
+
+                if complete and len(children) > 0:
+                    current = self._create_node(cursor.node, children)
+                else:
+                    current = None
+
+
+# Native parser ----------------------------------------------------------------
+# code_tokenize materializes a token object for every leaf of the
+# tree-sitter tree. As we only need to know which nodes are leaves (and
+# their text), we can directly walk the tree-sitter tree instead.
+# The leaf rules replicate the leaf visitors of code_tokenize.
+
+
+def _is_leaf(node):
+    return node.child_count == 0 or node.type == "string"
+
+
+def _is_python_leaf(node):
+    if node.type == "unary_operator":
+        return node.children[-1].type == "integer"
+    return _is_leaf(node)
+
+
+NATIVE_LEAF_RULES = {
+    "python"    : _is_python_leaf,
+    "java"      : _is_leaf,
+    "javascript": _is_leaf,
+}
+
+
+def supports_native(lang, **kwargs):
+    """Whether ASTs for the given language (and options) can be built natively"""
+    return lang in NATIVE_LEAF_RULES and "visitors" not in kwargs
+
+
+class NativeTreeParser(TreeCursorParser):
+    """
+    Builds the AST directly from a tree-sitter tree (without tokens)
+
+    Produces the same AST as the TreeCursorParser applied to the
+    tokens of code_tokenize.
+    """
+
+    def __init__(self, create_node_fn, is_leaf = _is_leaf):
+        super().__init__(create_node_fn)
+        self.is_leaf = is_leaf
+
+    def __call__(self, root, code_lines):
+        is_leaf = self.is_leaf
+
+        def leaf_text(ast_node):
+            if ast_node.type == "comment" or not is_leaf(ast_node): return _NO_LEAF
+            return match_span(ast_node, code_lines)
+
+        return self._walk(root, leaf_text)
+
     
 
 # Interface ----------------------------------------------------------------
 
 
-def parse_ast(source_code, lang = "guess", **kwargs):
+def parse_ast(source_code, lang = "guess", compact = False, cache = None, native = False, **kwargs):
     """
     Parses a given source code string into its AST
 
@@ -316,17 +579,86 @@ def parse_ast(source_code, lang = "guess", **kwargs):
         Language to parse the given source code
         Default: guess (Currently not supported; will raise error)
 
+    compact : bool
+        Whether to store the AST in a compact array based
+        representation (see code_diff.compact). The returned
+        root node is then a view on the compact tree.
+        Default: False
+
+    cache : ParseCache | bool
+        Parse cache which is used to load previously parsed ASTs
+        (see code_diff.cache). If None, the global parse cache is used
+        if enabled. Set to False to disable caching.
+        Default: None
+
+    native : bool
+        Whether the AST should be built directly from the
+        tree-sitter tree without materializing the tokens of
+        code_tokenize. Produces the same AST. Only supported for
+        some languages (see NATIVE_LEAF_RULES); other languages
+        are parsed via tokens.
+        Default: False
+
     Returns
     -------
     ASTNode
         the root node of the computed AST
     
     """
-    
-    # Parse AST 
-    kwargs["lang"] = lang
-    kwargs["syntax_error"] = "ignore"
 
-    ast_tokens = ct.tokenize(source_code, **kwargs)
-    
-    return BottomUpParser(default_create_node)(ast_tokens)
\ No newline at end of file
+    if cache is None:
+        from .cache import default_parse_cache
+        cache = default_parse_cache()
+
+    if cache is not None and cache is not False:
+        def parse_fn(source_code):
+            return parse_ast(source_code, lang = lang, compact = compact, cache = False, native = native, **kwargs)
+
+        return cache.parse(source_code, lang = lang, compact = compact, parse_fn = parse_fn, **kwargs)
+
+    with span("parse", lang):
+        if native and supports_native(lang, **kwargs):
+            if len(source_code.strip()) == 0:
+                raise ValueError("The code string is empty. Cannot tokenize anything empty: %s" % source_code)
+
+            config = load_from_lang_config(lang, **kwargs)
+            with span("tree_sitter"):
+                tree, code_lines = ASTParser(config.lang).parse(source_code)
+
+            ast = build_native_ast(tree.root_node, code_lines, lang, compact = compact)
+            return attach_source(ast, source_code)
+        
+        # Parse AST 
+        kwargs["lang"] = lang
+        kwargs["syntax_error"] = "ignore"
+
+        # Includes parsing with tree-sitter
+        with span("tokenize"):
+            ast_tokens = ct.tokenize(source_code, **kwargs)
+
+        return attach_source(build_ast(ast_tokens, compact = compact), source_code)
+
+
+def build_ast(ast_tokens, compact = False):
+    """Builds the AST for a sequence of tokens (see parse_ast)"""
+    return _build(lambda create_node_fn: TreeCursorParser(create_node_fn)(ast_tokens), compact)
+
+
+def build_native_ast(root, code_lines, lang, compact = False):
+    """Builds the AST directly from a tree-sitter tree (see parse_ast)"""
+    is_leaf = NATIVE_LEAF_RULES[lang]
+    return _build(lambda create_node_fn: NativeTreeParser(create_node_fn, is_leaf)(root, code_lines), compact)
+
+
+def _build(parse_fn, compact):
+    with span("build_ast") as stage:
+        if compact:
+            from .compact import CompactASTBuilder
+            builder = CompactASTBuilder()
+            ast = builder.finalize(parse_fn(builder))
+        else:
+            ast = parse_fn(default_create_node)
+
+        if ast is not None: stage.set(nodes = ast.subtree_weight)
+
+    return ast
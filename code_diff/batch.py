@@ -0,0 +1,241 @@
+import os
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .gumtree import serialize_script
+
+# Batch processing ----------------------------------------------------------------
+# Diffs of many (source, target) pairs are computed in a pool of worker
+# processes. Every worker holds a warm diff session (parser, config and
+# statement matcher) for its lifetime. Pairs are sent in chunks and only
+# a bounded number of chunks is in flight at any time. Therefore, the
+# input can be an arbitrarily long iterator.
+#
+# ASTs reference tree-sitter nodes which cannot be pickled. Workers
+# therefore only return serialized outputs (see OUTPUTS).
+
+
+def _edit_script(diff):
+    return serialize_script(diff.edit_script())
+
+
+def _sstub(diff):
+    return diff.sstub_pattern().name
+
+
+def _text(diff):
+    return repr(diff)
+
+
+OUTPUTS = {
+    "edit_script": _edit_script,
+    "sstub"      : _sstub,
+    "text"       : _text,
+}
+
+
+class BatchResult:
+    """
+    Result of a single pair in a batch
+
+    Attributes
+    ----------
+    index : int
+        Position of the pair in the input
+
+    value : Any
+        Output for the pair (None if the diff failed)
+
+    error : str
+        Type and message of the raised exception (None if successful)
+
+    """
+
+    __slots__ = ("index", "value", "error")
+
+    def __init__(self, index, value = None, error = None):
+        self.index = index
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __getstate__(self):
+        return (self.index, self.value, self.error)
+
+    def __setstate__(self, state):
+        self.index, self.value, self.error = state
+
+    def __repr__(self):
+        if self.ok: return "BatchResult(%d, %r)" % (self.index, self.value)
+        return "BatchResult(%d, error = %r)" % (self.index, self.error)
+
+
+def _resolve_output(output):
+    if callable(output): return output
+    if output == "diff": return None
+
+    try:
+        return OUTPUTS[output]
+    except KeyError:
+        raise ValueError("Unknown output %r. Choose one of diff, %s" % (output, ", ".join(OUTPUTS)))
+
+
+def _run_pair(differ, output_fn, index, source, target):
+    try:
+        diff = differ.difference(source, target)
+        return BatchResult(index, output_fn(diff) if output_fn is not None else diff)
+    except Exception as e:
+        return BatchResult(index, error = "%s: %s" % (e.__class__.__name__, e))
+
+
+# Worker state ----------------------------------------------------------------
+
+_WORKER_STATE = None
+
+
+def _init_worker(lang, kwargs, output):
+    global _WORKER_STATE
+    from . import Differ
+
+    _WORKER_STATE = (Differ(lang, **kwargs), _resolve_output(output))
+
+
+def _run_chunk(chunk):
+    differ, output_fn = _WORKER_STATE
+    return [_run_pair(differ, output_fn, *item) for item in chunk]
+
+
+def _run_single(source, target):
+    differ, output_fn = _WORKER_STATE
+    return output_fn(differ.difference(source, target))
+
+
+def _chunks(pairs, chunksize):
+    chunk = []
+    for index, (source, target) in enumerate(pairs):
+        chunk.append((index, source, target))
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+
+    if len(chunk) > 0: yield chunk
+
+
+# API ----------------------------------------------------------------
+
+def difference_many(pairs, lang = "guess", workers = None, chunksize = 16, ordered = True,
+                        output = "edit_script", max_pending = None, **kwargs):
+    """
+    Computes the difference of many (source, target) pairs in parallel
+
+    Parameters
+    ----------
+    pairs : Iterable[Tuple[str, str]]
+        Pairs of source and target code. Consumed lazily.
+
+    lang : [python, java, javascript, ...]
+        Programming language of all code snippets
+
+    workers : int
+        Number of worker processes. If 1, pairs are diffed
+        in the current process.
+        Default: number of CPUs
+
+    chunksize : int
+        Number of pairs sent to a worker at once
+        Default: 16
+
+    ordered : bool
+        Whether results are yielded in input order. Otherwise,
+        results are yielded as soon as their chunk completes.
+        Default: True
+
+    output : [edit_script, sstub, text, diff] or callable
+        Output computed for each diff. edit_script returns the
+        serialized edit script, sstub the name of the SStuB pattern
+        and text the representation of the diff. Callables are
+        applied to the ASTDiff in the worker (and have to be picklable).
+        ASTDiff objects (diff) can only be returned if workers is 1.
+        Default: edit_script
+
+    max_pending : int
+        Maximal number of chunks in flight
+        Default: 4 * workers
+
+    **kwargs : dict
+        Further options of the diff session (see Differ)
+
+    Returns
+    -------
+    Iterator[BatchResult]
+        One result per pair. Failures (e.g. identical ASTs) are
+        reported per item and do not stop the batch.
+
+    """
+    if workers is None: workers = os.cpu_count() or 1
+    if chunksize < 1: raise ValueError("Chunk size has to be positive, got %d" % chunksize)
+
+    output_fn = _resolve_output(output)
+
+    if workers <= 1:
+        return _difference_inline(pairs, lang, output_fn, kwargs)
+
+    if output_fn is None:
+        raise ValueError("ASTDiff objects cannot be sent between processes. Choose a serialized output or workers = 1.")
+
+    if max_pending is None: max_pending = 4 * workers
+
+    return _difference_pool(pairs, lang, workers, chunksize, ordered, output, max_pending, kwargs)
+
+
+def _difference_inline(pairs, lang, output_fn, kwargs):
+    from . import Differ
+    differ = Differ(lang, **kwargs)
+
+    for index, (source, target) in enumerate(pairs):
+        yield _run_pair(differ, output_fn, index, source, target)
+
+
+def _difference_pool(pairs, lang, workers, chunksize, ordered, output, max_pending, kwargs):
+    chunks = _chunks(pairs, chunksize)
+
+    with ProcessPoolExecutor(workers, initializer = _init_worker, initargs = (lang, kwargs, output)) as pool:
+        pending   = {}
+        completed = {}
+        next_chunk, next_yield = 0, 0
+        exhausted = False
+
+        try:
+            while True:
+                # Completed chunks that wait for their predecessors count as in flight
+                while not exhausted and len(pending) + len(completed) < max_pending:
+                    chunk = next(chunks, None)
+
+                    if chunk is None:
+                        exhausted = True
+                    else:
+                        pending[pool.submit(_run_chunk, chunk)] = next_chunk
+                        next_chunk += 1
+
+                if len(pending) == 0: break
+
+                done, _ = wait(pending, return_when = FIRST_COMPLETED)
+
+                for future in done:
+                    chunk_index = pending.pop(future)
+                    results     = future.result()
+
+                    if not ordered:
+                        yield from results
+                    else:
+                        completed[chunk_index] = results
+
+                while next_yield in completed:
+                    yield from completed.pop(next_yield)
+                    next_yield += 1
+        finally:
+            # Generator was closed early (or failed): drop queued chunks
+            for future in pending: future.cancel()
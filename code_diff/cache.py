@@ -0,0 +1,223 @@
+import threading
+
+from collections import OrderedDict
+from hashlib     import blake2b
+
+from .ast     import parse_ast, copy_ast, attach_source
+from .compact import CompactNode
+from .hashing import get_hash_engine
+from .store   import store_key
+
+# Parse cache ----------------------------------------------------------------
+# The same file content is often parsed many times (e.g. a file
+# is the target of one diff and the source of the next one).
+# The parse cache stores parsed ASTs under a digest of the source code.
+#
+# Cached ASTs are never handed out directly since diff computations
+# temporarily modify the AST (e.g. parent pointers). Instead, a copy
+# of the AST is returned which is considerably cheaper than parsing.
+
+
+class CacheStats:
+
+    def __init__(self):
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+        self.loads     = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def __repr__(self):
+        return "CacheStats(hits=%d, misses=%d, evictions=%d, loads=%d)" % (
+            self.hits, self.misses, self.evictions, self.loads
+        )
+
+
+class _CacheEntry:
+
+    def __init__(self, ast, num_bytes):
+        self.ast       = ast
+        self.num_nodes = ast.subtree_weight if ast is not None else 0
+        self.num_bytes = num_bytes
+
+
+class ParseCache:
+    """
+    Content addressed LRU cache for parsed ASTs
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximal number of cached ASTs (None for no limit)
+
+    max_nodes : int
+        Maximal number of AST nodes over all cached ASTs (None for no limit)
+
+    max_bytes : int
+        Maximal size of the source code (in bytes) over all cached ASTs
+        (None for no limit)
+
+    store : DirectoryStore | SQLiteStore
+        Persistent store (see code_diff.store) that is consulted
+        before parsing and that receives all newly parsed ASTs.
+        ASTs loaded from a store have no tree-sitter backend.
+        Default: None
+
+    """
+
+    def __init__(self, max_entries = None, max_nodes = 1000000, max_bytes = None, store = None):
+        self.max_entries = max_entries
+        self.max_nodes   = max_nodes
+        self.max_bytes   = max_bytes
+        self.store       = store
+
+        self.stats     = CacheStats()
+        self.num_nodes = 0
+        self.num_bytes = 0
+
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cache_key(self, source_code, lang, compact = False, **kwargs):
+        digest = blake2b(source_code.encode("utf-8"), digest_size = 16).digest()
+        engine = getattr(get_hash_engine(), "name", repr(get_hash_engine()))
+        return (lang, digest, compact, engine, repr(sorted(kwargs.items())))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry
+
+    def put(self, key, ast, num_bytes = 0):
+        with self._lock:
+            if key in self._entries: return
+
+            entry = _CacheEntry(ast, num_bytes)
+            self._entries[key] = entry
+            self.num_nodes += entry.num_nodes
+            self.num_bytes += entry.num_bytes
+
+            self._evict()
+
+    def _over_budget(self):
+        if self.max_entries is not None and len(self._entries) > self.max_entries: return True
+        if self.max_nodes is not None and self.num_nodes > self.max_nodes: return True
+        if self.max_bytes is not None and self.num_bytes > self.max_bytes: return True
+        return False
+
+    def _evict(self):
+        while len(self._entries) > 0 and self._over_budget():
+            _, entry = self._entries.popitem(last = False)
+            self.num_nodes -= entry.num_nodes
+            self.num_bytes -= entry.num_bytes
+            self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.num_nodes = 0
+            self.num_bytes = 0
+
+    def parse(self, source_code, lang = "guess", compact = False, share = False, parse_fn = None, **kwargs):
+        """
+        Parses the given source code or loads the AST from cache
+
+        Accepts the same arguments as parse_ast.
+
+        share : bool
+            Whether the cached AST should be returned directly.
+            Only safe if the AST is never passed to a diff computation
+            that modifies the AST and if the AST is not used concurrently.
+            Default: False (returns a copy of the cached AST)
+
+        parse_fn : callable(source_code) -> ASTNode
+            Function that parses the source code on a cache miss.
+            Has to be consistent with lang, compact and kwargs.
+            Default: None (uses parse_ast)
+
+        """
+        key   = self.cache_key(source_code, lang, compact, **kwargs)
+        entry = self.get(key)
+
+        if entry is None:
+            ast = self._load_or_parse(source_code, lang, compact, parse_fn, **kwargs)
+            self.put(key, ast, len(source_code.encode("utf-8")))
+        else:
+            ast = entry.ast
+
+        if ast is None: return None
+
+        if not compact and isinstance(ast, CompactNode):
+            ast = copy_ast(ast) # Loaded from the store, materialized on request
+        elif not share:
+            ast = _copy(ast)
+
+        return attach_source(ast, source_code)
+
+    def _load_or_parse(self, source_code, lang, compact, parse_fn, **kwargs):
+        if parse_fn is None:
+            def parse_fn(source_code):
+                return parse_ast(source_code, lang = lang, compact = compact, cache = False, **kwargs)
+
+        if self.store is None: return parse_fn(source_code)
+
+        key = store_key(source_code, lang, **kwargs)
+        ast = self.store.get(key)
+
+        if ast is None:
+            ast = parse_fn(source_code)
+            if ast is not None: self.store.put(key, ast)
+            return ast
+
+        self.stats.loads += 1
+        return ast
+
+
+def _copy(ast):
+    if isinstance(ast, CompactNode):
+        return ast.tree.copy().root_node()
+    return copy_ast(ast)
+
+
+# Default cache ----------------------------------------------------------------
+
+_DEFAULT_CACHE = None
+
+
+def enable_parse_cache(**kwargs):
+    """
+    Enables a global parse cache that is used by parse_ast and difference
+
+    Accepts the same arguments as ParseCache.
+
+    Returns
+    -------
+    ParseCache
+        the enabled parse cache
+    """
+    global _DEFAULT_CACHE
+    _DEFAULT_CACHE = ParseCache(**kwargs)
+    return _DEFAULT_CACHE
+
+
+def disable_parse_cache():
+    global _DEFAULT_CACHE
+    _DEFAULT_CACHE = None
+
+
+def default_parse_cache():
+    return _DEFAULT_CACHE
@@ -0,0 +1,57 @@
+from enum import Enum
+
+# Change classification ----------------------------------------------------------------
+# Many code changes only touch whitespace or comments. These changes
+# can be detected on the token streams of both snippets without
+# building and diffing ASTs.
+#
+# Token streams are compared without comments. Layout tokens that are
+# part of the syntax (e.g. newline, indent and dedent in Python) are kept.
+
+
+class ChangeKind(Enum):
+    IDENTICAL  = 0
+    FORMATTING = 1
+    STRUCTURAL = 2
+
+
+class ChangeResult:
+    """
+    Classification of a code change
+
+    Attributes
+    ----------
+    kind : ChangeKind
+        IDENTICAL if both code strings are equal, FORMATTING if
+        both only differ in whitespace or comments and STRUCTURAL otherwise
+
+    diff : ASTDiff
+        The smallest code change (only for STRUCTURAL changes)
+
+    """
+
+    __slots__ = ("kind", "diff")
+
+    def __init__(self, kind, diff = None):
+        self.kind = kind
+        self.diff = diff
+
+    @property
+    def changed(self):
+        return self.kind == ChangeKind.STRUCTURAL
+
+    def __bool__(self):
+        return self.changed
+
+    def __repr__(self):
+        if self.diff is None: return "ChangeResult(%s)" % self.kind.name
+        return "ChangeResult(%s, %r)" % (self.kind.name, self.diff)
+
+
+def is_comment(token):
+    return token.type.endswith("comment")
+
+
+def token_signature(tokens):
+    """Comparable signature of a token stream (comments are ignored)"""
+    return [(token.type, token.text) for token in tokens if not is_comment(token)]
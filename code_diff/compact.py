@@ -0,0 +1,310 @@
+from array import array
+
+from .ast     import ASTNode
+from .hashing import subtree_hash
+
+# Compact AST ----------------------------------------------------------------
+# A struct-of-arrays representation of a complete AST.
+# Nodes are identified by their index into the arrays. Parent / child
+# relations are stored as index arrays (first child, next sibling),
+# positions are packed into a single integer per point and node types
+# and texts are interned in string tables.
+#
+# The compact tree is only a storage format. Algorithms access the tree
+# through CompactNode views that behave like ASTNodes.
+
+
+_NO_NODE = -1
+_UNSET   = object()
+_COL_BITS = 32
+_COL_MASK = (1 << _COL_BITS) - 1
+
+
+def _pack_point(point):
+    return (point[0] << _COL_BITS) | point[1]
+
+
+def _unpack_point(value):
+    return (value >> _COL_BITS, value & _COL_MASK)
+
+
+class CompactAST:
+    """
+    Array backed storage of an AST
+
+    Attributes
+    ----------
+    parents, first_child, next_sibling : array[int]
+        Tree structure as node indices (-1 if not existent)
+
+    types, texts : array[int]
+        Indices into the type_table and text_table (-1 if no text)
+
+    starts, ends : array[int]
+        Start and end point of each node packed as (row << 32 | column)
+
+    hashes, heights, weights : array[int]
+        Subtree metrics of each node
+
+    root : int
+        Index of the root node
+
+    backend : tree-sitter node
+        Root node of the tree-sitter tree (if available). Used to
+        resolve backend nodes on demand.
+
+    """
+
+    def __init__(self):
+        self.parents      = array("i")
+        self.first_child  = array("i")
+        self.next_sibling = array("i")
+
+        self.types = array("i")
+        self.texts = array("i")
+
+        self.starts = array("Q")
+        self.ends   = array("Q")
+
+        self.hashes  = array("Q")
+        self.heights = array("i")
+        self.weights = array("i")
+
+        self.type_table = []
+        self.text_table = []
+        self.root       = _NO_NODE
+        self.backend    = None
+
+        self._type_index = {}
+        self._text_index = {}
+        self._views      = {}
+
+    def __len__(self):
+        return len(self.types)
+
+    # Construction ----------------------------------------------------------
+
+    def _intern(self, table, index, value):
+        try:
+            return index[value]
+        except KeyError:
+            index[value] = len(table)
+            table.append(value)
+            return index[value]
+
+    def add_node(self, type, children, text = None, position = None):
+        node_id = len(self.types)
+
+        self.parents.append(_NO_NODE)
+        self.first_child.append(children[0] if len(children) > 0 else _NO_NODE)
+        self.next_sibling.append(_NO_NODE)
+
+        self.types.append(self._intern(self.type_table, self._type_index, type))
+        self.texts.append(self._intern(self.text_table, self._text_index, text) if text is not None else _NO_NODE)
+
+        if position is None: position = ((0, 0), (0, 0))
+        self.starts.append(_pack_point(position[0]))
+        self.ends.append(_pack_point(position[1]))
+
+        # Subtree metrics
+        height = 1
+        weight = 1
+        child_hashes = []
+
+        for i, child in enumerate(children):
+            self.parents[child] = node_id
+            if i + 1 < len(children): self.next_sibling[child] = children[i + 1]
+
+            height = max(self.heights[child] + 1, height)
+            weight += self.weights[child]
+            child_hashes.append(self.hashes[child])
+
+        self.heights.append(height)
+        self.weights.append(weight)
+        self.hashes.append(subtree_hash(type if text is None else text, child_hashes))
+
+        return node_id
+
+    def finalize(self, root):
+        self.root = root
+        self._type_index = None
+        self._text_index = None
+
+    # Access ----------------------------------------------------------------
+
+    def children_of(self, node_id):
+        child = self.first_child[node_id]
+        while child != _NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+    def node(self, node_id):
+        """Returns the (unique) view for the given node index"""
+        try:
+            return self._views[node_id]
+        except KeyError:
+            view = CompactNode(self, node_id)
+            self._views[node_id] = view
+            return view
+
+    def root_node(self):
+        if self.root == _NO_NODE: return None
+        return self.node(self.root)
+
+    def copy(self):
+        """Copies the tree structure. String tables and backend are shared."""
+        output = CompactAST()
+
+        for name in ["parents", "first_child", "next_sibling", "types", "texts",
+                      "starts", "ends", "hashes", "heights", "weights"]:
+            setattr(output, name, getattr(self, name)[:])
+
+        output.type_table = self.type_table
+        output.text_table = self.text_table
+        output.backend    = self.backend
+        output.finalize(self.root)
+
+        return output
+
+    def release_views(self):
+        """Drops all materialized node views"""
+        self._views = {}
+
+    def _resolve_backend(self, node_id):
+        if self.backend is None: return None
+
+        start, end = _unpack_point(self.starts[node_id]), _unpack_point(self.ends[node_id])
+        node_type  = self.type_table[self.types[node_id]]
+
+        candidate = self.backend.descendant_for_point_range(start, end)
+        while candidate is not None:
+            if (candidate.type == node_type
+                    and tuple(candidate.start_point) == start
+                    and tuple(candidate.end_point) == end):
+                break
+            candidate = candidate.parent
+
+        return candidate
+
+
+class CompactNode(ASTNode):
+    """
+    Lightweight view on a node inside a CompactAST
+
+    Exposes the same attributes as an ASTNode. Views are unique
+    per node index (see CompactAST.node). Therefore, views can be
+    compared by identity and used as dictionary keys.
+    """
+
+    def __init__(self, tree, index):
+        self.tree  = tree
+        self.index = index
+
+        self._parent   = _UNSET
+        self._children = None
+
+    @property
+    def type(self):
+        return self.tree.type_table[self.tree.types[self.index]]
+
+    @property
+    def text(self):
+        text_id = self.tree.texts[self.index]
+        if text_id == _NO_NODE: return None
+        return self.tree.text_table[text_id]
+
+    @property
+    def position(self):
+        return (_unpack_point(self.tree.starts[self.index]), _unpack_point(self.tree.ends[self.index]))
+
+    @property
+    def parent(self):
+        if self._parent is _UNSET:
+            parent_id = self.tree.parents[self.index]
+            return self.tree.node(parent_id) if parent_id != _NO_NODE else None
+        return self._parent
+
+    @parent.setter
+    def parent(self, value):
+        self._parent = value
+
+    @property
+    def children(self):
+        if self._children is None:
+            self._children = [self.tree.node(c) for c in self.tree.children_of(self.index)]
+        return self._children
+
+    @property
+    def backend(self):
+        backend = self.tree._resolve_backend(self.index)
+        if backend is None: raise AttributeError("backend")
+        return backend
+
+    @property
+    def subtree_hash(self):
+        return self.tree.hashes[self.index]
+
+    @property
+    def subtree_height(self):
+        return self.tree.heights[self.index]
+
+    @property
+    def subtree_weight(self):
+        return self.tree.weights[self.index]
+
+
+# Construction -----------------------------------------------------------------
+
+class _PendingNode:
+    """Handle returned to the AST parser while building a compact tree"""
+    __slots__ = ("index", "backend")
+
+    def __init__(self, index):
+        self.index   = index
+        self.backend = None
+
+
+class CompactASTBuilder:
+    """
+    Node factory to construct a CompactAST with an AST parser
+
+    Can be used as a replacement of default_create_node.
+    """
+
+    def __init__(self):
+        self.tree = CompactAST()
+
+    def __call__(self, type, children, text = None, position = None):
+        index = self.tree.add_node(type, [c.index for c in children], text = text, position = position)
+        return _PendingNode(index)
+
+    def finalize(self, root_handle, keep_backend = True):
+        if root_handle is None: return None
+
+        self.tree.finalize(root_handle.index)
+        if keep_backend: self.tree.backend = root_handle.backend
+
+        return self.tree.root_node()
+
+
+def compact_tree(ast):
+    """Converts an ASTNode tree into a CompactAST and returns the root view"""
+
+    builder = CompactASTBuilder()
+    handles = {}
+
+    stack = [(ast, False)]
+    while len(stack) > 0:
+        node, expanded = stack.pop()
+
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((c, False) for c in reversed(node.children))
+            continue
+
+        handle = builder(node.type, [handles.pop(c) for c in node.children],
+                          text = node.text, position = node.position)
+        handle.backend = getattr(node, "backend", None)
+        handles[node] = handle
+
+    return builder.finalize(handles[ast])
@@ -1,30 +1,81 @@
-from .isomap   import gumtree_isomap
+from copy import copy
+
+from .isomap   import gumtree_isomap, TopDownMatcher
 from .editmap  import gumtree_editmap
 from .chawathe import compute_chawathe_edit_script
 from .ops      import (Update, Insert, Delete, Move)
 from .ops      import EditScript
 from .ops      import serialize_script, deserialize_script
 from .ops      import json_serialize, json_deserialize
+from .stats    import EditStats
+from .utils    import NodeMapping, NodeMultiMapping, restrict_mapping
+
+from ..instrument import span
 
 # Edit script ----------------------------------------------------------------
 
-def compute_edit_script(source_ast, target_ast, min_height = 1, max_size = 1000, min_dice = 0.5):
+def compute_edit_script(source_ast, target_ast, min_height = 1, max_size = 1000, min_dice = 0.5,
+                            stats = None, mapping = None):
 
     # If source_ast and target_ast only leaves
     if len(source_ast.children) == 0 and len(target_ast.children) == 0:
         return EditScript([_update_leaf(source_ast, target_ast)])
 
-    isomap = gumtree_isomap(source_ast, target_ast, min_height)
+    # Isomorphic trees are mapped completely by the isomap (nothing to edit)
+    if source_ast.isomorph(target_ast):
+        return EditScript([])
 
-    while len(isomap) == 0 and min_height > 0:
-        min_height -= 1
-        isomap = gumtree_isomap(source_ast, target_ast, min_height)
+    if mapping is None:
+        mapping = compute_edit_mapping(source_ast, target_ast, min_height, max_size, min_dice, stats)
+    else:
+        # The edit script computation extends the mapping
+        mapping = copy(mapping)
 
-    editmap = gumtree_editmap(isomap, source_ast, target_ast, max_size, min_dice)
-    editscript = compute_chawathe_edit_script(editmap, source_ast, target_ast)
+    with span("chawathe", nodes = source_ast.subtree_weight + target_ast.subtree_weight) as stage:
+        editscript = compute_chawathe_edit_script(mapping, source_ast, target_ast, stats)
+        stage.set(operations = len(editscript))
     
     return EditScript(editscript)
 
+
+def compute_edit_mapping(source_ast, target_ast, min_height = 1, max_size = 1000, min_dice = 0.5, stats = None):
+    """Maps the nodes of source and target with GumTree (isomap followed by editmap)"""
+    nodes = source_ast.subtree_weight + target_ast.subtree_weight
+
+    with span("isomap", nodes = nodes) as stage:
+        matcher = TopDownMatcher(source_ast, target_ast, stats)
+        isomap  = matcher.match(min_height)
+
+        # Retries continue the descent of the previous (empty) match
+        while len(isomap) == 0 and min_height > 0:
+            min_height -= 1
+            isomap = matcher.match(min_height)
+            if stats is not None: stats.count("isomap.min_height_retries")
+
+        stage.set(min_height = min_height, mappings = len(isomap))
+
+    if _skip_editmap(isomap, source_ast, target_ast):
+        # The editmap would only map the roots onto each other
+        isomap.replace(source_ast, target_ast)
+        return isomap
+
+    with span("editmap", nodes = nodes) as stage:
+        editmap = gumtree_editmap(isomap, source_ast, target_ast, max_size, min_dice, stats)
+        stage.set(mappings = len(editmap))
+
+    return editmap
+
+
+
+def _skip_editmap(isomap, source_ast, target_ast):
+    # The editmap cannot extend the isomap if
+    # (1) the isomap maps all nodes of both trees or
+    # (2) the source is a single leaf: only the root is considered (and mapped onto the target root)
+    # (3) the target is a single leaf without parent: no target node besides the root can be matched
+    if len(isomap) == source_ast.subtree_weight == target_ast.subtree_weight: return True
+    if len(source_ast.children) == 0: return True
+    return len(target_ast.children) == 0 and target_ast.parent is None
+
     
 # Update leaf ----------------------------------------------------------------
 
@@ -5,13 +5,24 @@ from .utils import bfs_traversal, postorder_traversal
 
 # API method ----------------------------------------------------------------
 
-def compute_chawathe_edit_script(editmap, source, target):
-
-    edit_script = []
+def compute_chawathe_edit_script(editmap, source, target, stats = None):
 
     source_root, source_parent = _fake_root(source)
     target_root, target_parent = _fake_root(target)
-    editmap.add(source_root, target_root)
+
+    try:
+        return _compute_edit_script(editmap, source, target, source_root, target_root, stats)
+    finally:
+        # Change root back after edit
+        source.parent = source_parent
+        target.parent = target_parent
+
+
+def _compute_edit_script(editmap, source, target, source_root, target_root, stats = None):
+
+    edit_script = []
+
+    editmap.replace(source_root, target_root)
 
     wt = WorkingTree(editmap)
     wt[source].mod_parent = wt[source_root] # Inject fake root only for working copy
@@ -49,7 +60,7 @@ def compute_chawathe_edit_script(editmap, source, target):
             
             partner_parent = source_partner.parent
 
-            if not editmap[partner_parent.delegate, parent]:
+            if not editmap.is_mapped(partner_parent.delegate, parent):
                 k = wt.position(target_node)
                 op = Move(
                     parent_partner.delegate,
@@ -60,7 +71,7 @@ def compute_chawathe_edit_script(editmap, source, target):
                 parent_partner.apply(op)
         
         target_node.inorder = True
-        for move in _align_children(wt.partner(target_node), target_node, wt):
+        for move in _align_children(wt.partner(target_node), target_node, wt, stats):
             edit_script.append(move)
 
     for node in postorder_traversal(source):
@@ -71,16 +82,13 @@ def compute_chawathe_edit_script(editmap, source, target):
             edit_script.append(op)
             node.apply(op)
 
-    # Change root back after edit
-    source.parent = source_parent
-    target.parent = target_parent
-
     return edit_script
 
 
 # Alignment ------------------------------------------------------------------
 
-def _longest_common_subsequence(source, target, equal_fn):
+def _longest_common_subsequence(source, target, equal_fn, stats = None):
+    if stats is not None: stats.observe("chawathe.lcs", len(source) * len(target))
 
     lengths = [[0] * (len(target)+1) for _ in range(len(source)+1)]
     for i, x in enumerate(source):
@@ -116,7 +124,7 @@ def _longest_common_subsequence(source, target, equal_fn):
     return result[::-1]
 
 
-def _align_children(source, target, wt):
+def _align_children(source, target, wt, stats = None):
     for c in source.children: c.inorder = False
     for c in target.children: c.inorder = False
 
@@ -128,7 +136,7 @@ def _align_children(source, target, wt):
     S1 = [c for c in source.children if _partner_child(c, target)]
     S2 = [c for c in target.children if _partner_child(c, source, True)]
 
-    S = _longest_common_subsequence(S1, S2, lambda x, y: wt.isomap[x.delegate, y])
+    S = _longest_common_subsequence(S1, S2, lambda x, y: wt.isomap.is_mapped(x.delegate, y), stats)
 
     SM = set()
 
@@ -138,7 +146,7 @@ def _align_children(source, target, wt):
         SM.add((a, b))
 
     for a, b in itertools.product(S1, S2):
-        if wt.isomap[a.delegate, b] and (a, b) not in SM:
+        if wt.isomap.is_mapped(a.delegate, b) and (a, b) not in SM:
             k = wt.position(b)
             op = Move(a.delegate, source.delegate, k)
             yield op
@@ -214,12 +222,7 @@ class WorkingNode:
 
             if node is None: return None
 
-            result = self.isomap[node, None]
-            result = next(result, None)
-
-            if result is None: return None
-
-            self.mod_partner = result[1]
+            self.mod_partner = self.isomap.dst_of(node)
 
         return self.mod_partner
 
@@ -291,12 +294,10 @@ class WorkingTree:
     def partner(self, target_node): 
         if target_node is None: return None
 
-        result = self.isomap[None, target_node]
-        result = next(result, None)
+        source_node = self.isomap.src_of(target_node)
 
-        if result is None: return None
+        if source_node is None: return None
 
-        source_node = result[0]
         wn = self._access_wn(source_node)
         wn.mod_partner = target_node
         return wn
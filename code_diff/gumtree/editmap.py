@@ -16,28 +16,28 @@ from .utils import subtree_dice, postorder_traversal
 
 # API method -------------------------------------------------------------
 
-def gumtree_editmap(isomap, source, target, max_size = 1000, min_dice = 0.5):
+def gumtree_editmap(isomap, source, target, max_size = 1000, min_dice = 0.5, stats = None):
     # Caution: This method does change the isomap
     if len(isomap) == 0: return isomap
 
     for source_node in postorder_traversal(source):
 
         if source_node == source: # source_node is root
-            isomap.add(source_node, target)
+            isomap.replace(source_node, target) # Roots are always mapped onto each other
 
-            for s, t in _minimal_edit(isomap, source_node, target, max_size):
+            for s, t in _minimal_edit(isomap, source_node, target, max_size, stats):
                 isomap.add(s, t)
 
             break
 
         if len(source_node.children) == 0: continue # source_node is leaf
-        if (source_node, None) in isomap: continue  # source_node is now mapped
+        if isomap.is_mapped(source_node): continue  # source_node is now mapped
 
-        target_node, dice = _select_near_candidate(source_node, isomap)
+        target_node, dice = _select_near_candidate(source_node, isomap, stats)
 
         if target_node is None or dice <= min_dice: continue 
         
-        for s, t in _minimal_edit(isomap, source_node, target_node, max_size):
+        for s, t in _minimal_edit(isomap, source_node, target_node, max_size, stats):
             isomap.add(s, t)
         isomap.add(source_node, target_node)
 
@@ -60,8 +60,21 @@ class APTEDConfig(Config):
         return node.children
 
 
-def _minimal_edit(isomap, source, target, max_size = 1000):
-    if source.subtree_weight > max_size or target.subtree_weight > max_size: return
+# APTED indexes both trees recursively. Deeper subtrees are skipped
+# (like subtrees exceeding max_size) to stay below the recursion limit.
+APTED_MAX_HEIGHT = 300
+
+
+def _minimal_edit(isomap, source, target, max_size = 1000, stats = None):
+    if source.subtree_weight > max_size or target.subtree_weight > max_size:
+        if stats is not None: stats.observe("editmap.max_size_skips", source.subtree_weight + target.subtree_weight)
+        return
+
+    if max(source.subtree_height, target.subtree_height) > APTED_MAX_HEIGHT:
+        if stats is not None: stats.observe("editmap.max_height_skips", max(source.subtree_height, target.subtree_height))
+        return
+
+    if stats is not None: stats.observe("editmap.apted", source.subtree_weight + target.subtree_weight)
 
     apted = APTED(source, target, APTEDConfig())
     mapping = apted.compute_edit_mapping()
@@ -71,21 +84,21 @@ def _minimal_edit(isomap, source, target, max_size = 1000):
         if target_node is None: continue
         if source_node.type != target_node.type: continue
 
-        if (source_node, None) in isomap: continue
-        if (None, target_node) in isomap: continue
+        if isomap.is_mapped(source_node): continue
+        if isomap.is_mapped(dst = target_node): continue
 
         yield source_node, target_node
 
 
 # Select node heuristically that is close to isomorph --------------------
 
-def _select_near_candidate(source_node, mapping):
+def _select_near_candidate(source_node, mapping, stats = None):
 
     dst_seeds = []
 
     for src in source_node.descandents():
-        for _, dst in mapping[src, None]:
-            dst_seeds.append(dst)
+        dst = mapping.dst_of(src)
+        if dst is not None: dst_seeds.append(dst)
 
     candidates = []
     seen = set()
@@ -98,11 +111,12 @@ def _select_near_candidate(source_node, mapping):
 
             if (parent.type == source_node.type
                     and parent.parent is not None
-                    and (None, parent) not in mapping):
+                    and not mapping.is_mapped(dst = parent)):
                 candidates.append(parent)
             dst = parent
 
     if len(candidates) == 0: return None, 0.0
+    if stats is not None: stats.count("editmap.near_candidates", len(candidates))
 
     candidates = [(x, subtree_dice(source_node, x, mapping)) for x in candidates]
 
@@ -1,69 +1,112 @@
 
 import heapq
-import itertools
 import math
 
 from collections import defaultdict
 
-from .utils import NodeMapping, subtree_dice
+from .utils import NodeMapping, NodeMultiMapping, DiceIndex, subtree_dice
 
 # API method ----------------------------------------------------------------
 
-def gumtree_isomap(source_ast, target_ast, min_height = 1):
+def gumtree_isomap(source_ast, target_ast, min_height = 1, stats = None):
+    return TopDownMatcher(source_ast, target_ast, stats).match(min_height)
 
-    isomorphic_mapping = NodeMapping()
-    candidate_mapping  = NodeMapping()
 
-    source_index = _index_iso_nodes(source_ast)
-    target_index = _index_iso_nodes(target_ast)
+# Top-down matcher ----------------------------------------------------------------
+# The top-down phase descends both trees level by level (from the highest
+# subtrees to min_height). A level is processed independently of lower
+# levels. Therefore, if no pair was matched, a lower min_height can be
+# reached by continuing the descent from the current open lists
+# (instead of indexing both trees and descending from the roots again).
 
-    source_open = HeightPriorityHeap(source_ast)
-    target_open = HeightPriorityHeap(target_ast)
 
-    while max(source_open.max(), target_open.max()) > min_height:
+class TopDownMatcher:
+    """
+    Resumable top-down phase of GumTree
 
-        if source_open.max() > target_open.max():
-            for c in list(source_open.pop()):
-                _open_node(source_open, c)
-            continue
-            
-        if source_open.max() < target_open.max():
-            for c in list(target_open.pop()):
-                _open_node(target_open, c)
-            continue
+    Calling match with decreasing min_height continues the descent of
+    the previous call. The result equals gumtree_isomap(min_height)
+    as long as all previous calls returned an empty mapping.
+    """
+
+    def __init__(self, source_ast, target_ast, stats = None):
+        self.stats = stats
+
+        self.isomorphic_mapping = NodeMapping()
+        self.candidate_mapping  = NodeMultiMapping()
+
+        self.source_index = _index_iso_nodes(source_ast)
+        self.target_index = _index_iso_nodes(target_ast)
+
+        self.source_open = HeightIndexedList(source_ast)
+        self.target_open = HeightIndexedList(target_ast)
+
+    def match(self, min_height = 1):
+        self._descend(min_height)
+
+        isomorphic_mapping, candidate_mapping = self.isomorphic_mapping, self.candidate_mapping
+
+        # Select the heuristically best mapping for all isomorphic pairs
+        scores = _score_candidates(candidate_mapping, isomorphic_mapping)
+        for source_node, target_node in _select_candidates(candidate_mapping, scores = scores):
+            _map_recursively(isomorphic_mapping, source_node, target_node)
+            if self.stats is not None: self.stats.count("isomap.selected_pairs")
 
-        source_candidates, target_candidates = list(source_open.pop()), list(target_open.pop())
+        self.candidate_mapping = NodeMultiMapping()
 
-        for source_node, target_node in itertools.product(source_candidates, target_candidates):
-            # Source node and Target node have the same height
-            # Check if source node is isomorph to target node
+        return isomorphic_mapping
 
-            if source_node.isomorph(target_node):
-                # Check if there exists more candidates
-                if (source_index[source_node] > 1
-                        or target_index[target_node] > 1):
-                        candidate_mapping.add(source_node, target_node)
-                else:
-                    # We can savely map both nodes and all descandents
-                    _map_recursively(isomorphic_mapping, source_node, target_node)
+    def _descend(self, min_height):
+        stats = self.stats
 
-        # Open all unmapped nodes
-        for source_node in source_candidates:
-            if ((source_node, None) not in isomorphic_mapping
-                and (source_node, None) not in candidate_mapping):
-                _open_node(source_open, source_node)
+        isomorphic_mapping, candidate_mapping = self.isomorphic_mapping, self.candidate_mapping
+        source_index, target_index = self.source_index, self.target_index
+        source_open, target_open   = self.source_open, self.target_open
 
-        for target_node in target_candidates:
-            if ((None, target_node) not in isomorphic_mapping
-                and (None, target_node) not in candidate_mapping):
-                _open_node(target_open, target_node)
+        while max(source_open.max(), target_open.max()) > min_height:
+            if stats is not None: stats.count("isomap.levels")
 
-    # Select the heuristically best mapping for all isomorphic pairs
-    selection_heuristic = create_default_heuristic(isomorphic_mapping)
-    for source_node, target_node in _select_candidates(candidate_mapping, selection_heuristic):
-        _map_recursively(isomorphic_mapping, source_node, target_node)
+            if source_open.max() > target_open.max():
+                for c in source_open.pop():
+                    source_open.open(c)
+                continue
+                
+            if source_open.max() < target_open.max():
+                for c in target_open.pop():
+                    target_open.open(c)
+                continue
 
-    return isomorphic_mapping
+            source_candidates, target_candidates = source_open.pop(), target_open.pop()
+
+            # Source and target nodes have the same height.
+            # Only nodes in the same bucket are isomorph.
+            target_buckets = _bucket_iso_nodes(target_candidates)
+            source_keys    = set()
+
+            for source_node in source_candidates:
+                source_key = _iso_key(source_node)
+                source_keys.add(source_key)
+
+                for target_node in target_buckets.get(source_key, ()):
+                    # Check if there exists more candidates
+                    if (source_index[source_node] > 1
+                            or target_index[target_node] > 1):
+                            candidate_mapping.add(source_node, target_node)
+                            if stats is not None: stats.count("isomap.ambiguous_pairs")
+                    else:
+                        # We can savely map both nodes and all descandents
+                        _map_recursively(isomorphic_mapping, source_node, target_node)
+                        if stats is not None: stats.count("isomap.unique_pairs")
+
+            # Open all unmapped nodes
+            # (a node of this level is mapped iff its bucket exists on the other side)
+            for source_node in source_candidates:
+                if _iso_key(source_node) not in target_buckets:
+                    source_open.open(source_node)
+
+            for target_node in target_candidates:
+                if _iso_key(target_node) not in source_keys:
+                    target_open.open(target_node)
 
 
 # Collections ----------------------------------------------------------------
@@ -83,36 +126,44 @@ class NodeCounter:
         self._counter[self._node_key(node)] = value
 
 
-class HeightPriorityHeap:
+class HeightIndexedList:
+    """
+    Open nodes indexed by their subtree height
+
+    Nodes of the same height are kept in the order they were opened.
+    A level is returned ordered by subtree hash (ties in opening order).
+    """
 
     def __init__(self, start_node = None):
-        self._heap = []
-        self.element_count = 0
+        self._levels = defaultdict(list)
+        self._max_height = 0
 
         if start_node is not None:
             self.push(start_node)
 
     def __len__(self):
-        return len(self._heap)
+        return sum(len(level) for level in self._levels.values())
 
-    def push(self, x, seed = 0):
-        try:
-            heapq.heappush(self._heap, (-x.subtree_height, x.subtree_hash, self.element_count, seed, x))
-            self.element_count += 1
-        except TypeError:
-            # Typically the type error occurs if we compare with the last element in tuple (Node)
-            # If this happens the node is already contained in the heap and we skip this push
-            return
+    def push(self, node):
+        height = node.subtree_height
+        self._levels[height].append(node)
+        if height > self._max_height: self._max_height = height
+
+    def open(self, node):
+        for child in node.children:
+            self.push(child)
     
     def max(self):
-        if len(self) == 0: return 0
-        return -self._heap[0][0]
+        while self._max_height > 0 and len(self._levels.get(self._max_height, ())) == 0:
+            self._max_height -= 1
+        return self._max_height
 
     def pop(self):
-        current_head = self.max()
+        """Removes and returns all nodes of the maximal height"""
+        level = self._levels.pop(self.max(), [])
+        level.sort(key = _subtree_hash)
+        return level
 
-        while len(self) > 0 and self.max() == current_head:
-            yield heapq.heappop(self._heap)[-1]
 
 # Helper methods -----------------------------------------------------------
 
@@ -122,18 +173,33 @@ def _index_iso_nodes(ast):
 
     return result
 
-def _open_node(heap, node):
-    for n, child in enumerate(node.children):
-        heap.push(child, seed = n)
+def _iso_key(node):
+    # Two nodes are isomorph iff their keys are equal (see ASTNode.isomorph)
+    return (node.subtree_hash, node.type, node.subtree_height, node.subtree_weight)
+
+def _subtree_hash(node):
+    return node.subtree_hash
+
+def _bucket_iso_nodes(nodes):
+    buckets = {}
+    for node in nodes:
+        try:
+            buckets[_iso_key(node)].append(node)
+        except KeyError:
+            buckets[_iso_key(node)] = [node]
+
+    return buckets
 
 def _map_recursively(mapping, source_node, target_node):
-    mapping.add(source_node, target_node)
+    # Maps both isomorphic subtrees in preorder (explicit stack for deep trees)
+    stack = [(source_node, target_node)]
 
-    for i, source_child in enumerate(source_node.children):
-        target_child = target_node.children[i]
-        assert source_node.type == target_node.type
+    while len(stack) > 0:
+        source_node, target_node = stack.pop()
+        mapping.add(source_node, target_node)
 
-        _map_recursively(mapping, source_child, target_child)
+        assert source_node.type == target_node.type
+        stack.extend(zip(reversed(source_node.children), reversed(target_node.children)))
 
 # Heuristic selection ----------------------------------------------------------------
 
@@ -161,21 +227,53 @@ def create_default_heuristic(isomorphic_mapping):
     return _heuristic
 
 
-def _select_candidates(candidate_mapping, heuristic = None):
+def _score_candidates(candidate_mapping, isomorphic_mapping):
+    """Scores all candidate pairs with the default heuristic (in iteration order of the candidates)"""
+    if not isinstance(isomorphic_mapping, NodeMapping):
+        heuristic = create_default_heuristic(isomorphic_mapping)
+        return [heuristic(s, t) for s, t in candidate_mapping]
+
+    # All targets of a source node are scored in one batch
+    dice_index = DiceIndex(isomorphic_mapping)
+    scores     = []
+
+    for source_node, target_nodes in candidate_mapping._src_to_dst.items():
+        target_nodes = list(target_nodes)
+        dice_scores  = dice_index.dice(source_node, target_nodes)
+
+        for target_node, dice in zip(target_nodes, dice_scores):
+            scores.append((dice, source_distance(source_node, target_node)))
+
+    return scores
+
+
+def _select_candidates(candidate_mapping, heuristic = None, scores = None):
     if len(candidate_mapping) == 0: return
 
-    candidate_pairs = [(s, t) for s, t in candidate_mapping]
+    candidate_pairs = [(s, t) for s, T in candidate_mapping._src_to_dst.items() for t in T]
+
+    if scores is None and heuristic is not None:
+        scores = [heuristic(s, t) for s, t in candidate_pairs]
+
+    # Best scores first. Ties are resolved by the order of the candidates.
+    if scores is not None:
+        queue = [(tuple(-x for x in score), n) for n, score in enumerate(scores)]
+    else:
+        queue = [((), n) for n in range(len(candidate_pairs))]
+
+    heapq.heapify(queue)
 
-    if heuristic is not None:
-        candidate_pairs = sorted(candidate_pairs, 
-                                    key=lambda p: heuristic(*p), 
-                                    reverse=True)
-    
     source_seen = set()
     target_seen = set()
 
-    while len(candidate_pairs) > 0:
-        source_node, target_node = candidate_pairs.pop(0)
+    num_sources = sum(1 for T in candidate_mapping._src_to_dst.values() if len(T) > 0)
+    num_targets = sum(1 for S in candidate_mapping._dst_to_src.values() if len(S) > 0)
+
+    while len(queue) > 0:
+        # No further pair can be selected
+        if len(source_seen) == num_sources or len(target_seen) == num_targets: break
+
+        source_node, target_node = candidate_pairs[heapq.heappop(queue)[1]]
 
         if source_node in source_seen:
             continue
@@ -186,4 +284,3 @@ def _select_candidates(candidate_mapping, heuristic = None):
         target_seen.add(target_node)
         
         yield source_node, target_node
-
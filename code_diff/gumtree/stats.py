@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+# Algorithm counters ----------------------------------------------------------------
+# Counters explain why an edit script was expensive to compute.
+# They are only collected if a stats object is passed explicitly
+# (see ASTDiff.edit_script(explain = True)). Otherwise, every counter
+# site costs a single None check.
+#
+# Counters:
+#   isomap.levels            height levels popped from the open lists
+#   isomap.unique_pairs      isomorphic pairs mapped directly
+#   isomap.ambiguous_pairs   isomorphic pairs with several candidates
+#   isomap.selected_pairs    ambiguous pairs selected by the heuristic
+#   isomap.min_height_retries retries of the top-down phase with a lower min_height
+#   editmap.near_candidates  candidates scored by dice in the bottom-up phase
+#   editmap.apted            APTED invocations (size: nodes of both subtrees)
+#   editmap.max_size_skips   subtree pairs skipped by max_size (size: nodes of both subtrees)
+#   editmap.max_height_skips subtree pairs skipped by APTED_MAX_HEIGHT (size: height of the deeper subtree)
+#   chawathe.lcs             children alignments of the edit script (size: LCS table cells)
+#   regions.lcs              children alignments of the region search (size: LCS table cells)
+
+
+class EditStats:
+    """
+    Counters collected during an edit script computation
+
+    Attributes
+    ----------
+    counters : dict
+        Number of events per counter
+
+    totals, maxima : dict
+        Sum and maximum of the sizes observed per counter
+
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.totals   = defaultdict(int)
+        self.maxima   = defaultdict(int)
+
+    def count(self, name, value = 1):
+        self.counters[name] += value
+
+    def observe(self, name, size):
+        """Counts an event of the given size"""
+        self.counters[name] += 1
+        self.totals[name]   += size
+        if size > self.maxima[name]: self.maxima[name] = size
+
+    def __getitem__(self, name):
+        return self.counters.get(name, 0)
+
+    def merge(self, other):
+        for name, value in other.counters.items(): self.counters[name] += value
+        for name, value in other.totals.items(): self.totals[name] += value
+        for name, value in other.maxima.items(): self.maxima[name] = max(self.maxima[name], value)
+
+    def as_dict(self):
+        result = {}
+
+        for name in sorted(self.counters):
+            result[name] = self.counters[name]
+
+            if name in self.totals:
+                result[name + ".total_size"] = self.totals[name]
+                result[name + ".max_size"]   = self.maxima[name]
+
+        return result
+
+    def report(self):
+        """Human readable report of all counters"""
+        lines = []
+
+        for name in sorted(self.counters):
+            line = "%-28s %8d" % (name, self.counters[name])
+
+            if name in self.totals:
+                line += "  (size total %d, max %d)" % (self.totals[name], self.maxima[name])
+
+            lines.append(line)
+
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "EditStats(%s)" % dict(self.counters)
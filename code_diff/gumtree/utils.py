@@ -1,8 +1,108 @@
+from bisect      import bisect_right
 from collections import defaultdict
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .. import traversal
+
 # Collections -------------------------------------------------------------------
+# Matched nodes form a one-to-one mapping between source and target
+# (NodeMapping). Every node has at most one partner which is stored in
+# a flat table per direction. Since AST nodes are hashed by identity,
+# both tables are effectively keyed by node ids.
+#
+# Only the candidate phase of the isomap can map a node to several
+# partners. Candidates are collected in a NodeMultiMapping.
+
 
 class NodeMapping:
+    """
+    One-to-one mapping between source and target nodes
+
+    Pairs are iterated in insertion order. Adding a pair
+    with an already mapped source or target node has no effect
+    (see replace to overwrite existing pairs).
+    """
+
+    __slots__ = ("_src_to_dst", "_dst_to_src")
+
+    def __init__(self):
+        self._src_to_dst = {}
+        self._dst_to_src = {}
+
+    def dst_of(self, src):
+        """Returns the partner of a source node (or None if unmapped)"""
+        return self._src_to_dst.get(src)
+
+    def src_of(self, dst):
+        """Returns the partner of a target node (or None if unmapped)"""
+        return self._dst_to_src.get(dst)
+
+    def is_mapped(self, src = None, dst = None):
+        """Whether src (or dst) is mapped. If both are given, whether both are mapped onto each other."""
+        if src is None: return dst in self._dst_to_src
+        if dst is None: return src in self._src_to_dst
+        return self._src_to_dst.get(src) is dst
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple): key = (key, None)
+
+        src_key, dst_key = key
+
+        if src_key is not None and dst_key is not None:
+            return self._src_to_dst.get(src_key) is dst_key
+
+        if src_key is None and dst_key is None:
+            return self.__iter__()
+
+        if src_key is None:
+            src = self._dst_to_src.get(dst_key)
+            return iter(() if src is None else ((src, dst_key),))
+
+        dst = self._src_to_dst.get(src_key)
+        return iter(() if dst is None else ((src_key, dst),))
+
+    def __iter__(self):
+        return iter(self._src_to_dst.items())
+
+    def __contains__(self, key):
+        if not isinstance(key, tuple): key = (key, None)
+        return self.is_mapped(*key)
+
+    def __len__(self):
+        return len(self._src_to_dst)
+
+    def add(self, src, dst):
+        if src in self._src_to_dst or dst in self._dst_to_src: return
+        self._src_to_dst[src] = dst
+        self._dst_to_src[dst] = src
+
+    def replace(self, src, dst):
+        """Maps src onto dst. Previous partners of src and dst become unmapped."""
+        old_dst = self._src_to_dst.pop(src, None)
+        if old_dst is not None: del self._dst_to_src[old_dst]
+
+        old_src = self._dst_to_src.pop(dst, None)
+        if old_src is not None: del self._src_to_dst[old_src]
+
+        self._src_to_dst[src] = dst
+        self._dst_to_src[dst] = src
+
+    def __copy__(self):
+        output = NodeMapping()
+        output._src_to_dst = dict(self._src_to_dst)
+        output._dst_to_src = dict(self._dst_to_src)
+        return output
+
+    def __str__(self):
+        return "\n".join("%s ≈ %s" % (str(src), str(dst)) for src, dst in self)
+
+
+class NodeMultiMapping:
+    """Mapping of source and target nodes to sets of partners (used for isomap candidates)"""
 
     def __init__(self):
         self._src_to_dst = defaultdict(set)
@@ -15,16 +115,16 @@ class NodeMapping:
         src_key, dst_key = key
 
         if src_key is not None and dst_key is not None:
-            return dst_key in self._src_to_dst[src_key]
+            return dst_key in self._src_to_dst.get(src_key, ())
 
         if src_key is None and dst_key is None:
             return self.__iter__()
 
         if src_key is None:
-            return ((src, dst_key) for src in self._dst_to_src[dst_key])
+            return ((src, dst_key) for src in self._dst_to_src.get(dst_key, ()))
         
         if dst_key is None:
-            return ((src_key, dst) for dst in self._src_to_dst[src_key])
+            return ((src_key, dst) for dst in self._src_to_dst.get(src_key, ()))
     
     def __iter__(self):
 
@@ -42,7 +142,8 @@ class NodeMapping:
         if src_key is not None and dst_key is not None:
             return self[src_key, dst_key]
 
-        return next(self[src_key, dst_key], None) is not None
+        if dst_key is None: return len(self._src_to_dst.get(src_key, ())) > 0
+        return len(self._dst_to_src.get(dst_key, ())) > 0
 
     def __len__(self):
         return self._length
@@ -54,7 +155,7 @@ class NodeMapping:
             self._length += 1
 
     def __copy__(self):
-        output = NodeMapping()
+        output = NodeMultiMapping()
 
         for a, b in self:
             output.add(a, b)
@@ -62,12 +163,27 @@ class NodeMapping:
         return output
 
     def __str__(self):
-        approx_str = []
+        return "\n".join("%s ≈ %s" % (str(src), str(dst)) for src, dst in self)
 
-        for src, dst in self:
-            approx_str.append("%s ≈ %s" % (str(src), str(dst)))
-        
-        return "\n".join(approx_str)
+
+def restrict_mapping(mapping, source, target):
+    """
+    Restricts a mapping to the given source and target subtree
+
+    Keeps all pairs between descendants of source and descendants
+    of target. Source and target themselves are mapped onto each other.
+    """
+    output = NodeMapping()
+    output.add(source, target)
+
+    dst_of = mapping.dst_of
+
+    for src in traversal.descendants(source):
+        dst = dst_of(src)
+        if dst is not None and dst is not target and traversal.is_ancestor(target, dst):
+            output.add(src, dst)
+
+    return output
 
 
 # Tree heuristic ----------------------------------------------------------------
@@ -77,33 +193,147 @@ def subtree_dice(A, B, mapping):
     if A is None or B is None:
         return 1.0 if all(x is None for x in [A, B]) else 0.0
 
-    DA, DB = set(A.descandents()), set(B.descandents())
-
-    norm = len(DA) + len(DB)
+    norm = (A.subtree_weight - 1) + (B.subtree_weight - 1)
 
     if norm == 0: return 1.0
 
-    mapped = defaultdict(set)
-    for a, b in mapping: mapped[a].add(b)
+    if isinstance(mapping, NodeMapping):
+        dst_of   = mapping.dst_of
+        partners = (dst_of(t1) for t1 in traversal.descendants(A))
+    else:
+        if isinstance(mapping, NodeMultiMapping):
+            mapped = mapping._src_to_dst
+        else:
+            mapped = defaultdict(set)
+            for a, b in mapping: mapped[a].add(b)
 
-    mapped_children = set(m for t1 in DA if t1 in mapped for m in mapped[t1])
-    dice_score = len(set.intersection(mapped_children, DB))
+        partners = (m for t1 in traversal.descendants(A) for m in mapped.get(t1, ()))
 
-    return 2 * dice_score / norm
+    # Descendants of B are identified by their preorder number
+    index_B, start_B, end_B, _ = traversal.euler_tour(B)
 
+    mapped_children = set()
+    for m in partners:
+        if m is None: continue
+        index_m, entry_m, _, _ = traversal.euler_tour(m)
+        if index_m is index_B and start_B < entry_m <= end_B:
+            mapped_children.add(m)
 
-# Tree traversal ----------------------------------------------------------------
+    return 2 * len(mapped_children) / norm
 
-def bfs_traversal(tree):
-    queue = [tree]
 
-    while len(queue) > 0: 
-        node = queue.pop(0)
+# Dice index ----------------------------------------------------------------
+# Scores many (source, target) pairs against a fixed one-to-one mapping.
+# Source nodes are numbered in preorder such that the descendants of a
+# node form an interval. For every source node, we store the preorder
+# number of its partner in the target tree. The number of mapped
+# descendants of A inside of B is then the number of partner numbers of
+# A's interval that fall into B's interval. Partner numbers of an interval
+# are sorted once per source node and counted by binary search
+# (vectorized with numpy for many targets if available).
 
-        yield node
+VECTORIZE_MIN_TARGETS = 64
 
-        for c in node.children: 
-            queue.append(c)   
+
+class DiceIndex:
+    """
+    Computes subtree_dice for many pairs of a one-to-one mapping
+
+    Parameters
+    ----------
+    mapping : NodeMapping
+        One-to-one mapping. The mapping must not
+        change while the index is used.
+
+    """
+
+    def __init__(self, mapping):
+        self.mapping   = mapping
+        self._partners = {}
+
+    def _partner_entries(self, source_node):
+        # Sorted preorder numbers of the partners of all descendants (per target tree)
+        try:
+            return self._partners[source_node]
+        except KeyError:
+            pass
+
+        dst_of = self.mapping.dst_of
+        groups = {}
+
+        for src in traversal.descendants(source_node):
+            dst = dst_of(src)
+            if dst is None: continue
+
+            index, entry, _, _ = traversal.euler_tour(dst)
+            groups.setdefault(id(index), (index, []))[1].append(entry)
+
+        for _, entries in groups.values(): entries.sort()
+
+        self._partners[source_node] = groups
+        return groups
+
+    def dice(self, source_node, target_nodes):
+        """Returns the subtree dice of source_node with each of the target nodes"""
+        groups = self._partner_entries(source_node)
+
+        if np is not None and len(target_nodes) >= VECTORIZE_MIN_TARGETS:
+            counts = _vectorized_counts(groups, target_nodes)
+        else:
+            counts = [_count(groups, target_node) for target_node in target_nodes]
+
+        return [_dice(source_node, target_node, count)
+                    for target_node, count in zip(target_nodes, counts)]
+
+
+def _count(groups, target_node):
+    # Number of partners with start < entry <= end
+    index, start, end, _ = traversal.euler_tour(target_node)
+    group = groups.get(id(index))
+
+    if group is None or group[0] is not index: return 0
+
+    entries = group[1]
+    return bisect_right(entries, end) - bisect_right(entries, start)
+
+
+def _vectorized_counts(groups, target_nodes):
+    tours  = [traversal.euler_tour(target_node) for target_node in target_nodes]
+    counts = [0] * len(target_nodes)
+
+    for index, entries in groups.values():
+        members = [i for i, tour in enumerate(tours) if tour[0] is index]
+        if len(members) == 0: continue
+
+        partners = np.asarray(entries, dtype = np.int64)
+        starts   = np.fromiter((tours[i][1] for i in members), dtype = np.int64, count = len(members))
+        ends     = np.fromiter((tours[i][2] for i in members), dtype = np.int64, count = len(members))
+
+        found = (np.searchsorted(partners, ends, side = "right")
+                    - np.searchsorted(partners, starts, side = "right"))
+
+        for i, count in zip(members, found.tolist()): counts[i] = count
+
+    return counts
+
+
+def _dice(A, B, count):
+    norm = (A.subtree_weight - 1) + (B.subtree_weight - 1)
+    if norm == 0: return 1.0
+    return 2 * count / norm
+
+
+def is_one_to_one(mapping):
+    """Whether every node of the mapping has exactly one partner"""
+    if isinstance(mapping, NodeMapping): return True
+    return (all(len(V) <= 1 for V in mapping._src_to_dst.values())
+                and all(len(V) <= 1 for V in mapping._dst_to_src.values()))
+
+
+# Tree traversal ----------------------------------------------------------------
+
+def bfs_traversal(tree):
+    return traversal.bfs(tree)
 
 
 def dfs_traversal(tree):
@@ -119,15 +349,4 @@ def dfs_traversal(tree):
 
 
 def postorder_traversal(tree):
-    
-    stack = [(tree, 0)]
-
-    while len(stack) > 0:
-        node, ix = stack.pop(-1)
-
-        if ix >= len(node.children):
-            yield node
-        else:
-            stack.append((node, ix + 1))
-            stack.append((node.children[ix], 0))
-
+    return iter(traversal.traversal_index(tree).postorder)
@@ -0,0 +1,112 @@
+from functools import lru_cache
+from hashlib   import blake2b
+
+# Structural subtree hashing ----------------------------------------------------
+# Subtree hashes are computed bottom-up from the label of a node
+# and the hashes of its children. Hash engines are pluggable.
+#
+# The default engine combines child hashes numerically with a fixed
+# seed. Therefore, hashes are stable across processes and Python versions
+# and can be used as (persistent) cache keys.
+
+
+MASK64 = (1 << 64) - 1
+
+
+def _mix64(z):
+    # Finalizer of splitmix64
+    z = ((z ^ (z >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94d049bb133111eb) & MASK64
+    return z ^ (z >> 31)
+
+
+class Mix64Hash:
+    """
+    Deterministic 64-bit structural hash
+
+    Labels are hashed with a keyed BLAKE2b digest. Child hashes are
+    combined by a polynomial rolling hash which is finalized
+    with the splitmix64 mixer.
+    """
+
+    name = "mix64-v1"
+
+    def __init__(self, seed = 0x9e3779b97f4a7c15, label_cache_size = 1 << 16):
+        self.seed = seed & MASK64
+        self.label_hash = lru_cache(maxsize = label_cache_size)(self._label_hash)
+        self.leaf_hash  = lru_cache(maxsize = label_cache_size)(self._leaf_hash)
+
+    def _label_hash(self, label):
+        digest = blake2b(label.encode("utf-8"), digest_size = 8,
+                            key = self.seed.to_bytes(8, "little"))
+        return int.from_bytes(digest.digest(), "little")
+
+    def _leaf_hash(self, label):
+        return _mix64(self.label_hash(label))
+
+    def __call__(self, label, child_hashes):
+        if not child_hashes: return self.leaf_hash(label)
+
+        h = self.label_hash(label)
+
+        for child_hash in child_hashes:
+            h = (h * 0x100000001b3 + child_hash) & MASK64
+
+        # Finalize with splitmix64 (inlined for performance)
+        z = h ^ len(child_hashes)
+        z = ((z ^ (z >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94d049bb133111eb) & MASK64
+        return z ^ (z >> 31)
+
+
+class LegacyStringHash:
+    """
+    Previous hashing scheme
+
+    Joins the label and all child hashes into a string which is
+    hashed with the builtin hash function. Hashes are salted by
+    PYTHONHASHSEED and therefore are not stable between processes.
+    """
+
+    name = "legacy-str"
+
+    def __call__(self, label, child_hashes):
+        hash_str = [label]
+        hash_str.extend(str(h) for h in child_hashes)
+        return hash("_".join(hash_str)) & MASK64
+
+
+# Engine registry ----------------------------------------------------------------
+
+_HASH_ENGINE = Mix64Hash()
+
+
+def get_hash_engine():
+    """Returns the hash engine used to compute subtree hashes"""
+    return _HASH_ENGINE
+
+
+def set_hash_engine(engine):
+    """
+    Replaces the hash engine for all subsequently parsed ASTs
+
+    Parameters
+    ----------
+    engine : callable(label, child_hashes) -> int
+        Function to compute the (unsigned 64-bit) hash of a node from
+        its label and the hashes of its children. Should provide a name
+        attribute to identify the engine (e.g. in caches).
+
+    Returns
+    -------
+    engine
+        the previous hash engine
+
+    """
+    global _HASH_ENGINE
+    previous, _HASH_ENGINE = _HASH_ENGINE, engine
+    return previous
+
+
+def subtree_hash(label, child_hashes):
+    return _HASH_ENGINE(label, child_hashes)
@@ -0,0 +1,313 @@
+from code_ast         import ASTParser
+from code_ast.visitor import ASTVisitor, ResumingVisitorComposition
+
+from code_tokenize.lang      import load_from_lang_config
+from code_tokenize.tokenizer import tokenize_tree, TokenHandler, ErrorVisitor
+
+from .ast import ASTNode, TreeCursorParser, default_create_node, attach_source
+
+# Incremental parsing ----------------------------------------------------------
+# Source and target are often two versions of the same file. Therefore,
+# we parse the target by editing the tree-sitter tree of the source.
+# Subtrees that tree-sitter reports as unchanged are copied from
+# the source AST (including their subtree hashes) instead of being
+# rebuilt from tokens.
+
+
+class ParsedSource:
+    """AST together with the tree-sitter tree and the code it was parsed from"""
+
+    def __init__(self, ast, tree, source_bytes):
+        self.ast  = ast
+        self.tree = tree
+        self.source_bytes = source_bytes
+
+
+def parse_source(parser, config, source_code, create_node_fn = default_create_node):
+    if len(source_code.strip()) == 0:
+        raise ValueError("The code string is empty. Cannot tokenize anything empty: %s" % source_code)
+
+    tree, code_lines = parser.parse(source_code)
+    tokens = tokenize_tree(config, tree.root_node, code_lines, visitors = config.visitors)
+    ast    = TreeCursorParser(create_node_fn)(tokens)
+
+    return ParsedSource(attach_source(ast, source_code), tree, source_code.encode("utf-8"))
+
+
+def parse_incremental(parser, config, source, target_code):
+    """
+    Parses the target code by reusing the parse of the source
+
+    Parameters
+    ----------
+    parser : ASTParser
+        Parser that was used to parse the source
+
+    config : TokenizationConfig
+        Tokenization config for the language of source and target
+
+    source : ParsedSource
+        Parsed source code
+
+    target_code : str
+        Target code which should be parsed
+
+    Returns
+    -------
+    ParsedSource
+        the parsed target code
+
+    """
+    if len(target_code.strip()) == 0:
+        raise ValueError("The code string is empty. Cannot tokenize anything empty: %s" % target_code)
+
+    target_bytes = target_code.encode("utf-8")
+    edit = TextEdit.between(source.source_bytes, target_bytes)
+
+    old_tree = source.tree.copy()
+    old_tree.edit(**edit.ts_edit())
+
+    target_tree  = parser.parser.parse(target_bytes, old_tree)
+
+    dirty_ranges = [(r.start_byte, r.end_byte) for r in old_tree.changed_ranges(target_tree)]
+    dirty_ranges.append(edit.line_range(target_bytes))
+
+    reused = _reuse_subtrees(source.ast, target_tree.root_node, edit, dirty_ranges)
+
+    # Only tokenize the parts of the target that could not be reused
+    code_lines = target_code.splitlines()
+    tokens = _tokenize_except(config, target_tree.root_node, code_lines, reused)
+    ast    = ReusingParser(default_create_node, reused)(tokens, target_tree.root_node)
+
+    return ParsedSource(attach_source(ast, target_code), target_tree, target_bytes)
+
+
+def parse_pair(source_code, target_code, lang = "guess", **kwargs):
+    """Parses source and target code. The target is parsed incrementally."""
+    kwargs["syntax_error"] = "ignore"
+
+    config = load_from_lang_config(lang, **kwargs)
+    parser = ASTParser(config.lang)
+
+    source = parse_source(parser, config, source_code)
+    if source.ast is None: return None, None
+
+    target = parse_incremental(parser, config, source, target_code)
+
+    return source.ast, target.ast
+
+
+# Text edit ----------------------------------------------------------------
+
+def _common_prefix(a, b):
+    a, b = memoryview(a), memoryview(b)
+    lo, hi = 0, min(len(a), len(b))
+
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+
+    return lo
+
+
+def _common_suffix(a, b, limit):
+    a, b = memoryview(a), memoryview(b)
+    lo, hi = 0, limit
+
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+
+    return lo
+
+
+def _byte_to_point(data, offset):
+    row = data.count(b"\n", 0, offset)
+    return (row, offset - (data.rfind(b"\n", 0, offset) + 1))
+
+
+class TextEdit:
+    """A single replacement that transforms the source into the target bytes"""
+
+    def __init__(self, start_byte, old_end_byte, new_end_byte,
+                    start_point, old_end_point, new_end_point):
+        self.start_byte   = start_byte
+        self.old_end_byte = old_end_byte
+        self.new_end_byte = new_end_byte
+
+        self.start_point   = start_point
+        self.old_end_point = old_end_point
+        self.new_end_point = new_end_point
+
+    @staticmethod
+    def between(source_bytes, target_bytes):
+        start  = _common_prefix(source_bytes, target_bytes)
+        suffix = _common_suffix(source_bytes, target_bytes,
+                                 min(len(source_bytes), len(target_bytes)) - start)
+
+        old_end = len(source_bytes) - suffix
+        new_end = len(target_bytes) - suffix
+
+        return TextEdit(
+            start, old_end, new_end,
+            _byte_to_point(source_bytes, start),
+            _byte_to_point(source_bytes, old_end),
+            _byte_to_point(target_bytes, new_end),
+        )
+
+    @property
+    def delta(self):
+        return self.new_end_byte - self.old_end_byte
+
+    def ts_edit(self):
+        return {
+            "start_byte": self.start_byte, "old_end_byte": self.old_end_byte,
+            "new_end_byte": self.new_end_byte, "start_point": self.start_point,
+            "old_end_point": self.old_end_point, "new_end_point": self.new_end_point
+        }
+
+    def line_range(self, target_bytes):
+        # Columns shift on the edited lines. Therefore, all edited lines are dirty.
+        start = target_bytes.rfind(b"\n", 0, self.start_byte) + 1
+        end   = target_bytes.find(b"\n", self.new_end_byte)
+        if end == -1: end = len(target_bytes)
+        return (start, end)
+
+    def to_source_range(self, start_byte, end_byte):
+        # Expects ranges that do not overlap with the edit
+        if end_byte <= self.start_byte: return (start_byte, end_byte)
+        return (start_byte - self.delta, end_byte - self.delta)
+
+
+# Reuse ----------------------------------------------------------------
+
+def _reuse_subtrees(source_ast, target_root, edit, dirty_ranges):
+    """Copies all maximal subtrees of the target that are unchanged in the source"""
+
+    source_index = _index_by_range(source_ast)
+
+    def _is_dirty(ast_node):
+        start, end = ast_node.start_byte, ast_node.end_byte
+        return any(start <= dirty_end and dirty_start <= end
+                    for dirty_start, dirty_end in dirty_ranges)
+
+    reused = {}
+
+    stack = [target_root]
+    while len(stack) > 0:
+        ast_node = stack.pop()
+
+        if not _is_dirty(ast_node):
+            start, end  = edit.to_source_range(ast_node.start_byte, ast_node.end_byte)
+            source_node = source_index.get((ast_node.type, start, end), None)
+
+            if source_node is not None:
+                copy = _copy_subtree(source_node, ast_node)
+                if copy is not None:
+                    reused[ast_node] = copy
+                    continue
+
+        stack.extend(ast_node.children)
+
+    return reused
+
+
+def _index_by_range(ast):
+    index = {}
+
+    stack = [ast]
+    while len(stack) > 0:
+        node = stack.pop()
+        backend = node.backend
+        index.setdefault((backend.type, backend.start_byte, backend.end_byte), node)
+        stack.extend(node.children)
+
+    return index
+
+
+def _should_ignore(node):
+    return node.type == "comment"
+
+
+def _copy_subtree(source_node, ast_node):
+    """Copies the source subtree onto the structurally identical tree-sitter subtree"""
+
+    root  = None
+    stack = [(source_node, ast_node, None)]
+
+    while len(stack) > 0:
+        source, backend, parent = stack.pop()
+
+        if source.type != backend.type: return None
+
+        node = ASTNode(source.type, text = source.text,
+                        position = (backend.start_point, backend.end_point),
+                        parent = parent)
+        node.subtree_hash   = source.subtree_hash
+        node.subtree_height = source.subtree_height
+        node.subtree_weight = source.subtree_weight
+        node.backend        = backend
+
+        if parent is None:
+            root = node
+        else:
+            parent.children.append(node)
+
+        if len(source.children) == 0: continue
+
+        backend_children = [c for c in backend.children if not _should_ignore(c)]
+        if len(backend_children) != len(source.children): return None
+
+        for i in range(len(backend_children) - 1, -1, -1):
+            stack.append((source.children[i], backend_children[i], node))
+
+    return root
+
+
+# Tokenization ----------------------------------------------------------------
+
+class _SkipVisitor(ASTVisitor):
+    """Runs the given visitor on all nodes except the subtrees rooted at skipped nodes"""
+
+    def __init__(self, visitor, skip_nodes):
+        super().__init__()
+        self.visitor    = visitor
+        self.skip_nodes = skip_nodes
+
+    def on_visit(self, node):
+        if node in self.skip_nodes: return False
+        return self.visitor.on_visit(node)
+
+    def on_leave(self, node):
+        if node in self.skip_nodes: return
+        return self.visitor.on_leave(node)
+
+
+def _tokenize_except(config, root_node, code_lines, skip_nodes):
+    token_handler = TokenHandler(config, code_lines)
+    visitors = [visitor_fn(token_handler) if callable(visitor_fn) else visitor_fn
+                 for visitor_fn in config.visitors]
+
+    visitor = ResumingVisitorComposition(ErrorVisitor(config), *visitors)
+    _SkipVisitor(visitor, skip_nodes).walk(root_node)
+
+    return token_handler.tokens()
+
+
+# Reusing parser ----------------------------------------------------------------
+
+class ReusingParser(TreeCursorParser):
+    """Cursor parser that inserts precomputed subtrees"""
+
+    def __init__(self, create_node_fn, reused):
+        super().__init__(create_node_fn)
+        self.reused = reused
+
+    def _reuse_node(self, ast_node):
+        return self.reused.get(ast_node, None)
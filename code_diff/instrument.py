@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import time
+
+from contextvars import ContextVar
+
+# Instrumentation ----------------------------------------------------------------
+# Stages of the diff pipeline (parsing, diff search, matching and edit
+# script generation) are wrapped in spans. A span measures the duration
+# of a stage and is reported to all registered listeners when it ends.
+#
+# Without listeners, span() returns a shared no-op span. Therefore,
+# instrumentation costs a single check per stage if disabled.
+#
+# Stages: difference, compare, parse, tree_sitter, tokenize, build_ast,
+#         diff_search, edit_script, isomap, editmap, chawathe
+
+
+_LISTENERS = ()
+_LISTENERS_LOCK = threading.Lock()
+
+_CURRENT = ContextVar("code_diff_span", default = None)
+
+
+class Span:
+    """
+    Timing of a single pipeline stage
+
+    Attributes
+    ----------
+    stage : str
+        Name of the pipeline stage
+
+    lang : str
+        Language of the processed code (inherited from the enclosing span)
+
+    start, duration : float
+        Start time (perf_counter) and duration in seconds
+
+    parent : Span
+        Enclosing span (or None)
+
+    thread : int
+        Identifier of the executing thread
+
+    attrs : dict
+        Further measurements such as the number of nodes (nodes)
+
+    """
+
+    __slots__ = ("stage", "lang", "attrs", "start", "duration", "parent", "thread", "_token")
+
+    def __init__(self, stage, lang = None, attrs = None):
+        self.stage    = stage
+        self.lang     = lang
+        self.attrs    = attrs if attrs is not None else {}
+        self.start    = None
+        self.duration = None
+        self.parent   = None
+        self.thread   = None
+
+    def set(self, **attrs):
+        """Adds measurements to the span"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _CURRENT.get()
+        self.thread = threading.get_ident()
+        if self.lang is None and self.parent is not None: self.lang = self.parent.lang
+
+        self._token = _CURRENT.set(self)
+        self.start  = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        _CURRENT.reset(self._token)
+
+        if exc_type is not None: self.attrs["error"] = exc_type.__name__
+
+        for listener in _LISTENERS: listener(self)
+
+        return False
+
+    def __repr__(self):
+        return "Span(%s, %.3f ms)" % (self.stage, 1000 * (self.duration or 0.0))
+
+
+class _NullSpan:
+    """Span that does nothing (used if no listener is registered)"""
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage, lang = None, **attrs):
+    """Returns a context manager measuring the given stage"""
+    if not _LISTENERS: return _NULL_SPAN
+    return Span(stage, lang, attrs)
+
+
+def add_listener(listener):
+    """Registers a callback which is called with every finished Span"""
+    global _LISTENERS
+    with _LISTENERS_LOCK:
+        _LISTENERS = _LISTENERS + (listener,)
+
+
+def remove_listener(listener):
+    """Removes a previously registered callback"""
+    global _LISTENERS
+    with _LISTENERS_LOCK:
+        listeners = list(_LISTENERS)
+        listeners.remove(listener)
+        _LISTENERS = tuple(listeners)
+
+
+# Recorder ----------------------------------------------------------------
+
+class Recorder:
+    """Listener that collects all spans and exports them"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def __call__(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def summary(self):
+        """
+        Aggregates the recorded spans per stage
+
+        Returns
+        -------
+        dict
+            Maps stage names to count, total, mean and max
+            duration (seconds) and the total number of nodes
+
+        """
+        summary = {}
+
+        for span in self.spans:
+            try:
+                stats = summary[span.stage]
+            except KeyError:
+                stats = summary[span.stage] = {"count": 0, "total": 0.0, "max": 0.0, "nodes": 0}
+
+            stats["count"] += 1
+            stats["total"] += span.duration
+            stats["max"]    = max(stats["max"], span.duration)
+            stats["nodes"] += span.attrs.get("nodes", 0)
+
+        for stats in summary.values():
+            stats["mean"] = stats["total"] / stats["count"]
+
+        return summary
+
+    def chrome_trace(self):
+        """Exports the recorded spans as Chrome trace events (chrome://tracing, Perfetto)"""
+        pid    = os.getpid()
+        events = []
+
+        for span in self.spans:
+            args = dict(span.attrs)
+            if span.lang is not None: args["lang"] = span.lang
+
+            events.append({
+                "name": span.stage,
+                "cat" : "code_diff",
+                "ph"  : "X",
+                "ts"  : span.start * 1e6,
+                "dur" : span.duration * 1e6,
+                "pid" : pid,
+                "tid" : span.thread,
+                "args": args,
+            })
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class instrument:
+    """
+    Context manager that instruments all diffs computed inside
+
+    Parameters
+    ----------
+    listener : callable
+        Callback receiving every finished Span.
+        Default: a new Recorder
+
+    Example
+    -------
+    with instrument() as recorder:
+        difference(source, target, lang = "python").edit_script()
+
+    recorder.summary()
+
+    """
+
+    def __init__(self, listener = None):
+        self.listener = listener if listener is not None else Recorder()
+
+    def __enter__(self):
+        add_listener(self.listener)
+        return self.listener
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        remove_listener(self.listener)
+        return False
@@ -0,0 +1,67 @@
+import threading
+
+from collections import OrderedDict
+
+# Diff memo ----------------------------------------------------------------
+# All diffs derived from the same code pair (statement_diff, root_diff,
+# regions) share a memo. The memo stores computed edit mappings and
+# edit scripts keyed by the (source, target) subtrees they were computed
+# for. Therefore, requesting the same script at another level only
+# recomputes it if the diff raises to other subtrees.
+#
+# ASTs are not modified after parsing and nodes are hashed by identity.
+# Entries stay valid as long as the ASTs of the pair are alive, which is
+# guaranteed since entries reference their nodes. The memo is bounded
+# by the number of entries (least recently used entries are evicted).
+
+
+class DiffMemo:
+    """
+    Bounded LRU cache shared by all diffs of a code pair
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximal number of stored mappings and scripts
+        Default: 16
+
+    """
+
+    def __init__(self, max_entries = 16):
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+
+        self.hits   = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, compute_fn):
+        """Returns the value stored for key. Computes and stores the value on a miss."""
+        with self._lock:
+            try:
+                value = self._entries[key]
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            except KeyError:
+                self.misses += 1
+
+        # Computed outside of the lock (computations can use the memo)
+        value = compute_fn()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last = False)
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
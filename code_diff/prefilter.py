@@ -0,0 +1,217 @@
+import re
+
+from .compact import CompactNode, _COL_BITS
+
+# Line prefilter ----------------------------------------------------------------
+# Large files are often changed in only a few lines. Instead of parsing
+# both files completely, we trim the common lines at the beginning and
+# the end of both files and only parse the remaining window.
+#
+# The window is expanded to top-level boundaries: lines without
+# indentation that start a new logical line and syntactic unit. The window is only used
+# if both windows can be parsed without errors (see Differ). Positions
+# of the parsed window are shifted back to full file coordinates.
+
+
+_CONTINUATION_PREFIXES = (")", "]", "}", "else", "elif", "except", "finally", "catch", "case", "default")
+
+
+class LineWindow:
+    """Lines [start, source_end) of the source that were changed to lines [start, target_end) of the target"""
+
+    def __init__(self, start, source_end, target_end, source_code, target_code):
+        self.start       = start
+        self.source_end  = source_end
+        self.target_end  = target_end
+        self.source_code = source_code
+        self.target_code = target_code
+
+
+# Lexical scan ----------------------------------------------------------------
+# Lines inside of multi-line strings, comments or brackets (and lines
+# continued by a backslash) can look like boundaries. Therefore, we scan
+# the code for strings, comments, brackets and line continuations to
+# find the lines that start a new logical line.
+
+_CODE_PATTERNS = {
+    "python"    : re.compile(r"""#[^\n]*|\"\"\"|'''|"|'|[()\[\]{}]|\\\r?\n|\n"""),
+    "java"      : re.compile(r"""//[^\n]*|/\*|\"\"\"|"|'|[()\[\]{}]|\n"""),
+    "javascript": re.compile(r"""//[^\n]*|/\*|"|'|`|[()\[\]{}]|\n"""),
+}
+
+_CLOSING_PATTERNS = {
+    "/*"   : re.compile(r"\*/"),
+    "`"    : re.compile(r"\\.|`", re.S),
+    '"""'  : re.compile(r'\\.|"""', re.S),
+    "'''"  : re.compile(r"\\.|'''", re.S),
+    '"'    : re.compile(r'\\.|"|\n', re.S),
+    "'"    : re.compile(r"\\.|'|\n", re.S),
+}
+
+
+def _scan(code, lang, start = 0, end = None, line_starts = None):
+    """
+    Scans code[start:end] for strings, comments, brackets and line continuations
+
+    Returns the open string or comment delimiter (or None) and the bracket
+    depth at the end. If line_starts is given, the offsets of all lines that
+    start a new logical line (outside of strings, comments and brackets
+    and not continued by a backslash) are added to it.
+    """
+    if end is None: end = len(code)
+
+    code_pattern = _CODE_PATTERNS[lang]
+    delimiter    = None
+    depth        = 0
+    position     = start
+
+    while position < end:
+        if delimiter is None:
+            match = code_pattern.search(code, position, end)
+            if match is None: break
+
+            token = match.group()
+            if token == "\n":
+                if depth == 0 and line_starts is not None: line_starts.add(match.end())
+            elif token in "([{":
+                depth += 1
+            elif token in ")]}":
+                depth = max(depth - 1, 0)
+            elif token[0] not in "#/\\" or token == "/*":
+                delimiter = token
+        else:
+            match = _CLOSING_PATTERNS[delimiter].search(code, position, end)
+            if match is None: break
+
+            token = match.group()
+            if token in (delimiter, "*/", "\n"): delimiter = None
+
+        position = match.end()
+
+    return delimiter, depth
+
+
+def _ends_logical_line(code, lang, at_end_of_file):
+    line_starts = set()
+    delimiter, _ = _scan(code, lang, line_starts = line_starts)
+
+    if at_end_of_file: return delimiter is None
+    return len(code) in line_starts
+
+
+def _is_boundary(line):
+    if len(line.strip()) == 0: return False
+    if line[0] in " \t": return False
+    return not line.startswith(_CONTINUATION_PREFIXES)
+
+
+def _common_prefix(source_lines, target_lines):
+    prefix = 0
+    limit  = min(len(source_lines), len(target_lines))
+
+    while prefix < limit and source_lines[prefix] == target_lines[prefix]:
+        prefix += 1
+
+    return prefix
+
+
+def _common_suffix(source_lines, target_lines, limit):
+    suffix = 0
+
+    while suffix < limit and source_lines[-suffix - 1] == target_lines[-suffix - 1]:
+        suffix += 1
+
+    return suffix
+
+
+def changed_window(source, target, lang = "python"):
+    """
+    Computes the window of lines that have to be parsed to diff source and target
+
+    Returns
+    -------
+    LineWindow
+        the changed window or None if the window covers the complete
+        files or if it does not end with a complete logical line
+
+    """
+    if lang not in _CODE_PATTERNS: return None
+
+    source_lines = source.splitlines(keepends = True)
+    target_lines = target.splitlines(keepends = True)
+
+    prefix = _common_prefix(source_lines, target_lines)
+    if prefix == len(source_lines) and prefix == len(target_lines): return None
+
+    suffix = _common_suffix(source_lines, target_lines,
+                             min(len(source_lines), len(target_lines)) - prefix)
+
+    # Boundaries have to start a new logical line
+    line_starts = {0}
+    _scan(source, lang, line_starts = line_starts)
+
+    offsets = [0]
+    for line in source_lines: offsets.append(offsets[-1] + len(line))
+
+    def is_boundary(i):
+        return offsets[i] in line_starts and _is_boundary(source_lines[i])
+
+    # Expand the window to the enclosing boundaries
+    start = min(prefix, len(source_lines) - 1)
+    while start > 0 and not is_boundary(start):
+        start -= 1
+
+    # Decorators belong to the following definition
+    while start > 0 and source_lines[start - 1].startswith("@") and offsets[start - 1] in line_starts:
+        start -= 1
+
+    end = len(source_lines) - suffix
+    while end < len(source_lines) and not is_boundary(end):
+        end += 1
+
+    # The window has to end before the decorators of the next definition
+    while end > start and end < len(source_lines) and source_lines[end - 1].startswith("@"):
+        end -= 1
+
+    if start == 0 and end == len(source_lines): return None
+
+    target_end = end + len(target_lines) - len(source_lines)
+
+    window = LineWindow(
+        start, end, target_end,
+        "".join(source_lines[start:end]),
+        "".join(target_lines[start:target_end]),
+    )
+
+    # Both windows have to end with a complete logical line
+    if not _ends_logical_line(window.source_code, lang, end == len(source_lines)): return None
+    if not _ends_logical_line(window.target_code, lang, target_end == len(target_lines)): return None
+
+    return window
+
+
+# Position shift ----------------------------------------------------------------
+
+def shift_rows(ast, rows):
+    """Shifts the positions of all nodes in the AST by the given number of rows"""
+
+    if isinstance(ast, CompactNode):
+        tree  = ast.tree
+        delta = rows << _COL_BITS
+
+        for name in ["starts", "ends"]:
+            values = getattr(tree, name)
+            for i in range(len(values)): values[i] += delta
+
+        # Backends are resolved by position and cannot be found anymore
+        tree.backend = None
+        return ast
+
+    stack = [ast]
+    while len(stack) > 0:
+        node = stack.pop()
+        (start_row, start_col), (end_row, end_col) = node.position
+        node.position = ((start_row + rows, start_col), (end_row + rows, end_col))
+        stack.extend(node.children)
+
+    return ast
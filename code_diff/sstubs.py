@@ -106,15 +106,16 @@ def _call_name(ast_node):
 
 
 def pisomorph(A, B):
-    if A.isomorph(B): return True
+    # Isomorphic up to parentheses (unwrapped iteratively)
+    while not A.isomorph(B):
+        if A.type == "parenthesized_expression":
+            A = A.children[1]
+        elif B.type == "parenthesized_expression":
+            B = B.children[1]
+        else:
+            return False
 
-    if A.type == "parenthesized_expression":
-        return pisomorph(A.children[1], B)
-    
-    if B.type == "parenthesized_expression":
-        return pisomorph(A, B.children[1])
-    
-    return False
+    return True
 
     
 
@@ -134,6 +135,38 @@ def is_binary_operand(source_ast, target_ast):
 
 # Single token edits --------------------------------
 
+# ASTs loaded from a store (see code_diff.store) have no tree-sitter
+# backend. Their fields are resolved by the position of the child.
+_FIELD_POSITIONS = {
+    ("call", "function"): 0,
+    ("attribute", "object"): 0,
+    ("attribute", "attribute"): 2,
+    ("keyword_argument", "name"): 0,
+    ("if_statement", "condition"): 1,
+    ("elif_clause", "condition"): 1,
+    ("while_statement", "condition"): 1,
+    ("binary_operator", "left"): 0,
+    ("binary_operator", "right"): 2,
+    ("boolean_operator", "left"): 0,
+    ("boolean_operator", "right"): 2,
+}
+
+
+def _field_child(ast_node, field_name):
+    if hasattr(ast_node, "backend"):
+        field_backend = ast_node.backend.child_by_field_name(field_name)
+        if field_backend is None: return None
+
+        for child in ast_node.children:
+            if getattr(child, "backend", None) == field_backend: return child
+
+        return None
+
+    position = _FIELD_POSITIONS.get((ast_node.type, field_name), None)
+    if position is None or position >= len(ast_node.children): return None
+    return ast_node.children[position]
+
+
 def _query_path(ast_node, type_query, edge_query = "*", depth = 1e9):
 
     last    = None
@@ -145,9 +178,7 @@ def _query_path(ast_node, type_query, edge_query = "*", depth = 1e9):
             if edge_query == "*":
                 return True
             elif last is not None:
-                if hasattr(current, "backend"):
-                    edge_child = current.backend.child_by_field_name(edge_query)
-                    return edge_child == last.backend
+                return _field_child(current, edge_query) is last
 
         last    = current
         current = current.parent
@@ -169,10 +200,8 @@ def _get_parent(ast_node, type_query, edge_query = "*", depth = 1e9):
             if edge_query == "*":
                 return current
             elif last is not None:
-                if hasattr(current, "backend"):
-                    edge_child = current.backend.child_by_field_name(edge_query)
-                    if edge_child == last.backend:
-                        return current
+                if _field_child(current, edge_query) is last:
+                    return current
 
         last    = current
         current = current.parent
@@ -190,8 +219,8 @@ def wrong_function_name(source_ast, target_ast):
     func_call = _get_parent(source_ast, "call", "function")
     if func_call is None: return False
     
-    right_most = func_call.backend.child_by_field_name("function")
-    while right_most is not None and right_most != source_ast.backend:
+    right_most = _field_child(func_call, "function")
+    while right_most is not None and right_most is not source_ast:
         if len(right_most.children) > 0:
             right_most = right_most.children[-1]
         else:
@@ -0,0 +1,351 @@
+import os
+import mmap
+import sqlite3
+import struct
+import tempfile
+import threading
+
+from array   import array
+from hashlib import blake2b
+
+from .compact import CompactAST, CompactNode, compact_tree
+from .hashing import get_hash_engine
+
+# Persistent AST store ----------------------------------------------------------
+# Parsed ASTs are serialized into a compact binary format such that
+# other processes (or later runs) can skip parsing completely.
+#
+# Layout (little endian, every section is aligned to 8 bytes):
+#   header        magic, format version, hash engine, number of nodes,
+#                 root index and size of the string tables
+#   int32 arrays  parents, first_child, next_sibling, types, texts, heights, weights
+#   uint64 arrays starts, ends, hashes
+#   strings       type table and text table, each as uint32 offsets + UTF-8 blob
+#
+# Nodes are stored in preorder. Files are loaded by memory mapping.
+# Arrays are used in place and strings are only decoded on access.
+# Therefore, only the nodes touched by a diff computation are materialized.
+
+
+FORMAT_MAGIC   = b"CDIFFAST"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sIIqqqq")
+
+_INT_ARRAYS   = ["parents", "first_child", "next_sibling", "types", "texts", "heights", "weights"]
+_UINT64_ARRAYS = ["starts", "ends", "hashes"]
+
+
+class StaleFormatError(ValueError):
+    """Raised if a serialized AST was written with another format version or hash engine"""
+    pass
+
+
+def _engine_name():
+    engine = get_hash_engine()
+    return getattr(engine, "name", repr(engine))
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+# Encoding ----------------------------------------------------------------
+
+def _preorder(tree):
+    order = []
+    stack = [tree.root]
+
+    while len(stack) > 0:
+        node_id = stack.pop()
+        order.append(node_id)
+        stack.extend(reversed(list(tree.children_of(node_id))))
+
+    return order
+
+
+def _encode_strings(table):
+    blobs   = [s.encode("utf-8") for s in table]
+    offsets = array("I", [0])
+
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    return offsets.tobytes(), b"".join(blobs)
+
+
+def dumps(ast):
+    """
+    Serializes the given AST into the binary AST format
+
+    Parameters
+    ----------
+    ast : ASTNode
+        Root of the AST. ASTNode trees are converted into
+        a compact tree first.
+
+    Returns
+    -------
+    bytes
+        the serialized AST
+
+    """
+    if not isinstance(ast, CompactNode) or ast.tree.root != ast.index:
+        ast = compact_tree(ast)
+
+    tree  = ast.tree
+    order = _preorder(tree)
+
+    new_index = array("i", [-1]) * len(tree)
+    for i, node_id in enumerate(order): new_index[node_id] = i
+
+    def _remap(node_id):
+        return new_index[node_id] if node_id != -1 else -1
+
+    sections = {
+        "parents": array("i", (_remap(tree.parents[n]) for n in order)),
+        "first_child": array("i", (_remap(tree.first_child[n]) for n in order)),
+        "next_sibling": array("i", (_remap(tree.next_sibling[n]) for n in order)),
+    }
+
+    for name in ["types", "texts", "heights", "weights"]:
+        values = getattr(tree, name)
+        sections[name] = array("i", (values[n] for n in order))
+
+    for name in _UINT64_ARRAYS:
+        values = getattr(tree, name)
+        sections[name] = array("Q", (values[n] for n in order))
+
+    engine = _engine_name().encode("utf-8")
+    type_offsets, type_blob = _encode_strings(tree.type_table)
+    text_offsets, text_blob = _encode_strings(tree.text_table)
+
+    chunks = [_HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, len(engine), len(order), 0,
+                            len(tree.type_table), len(tree.text_table)), engine]
+    chunks.extend(sections[name].tobytes() for name in _INT_ARRAYS + _UINT64_ARRAYS)
+    chunks.extend([type_offsets, type_blob, text_offsets, text_blob])
+
+    output = bytearray()
+    for chunk in chunks:
+        output.extend(b"\0" * (_align(len(output)) - len(output)))
+        output.extend(chunk)
+
+    return bytes(output)
+
+
+# Decoding ----------------------------------------------------------------
+
+class _StringTable:
+    """String table that decodes strings on first access"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob    = blob
+        self._cache  = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        try:
+            return self._cache[index]
+        except KeyError:
+            value = str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+            self._cache[index] = value
+            return value
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def loads(buffer):
+    """
+    Loads a serialized AST from the given buffer
+
+    The buffer is not copied. Nodes and strings are decoded lazily.
+
+    Parameters
+    ----------
+    buffer : bytes-like
+        Serialized AST (e.g. bytes or mmap)
+
+    Returns
+    -------
+    CompactNode
+        the root of the loaded AST (without tree-sitter backend)
+
+    Raises
+    ------
+    StaleFormatError
+        if the AST was serialized with another format version or hash engine
+
+    """
+    view = memoryview(buffer)
+
+    if len(view) < _HEADER.size:
+        raise ValueError("Buffer is too small to contain a serialized AST")
+
+    magic, version, engine_length, num_nodes, root, num_types, num_texts = _HEADER.unpack_from(view)
+
+    if magic != FORMAT_MAGIC:
+        raise ValueError("Buffer does not contain a serialized AST")
+
+    if version != FORMAT_VERSION:
+        raise StaleFormatError("Unsupported AST format version %d (expected %d)" % (version, FORMAT_VERSION))
+
+    offset = _HEADER.size
+    engine = str(view[offset:offset + engine_length], "utf-8")
+
+    if engine != _engine_name():
+        raise StaleFormatError("AST was hashed with %s (expected %s)" % (engine, _engine_name()))
+
+    offset += engine_length
+
+    def _section(size, format):
+        nonlocal offset
+        offset = _align(offset)
+        section = view[offset:offset + size]
+        offset += size
+        if len(section) != size: raise ValueError("Serialized AST is truncated")
+        return section.cast(format)
+
+    tree = CompactAST()
+
+    for name in _INT_ARRAYS:
+        setattr(tree, name, _section(4 * num_nodes, "i"))
+
+    for name in _UINT64_ARRAYS:
+        setattr(tree, name, _section(8 * num_nodes, "Q"))
+
+    for name, size in [("type_table", num_types), ("text_table", num_texts)]:
+        offsets = _section(4 * (size + 1), "I")
+        blob    = _section(offsets[-1], "B")
+        setattr(tree, name, _StringTable(offsets, blob))
+
+    tree.finalize(root)
+    tree._buffer = buffer
+
+    return tree.root_node()
+
+
+def write_ast(path, ast):
+    """Atomically writes the serialized AST to the given path"""
+    data = dumps(ast)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok = True)
+
+    fd, tmp_path = tempfile.mkstemp(dir = directory, suffix = ".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+
+def read_ast(path, use_mmap = True):
+    """Loads a serialized AST from the given path (memory mapped by default)"""
+    with open(path, "rb") as f:
+        if not use_mmap: return loads(f.read())
+
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Buffer is too small to contain a serialized AST")
+
+        buffer = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+    return loads(buffer)
+
+
+# Stores ----------------------------------------------------------------
+# Stores map keys (hex digests) to serialized ASTs. Entries that cannot
+# be loaded (e.g. written by an older version) are removed and reported
+# as missing.
+
+
+def store_key(source_code, lang, **kwargs):
+    """Computes the store key of the given source code"""
+    digest = blake2b(digest_size = 20)
+    digest.update(repr((lang, _engine_name(), sorted(kwargs.items()))).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(source_code.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DirectoryStore:
+    """Stores every AST as a single file in a local directory"""
+
+    def __init__(self, path, use_mmap = True):
+        self.path     = path
+        self.use_mmap = use_mmap
+        os.makedirs(path, exist_ok = True)
+
+    def _file_path(self, key):
+        return os.path.join(self.path, key[:2], key + ".ast")
+
+    def __contains__(self, key):
+        return os.path.exists(self._file_path(key))
+
+    def get(self, key):
+        path = self._file_path(key)
+
+        try:
+            return read_ast(path, use_mmap = self.use_mmap)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            self.remove(key)
+            return None
+
+    def put(self, key, ast):
+        write_ast(self._file_path(key), ast)
+
+    def remove(self, key):
+        try:
+            os.remove(self._file_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteStore:
+    """Stores all ASTs in a single SQLite database"""
+
+    def __init__(self, path):
+        self.path  = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread = False)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS asts (key TEXT PRIMARY KEY, data BLOB NOT NULL)"
+            )
+
+    def __contains__(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT 1 FROM asts WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM asts WHERE key = ?", (key,)).fetchone()
+
+        if row is None: return None
+
+        try:
+            return loads(row[0])
+        except ValueError:
+            self.remove(key)
+            return None
+
+    def put(self, key, ast):
+        data = dumps(ast)
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO asts (key, data) VALUES (?, ?)", (key, data))
+
+    def remove(self, key):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM asts WHERE key = ?", (key,))
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,149 @@
+from collections import deque
+
+# Tree traversal ----------------------------------------------------------------
+# Linear time traversals over ASTs. All traversals are iterative
+# (no recursion limit) and only rely on the children of a node.
+#
+# Traversal orders of complete trees can be precomputed once and are
+# cached on the root node (see traversal_index).
+
+
+def bfs(tree):
+    """Visits all nodes in breadth-first order"""
+    queue = deque([tree])
+
+    while len(queue) > 0:
+        node = queue.popleft()
+        yield node
+        queue.extend(node.children)
+
+
+def level_order(tree):
+    """Yields the nodes of the tree level by level (as lists)"""
+    level = [tree]
+
+    while len(level) > 0:
+        yield level
+        level = [child for node in level for child in node.children]
+
+
+def preorder(tree):
+    """Visits all nodes in preorder (parents before children, left to right)"""
+    stack = [tree]
+
+    while len(stack) > 0:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+def postorder(tree):
+    """Visits all nodes in postorder (children before parents, left to right)"""
+    stack = [(tree, 0)]
+
+    while len(stack) > 0:
+        node, ix = stack[-1]
+        children = node.children
+
+        if ix < len(children):
+            stack[-1] = (node, ix + 1)
+            stack.append((children[ix], 0))
+        else:
+            stack.pop()
+            yield node
+
+
+# Traversal index ----------------------------------------------------------------
+
+class TraversalIndex:
+    """
+    Precomputed traversal orders of a tree
+
+    Attributes
+    ----------
+    preorder : list[ASTNode]
+        All nodes of the tree in preorder
+
+    postorder : list[ASTNode]
+        All nodes of the tree in postorder
+
+    """
+
+    def __init__(self, tree):
+        self.root      = tree
+        self.preorder  = list(preorder(tree))
+        self.postorder = list(postorder(tree))
+
+    def __len__(self):
+        return len(self.preorder)
+
+
+def traversal_index(tree):
+    """
+    Returns the traversal index of the given tree
+
+    The index is computed on first access and cached on the root.
+    Therefore, the tree should not be modified afterwards.
+    """
+    try:
+        return tree._traversal_index
+    except AttributeError:
+        index = TraversalIndex(tree)
+        tree._traversal_index = index
+        return index
+
+
+# Euler tour ----------------------------------------------------------------
+# Every node of a tree is annotated with its preorder entry number,
+# the entry number of its last descendant (exit) and its depth.
+# All descendants of a node are then exactly the nodes with an entry
+# number in (entry, exit]. Annotations are computed for the complete
+# tree on first access.
+
+
+def _annotate_tour(root):
+    index = traversal_index(root)
+
+    for entry, node in enumerate(index.preorder):
+        depth = 0 if node is root else node.parent._tour[3] + 1
+        node._tour = (index, entry, entry + node.subtree_weight - 1, depth)
+
+
+def euler_tour(node):
+    """Returns the tour annotation (index, entry, exit, depth) of the given node"""
+    try:
+        tour = node._tour
+        if tour[0].root.parent is None: return tour
+    except AttributeError:
+        pass
+
+    root = node
+    while root.parent is not None:
+        root = root.parent
+
+    _annotate_tour(root)
+    return node._tour
+
+
+def depth(node):
+    """Distance of the node to the root of its tree"""
+    return euler_tour(node)[3]
+
+
+def descendant_range(node):
+    """Range of preorder numbers (start, end) of all (proper) descendants"""
+    _, entry, exit, _ = euler_tour(node)
+    return (entry + 1, exit + 1)
+
+
+def descendants(node):
+    """All (proper) descendants of the node in preorder"""
+    index, entry, exit, _ = euler_tour(node)
+    return index.preorder[entry + 1:exit + 1]
+
+
+def is_ancestor(a, b):
+    """Whether a is a (proper) ancestor of b"""
+    index_a, entry_a, exit_a, _ = euler_tour(a)
+    index_b, entry_b, _, _      = euler_tour(b)
+    return index_a is index_b and entry_a < entry_b <= exit_a
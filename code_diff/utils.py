@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 
 def cached_property(fnc):
     name = fnc.__name__
@@ -10,4 +12,52 @@ def cached_property(fnc):
         
         return self._cache[name]
     
-    return property(load_from_cache)
\ No newline at end of file
+    return property(load_from_cache)
+
+# Type matching ----------------------------------------------------------------
+
+class TypeMatcher:
+    """
+    Compiled matcher for a list of node type patterns
+
+    Supports the same patterns as code_tokenize's match_type
+    (exact types, prefix* and *suffix). Results are memoized per type.
+    """
+
+    def __init__(self, type_patterns):
+        exact         = set()
+        self.prefixes = []
+        self.suffixes = []
+
+        for pattern in type_patterns:
+            star_count = pattern.count("*")
+
+            if star_count == 0:
+                exact.add(pattern)
+            elif star_count == 1 and pattern[0] == "*":
+                self.suffixes.append(pattern[1:])
+            elif star_count == 1 and pattern[-1] == "*":
+                self.prefixes.append(pattern[:-1])
+            else:
+                raise ValueError("Unsupported type regex: %s" % pattern)
+
+        self.exact    = frozenset(exact)
+        self.prefixes = tuple(self.prefixes)
+        self.suffixes = tuple(self.suffixes)
+        self._cache   = {}
+
+    def __call__(self, node_type):
+        try:
+            return self._cache[node_type]
+        except KeyError:
+            result = (node_type in self.exact
+                        or node_type.startswith(self.prefixes)
+                        or node_type.endswith(self.suffixes))
+            self._cache[node_type] = result
+            return result
+
+
+@lru_cache(maxsize = None)
+def compile_type_matcher(type_patterns):
+    """Returns the shared matcher for the given tuple of type patterns"""
+    return TypeMatcher(type_patterns)
@@ -18,6 +18,7 @@ setup(
   keywords = ['code', 'differencing', 'AST', 'program', 'language processing'], 
   install_requires=[          
           'code-tokenize>=0.2.1',
+          'code-ast',
           'apted'
       ],
   classifiers=[
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+import code_diff as cd
+
+from code_diff         import aio, adifference, AsyncDiffer, DiffOverloadedError
+from code_diff.gumtree import serialize_script
+
+
+SOURCE, TARGET = "x = a + b", "x = a + c"
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+# Tests --------------------------------------------------------------
+
+def test_adifference():
+    expected = cd.difference(SOURCE, TARGET, lang = "python")
+
+    async def main():
+        diff = await adifference(SOURCE, TARGET, lang = "python")
+        return diff, await diff.aedit_script()
+
+    diff, edit_script = _run(main())
+
+    assert repr(diff) == repr(expected)
+    assert repr(edit_script) == repr(expected.edit_script())
+
+
+def test_async_differ_thread():
+    async def main():
+        async with AsyncDiffer("python", max_concurrency = 2) as differ:
+            diffs = await asyncio.gather(*[differ.difference(SOURCE, TARGET) for _ in range(8)])
+            return diffs, await differ.edit_script(diffs[0])
+
+    diffs, edit_script = _run(main())
+
+    expected = repr(cd.difference(SOURCE, TARGET, lang = "python"))
+    assert all(repr(diff) == expected for diff in diffs)
+    assert len(edit_script) > 0
+
+
+def test_async_differ_errors():
+    async def main():
+        async with AsyncDiffer("python") as differ:
+            await differ.difference(SOURCE, SOURCE)
+
+    with pytest.raises(ValueError):
+        _run(main())
+
+
+def test_async_differ_backpressure():
+    release = threading.Event()
+
+    async def main():
+        async with AsyncDiffer("python", max_concurrency = 1, max_pending = 1) as differ:
+            blocker = asyncio.ensure_future(differ._submit(release.wait))
+            waiting = asyncio.ensure_future(differ.difference(SOURCE, TARGET))
+            await asyncio.sleep(0.05)
+
+            assert differ.pending == 1
+            with pytest.raises(DiffOverloadedError):
+                await differ.difference(SOURCE, TARGET)
+
+            # Cancelled requests never run
+            waiting.cancel()
+            await asyncio.sleep(0)
+            assert differ.pending == 0
+
+            release.set()
+            await blocker
+            return await differ.difference(SOURCE, TARGET)
+
+    assert repr(_run(main())) == repr(cd.difference(SOURCE, TARGET, lang = "python"))
+
+
+def test_async_differ_created_outside_loop():
+    differ = AsyncDiffer("python", max_concurrency = 1)
+
+    async def main():
+        return await asyncio.gather(*[differ.difference(SOURCE, TARGET) for _ in range(3)])
+
+    try:
+        diffs = _run(main())
+    finally:
+        differ.close()
+
+    expected = repr(cd.difference(SOURCE, TARGET, lang = "python"))
+    assert all(repr(diff) == expected for diff in diffs)
+
+
+@pytest.mark.parametrize("version", [(3, 8), (3, 11)])
+def test_async_differ_close_cancels_queued(monkeypatch, version):
+    # Python 3.8 has no cancel_futures. Queued diffs are cancelled manually.
+    monkeypatch.setattr(aio.sys, "version_info", version)
+    release = threading.Event()
+
+    async def main():
+        differ  = AsyncDiffer("python", max_workers = 1, max_concurrency = 2)
+        running = asyncio.ensure_future(differ._submit(release.wait))
+        queued  = asyncio.ensure_future(differ._submit(release.wait))
+        await asyncio.sleep(0.05)
+
+        differ.close(wait = False)
+        release.set()
+        await running
+
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    _run(main())
+
+
+def test_async_differ_process():
+    async def main():
+        async with AsyncDiffer("python", executor = "process", max_workers = 2) as differ:
+            return await asyncio.gather(*[differ.difference(SOURCE, TARGET) for _ in range(4)])
+
+    expected = serialize_script(cd.difference(SOURCE, TARGET, lang = "python").edit_script())
+    assert _run(main()) == [expected] * 4
+
+
+def test_async_differ_process_requires_serialized_output():
+    with pytest.raises(ValueError):
+        AsyncDiffer("python", executor = "process", output = "diff")
@@ -0,0 +1,97 @@
+import os
+
+import code_tokenize as ct
+
+from code_diff.ast import BottomUpParser, TreeCursorParser, default_create_node, parse_ast
+
+from tests.utils import assert_same_tree
+
+# Util --------------------------------------------------------------
+
+def parse_both(source_code, lang):
+    tokens = ct.tokenize(source_code, lang = lang, syntax_error = "ignore")
+    return (BottomUpParser(default_create_node)(tokens),
+             TreeCursorParser(default_create_node)(tokens))
+
+
+def assert_equivalent(source_code, lang):
+    expected, actual = parse_both(source_code, lang)
+    assert_same_tree(expected, actual, same_backend = True)
+
+    # Native ASTs are built from a new tree-sitter tree
+    native = parse_ast(source_code, lang = lang, native = True)
+    assert_same_tree(expected, native, backend = True)
+
+
+# Python --------------------------------------------------------------
+
+def test_python_simple():
+    assert_equivalent("x = x + 1", "python")
+
+
+def test_python_comments():
+    assert_equivalent("""
+# Leading comment
+def test(a, b): # Inline comment
+    # Comment in block
+    return a + b # Trailing
+""", "python")
+
+
+def test_python_strings_and_unary():
+    assert_equivalent("""
+x = "Hello World" + 'single' + f"format {x}"
+y = -1 + -x + (not z)
+z = \"\"\"
+Multiline
+\"\"\"
+""", "python")
+
+
+def test_python_syntax_error():
+    assert_equivalent("test.call(x, y", "python")
+
+
+def test_python_only_comments():
+    assert_equivalent("# Only a comment", "python")
+
+
+def test_python_package_sources():
+    package_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "code_diff")
+
+    for root, _, files in os.walk(package_dir):
+        for file_name in files:
+            if not file_name.endswith(".py"): continue
+            with open(os.path.join(root, file_name), "r") as f:
+                assert_equivalent(f.read(), "python")
+
+
+# Java --------------------------------------------------------------
+
+def test_java_method():
+    assert_equivalent("""
+public class Test {
+    // Comment
+    public int test(int x) {
+        /* Block comment */
+        int y = x + 1;
+        return y * -2 + "test".length();
+    }
+}
+""", "java")
+
+
+def test_java_snippet():
+    assert_equivalent("int x = x + 1;", "java")
+
+
+# JavaScript --------------------------------------------------------------
+
+def test_javascript_function():
+    assert_equivalent("""
+function test(a, b) {
+    // Comment
+    const x = `template ${a}`;
+    return a.call(b, "string", -1);
+}
+""", "javascript")
@@ -0,0 +1,59 @@
+import pytest
+
+import code_diff as cd
+
+from code_diff import difference_many, BatchResult
+from code_diff.gumtree import serialize_script
+
+
+PAIRS = [
+    ("x = a + b", "x = a + c"),
+    ("x = 1", "x = 1"),
+    ("foo(a)", "bar(a)"),
+    ("if x:\n    y = 1\n", "if x:\n    y = 2\n"),
+] * 3
+
+
+def _expected(source, target):
+    return serialize_script(cd.difference(source, target, lang = "python").edit_script())
+
+
+# Tests --------------------------------------------------------------
+
+def test_difference_many_inline():
+    results = list(difference_many(PAIRS, lang = "python", workers = 1))
+
+    assert [r.index for r in results] == list(range(len(PAIRS)))
+
+    for result, (source, target) in zip(results, PAIRS):
+        if source == target:
+            assert not result.ok and result.error.startswith("ValueError")
+        else:
+            assert result.ok and result.value == _expected(source, target)
+
+
+def test_difference_many_pool_ordered():
+    inline = list(difference_many(PAIRS, lang = "python", workers = 1))
+    pooled = list(difference_many(PAIRS, lang = "python", workers = 2, chunksize = 2, max_pending = 2))
+
+    assert [(r.index, r.value, r.error) for r in pooled] == [(r.index, r.value, r.error) for r in inline]
+
+
+def test_difference_many_pool_unordered():
+    results = list(difference_many(PAIRS, lang = "python", workers = 2, chunksize = 1, ordered = False))
+
+    assert sorted(r.index for r in results) == list(range(len(PAIRS)))
+    assert sum(not r.ok for r in results) == 3
+
+
+def test_difference_many_sstub():
+    results = list(difference_many([("foo(a)", "bar(a)")], lang = "python", workers = 2, output = "sstub"))
+    assert results[0].value == "WRONG_FUNCTION_NAME"
+
+
+def test_difference_many_diff_output():
+    result = next(difference_many(PAIRS, lang = "python", workers = 1, output = "diff"))
+    assert isinstance(result, BatchResult) and isinstance(result.value, cd.ASTDiff)
+
+    with pytest.raises(ValueError):
+        difference_many(PAIRS, lang = "python", workers = 2, output = "diff")
@@ -0,0 +1,112 @@
+import code_diff as cd
+
+from code_diff.ast     import parse_ast
+from code_diff.cache   import ParseCache
+from code_diff.hashing import set_hash_engine, LegacyStringHash
+
+from tests.utils import assert_same_tree
+
+source_code = """
+def test(a, b):
+    return a + b
+"""
+
+# Tests --------------------------------------------------------------
+
+def test_cache_hit():
+    cache = ParseCache()
+
+    first  = cache.parse(source_code, lang = "python")
+    second = cache.parse(source_code, lang = "python")
+
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert first is not second
+    assert_same_tree(parse_ast(source_code, lang = "python"), second)
+
+
+def test_cache_returns_independent_copies():
+    cache = ParseCache()
+
+    first = cache.parse(source_code, lang = "python")
+    first.children[0].parent = None
+
+    second = cache.parse(source_code, lang = "python")
+    assert second.children[0].parent is second
+
+
+def test_cache_share():
+    cache = ParseCache()
+    assert cache.parse(source_code, lang = "python", share = True) is cache.parse(source_code, lang = "python", share = True)
+
+
+def test_cache_key_contains_lang_and_mode():
+    cache = ParseCache()
+
+    cache.parse("x = 1;", lang = "java")
+    cache.parse("x = 1;", lang = "javascript")
+    cache.parse("x = 1;", lang = "javascript", compact = True)
+
+    assert cache.stats.misses == 3
+    assert len(cache) == 3
+
+
+def test_cache_key_contains_hash_engine():
+    cache = ParseCache()
+    cache.parse(source_code, lang = "python")
+
+    previous = set_hash_engine(LegacyStringHash())
+    try:
+        cache.parse(source_code, lang = "python")
+    finally:
+        set_hash_engine(previous)
+
+    assert cache.stats.misses == 2
+
+
+def test_cache_compact():
+    cache = ParseCache()
+
+    cache.parse(source_code, lang = "python", compact = True)
+    ast = cache.parse(source_code, lang = "python", compact = True)
+
+    assert cache.stats.hits == 1
+    assert_same_tree(parse_ast(source_code, lang = "python"), ast)
+
+
+def test_cache_evict_entries():
+    cache = ParseCache(max_entries = 2)
+
+    cache.parse("x = 1", lang = "python")
+    cache.parse("x = 2", lang = "python")
+    cache.parse("x = 1", lang = "python")
+    cache.parse("x = 3", lang = "python")
+
+    # x = 2 is least recently used
+    assert cache.stats.evictions == 1
+    cache.parse("x = 1", lang = "python")
+    assert cache.stats.hits == 2
+    cache.parse("x = 2", lang = "python")
+    assert cache.stats.misses == 4
+
+
+def test_cache_evict_nodes():
+    cache = ParseCache(max_nodes = 10)
+
+    cache.parse(source_code, lang = "python")
+
+    assert len(cache) == 0
+    assert cache.num_nodes == 0
+    assert cache.stats.evictions == 1
+
+
+def test_global_cache():
+    cache = cd.enable_parse_cache()
+    try:
+        cd.difference(source_code, source_code.replace("a + b", "a - b"), lang = "python")
+        cd.difference(source_code, source_code.replace("a + b", "a - b"), lang = "python")
+    finally:
+        cd.disable_parse_cache()
+
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 2
@@ -0,0 +1,57 @@
+import pytest
+
+import code_diff as cd
+
+from code_diff import ChangeKind, Differ
+
+
+# Tests --------------------------------------------------------------
+
+def test_compare_identical():
+    result = cd.compare("x = 1\n", "x = 1\n", lang = "python")
+
+    assert result.kind == ChangeKind.IDENTICAL
+    assert result.diff is None and not result
+
+
+def test_compare_formatting_python():
+    source = "def f(a, b):\n    return a+b\n"
+    target = "def f(a,  b):  # sum\n    # comment\n    return a + b\n"
+
+    result = cd.compare(source, target, lang = "python")
+    assert result.kind == ChangeKind.FORMATTING
+
+
+def test_compare_indentation_is_structural():
+    source = "if x:\n    a()\nb()\n"
+    target = "if x:\n    a()\n    b()\n"
+
+    result = cd.compare(source, target, lang = "python")
+    assert result.kind == ChangeKind.STRUCTURAL
+
+
+def test_compare_formatting_java():
+    source = "int f() { return 1; }"
+    target = "int f() {\n  // one\n  return 1;\n}"
+
+    assert cd.compare(source, target, lang = "java").kind == ChangeKind.FORMATTING
+
+
+def test_compare_structural():
+    source, target = "x = a + b\n", "x = a + c\n"
+    result = Differ("python").compare(source, target)
+
+    assert result.kind == ChangeKind.STRUCTURAL and result
+    assert repr(result.diff) == repr(cd.difference(source, target, lang = "python"))
+    assert repr(result.diff.edit_script()) == repr(cd.difference(source, target, lang = "python").edit_script())
+
+
+def test_compare_semicolon_is_structural():
+    # Semicolons are part of the AST
+    result = cd.compare("a()\nb()\n", "a(); b()\n", lang = "python")
+    assert result.kind == ChangeKind.STRUCTURAL
+
+
+def test_compare_empty():
+    with pytest.raises(ValueError):
+        cd.compare("", "x = 1", lang = "python")
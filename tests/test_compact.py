@@ -0,0 +1,70 @@
+import code_diff as cd
+
+from code_diff.ast     import parse_ast
+from code_diff.compact import CompactNode, compact_tree
+from code_diff.gumtree import compute_edit_script
+
+from tests.utils import assert_same_tree
+
+source_code = """
+def compute(a, b):
+    result = a + b * 2 # Comment
+    if result > 10:
+        return test.call("Hello World", result)
+    return [a, b]
+"""
+
+target_code = """
+def compute(a, b):
+    result = a - b * 2
+    if result >= 10:
+        return test.call_async("Hello World", result)
+    return [a, b, 1]
+"""
+
+# Tests --------------------------------------------------------------
+
+def test_compact_parse():
+    ast     = parse_ast(source_code, lang = "python")
+    compact = parse_ast(source_code, lang = "python", compact = True)
+
+    assert isinstance(compact, CompactNode)
+    assert_same_tree(ast, compact)
+
+
+def test_compact_convert():
+    ast = parse_ast(source_code, lang = "python")
+    assert_same_tree(ast, compact_tree(ast))
+
+
+def test_compact_views_unique():
+    compact = parse_ast(source_code, lang = "python", compact = True)
+    first   = compact.children[0]
+
+    assert compact.children[0] is first
+    assert first.parent is compact
+
+
+def test_compact_backend():
+    compact = parse_ast(source_code, lang = "python", compact = True)
+
+    for node in compact:
+        assert node.backend.type == node.type
+        assert tuple(node.backend.start_point) == node.position[0]
+
+
+def test_compact_edit_script():
+    source_ast = parse_ast(source_code, lang = "python")
+    target_ast = parse_ast(target_code, lang = "python")
+    expected   = compute_edit_script(source_ast, target_ast)
+
+    source_ast = parse_ast(source_code, lang = "python", compact = True)
+    target_ast = parse_ast(target_code, lang = "python", compact = True)
+    actual     = compute_edit_script(source_ast, target_ast)
+
+    assert repr(actual) == repr(expected)
+
+
+def test_compact_difference():
+    diff = cd.difference(source_code, target_code, lang = "python", compact = True)
+    assert diff.source_ast.type == diff.target_ast.type
@@ -0,0 +1,100 @@
+import code_diff as cd
+
+from code_diff.ast             import default_create_node
+from code_diff.sstubs          import pisomorph
+from code_diff.gumtree         import EditStats, NodeMapping, compute_edit_script
+from code_diff.gumtree.isomap  import _map_recursively
+from code_diff.gumtree.editmap import APTED_MAX_HEIGHT, _minimal_edit
+
+# Util --------------------------------------------------------------
+
+DEPTH = 10000
+
+
+def chain(num_terms, last = ""):
+    # Left nested binary operators: the depth grows with the number of terms
+    return "x = " + " + ".join("a%d" % i for i in range(num_terms)) + last + "\n"
+
+
+def recursive_sexp(node):
+    name = node.text if node.text is not None else node.type
+
+    child_sexp = []
+    for child in node.children:
+        text = ["  " + t for t in recursive_sexp(child).splitlines()]
+        child_sexp.append("\n".join(text))
+
+    if len(child_sexp) == 0: return name
+    return "%s {\n%s\n}" % (name, " ".join(child_sexp))
+
+
+def path_tree(depth, text = "x"):
+    node = default_create_node("leaf", [], text = text)
+    for _ in range(depth): node = default_create_node("node", [node])
+    return node
+
+
+# Tests --------------------------------------------------------------
+
+def test_deep_edit_script():
+    diff = cd.difference(chain(DEPTH), chain(DEPTH, " + b"), lang = "python")
+
+    assert diff.source_ast.subtree_height >= DEPTH
+    assert len(diff.edit_script()) > 0
+    assert len(diff.root_diff().edit_script()) > 0
+
+
+def test_deep_compare():
+    result = cd.compare(chain(DEPTH), chain(DEPTH, " + b"), lang = "python")
+    assert result.changed
+
+
+def test_deep_sexp():
+    # The output grows quadratically with the depth (indentation)
+    ast = cd.parse_ast(chain(3000), lang = "python")
+    text = ast.sexp()
+
+    assert text.startswith("module {")
+    assert text.count("binary_operator {") == 2999
+
+
+def test_sexp_equals_recursive():
+    ast = cd.parse_ast('def f(a):\n    """doc\n\n    string"""\n    return [a, (1, {2: "b"})]\n', lang = "python")
+    assert ast.sexp() == recursive_sexp(ast)
+
+    leaf = default_create_node("leaf", [], text = "a\r\nb")
+    tree = default_create_node("node", [default_create_node("leaf", [], text = ""), leaf, path_tree(3, "c\n")])
+    assert tree.sexp() == recursive_sexp(tree)
+
+
+def test_deep_map_recursively():
+    source, target = path_tree(DEPTH), path_tree(DEPTH)
+
+    mapping = NodeMapping()
+    _map_recursively(mapping, source, target)
+
+    assert len(mapping) == DEPTH + 1
+    assert mapping.dst_of(source.children[0].children[0]) is target.children[0].children[0]
+
+
+def test_deep_pisomorph():
+    source = cd.parse_ast("x = " + "(" * 2000 + "a" + ")" * 2000 + "\n", lang = "python")
+    target = cd.parse_ast("x = a\ny = b\n", lang = "python")
+
+    source_value = source.children[0].children[0].children[2]
+
+    assert source_value.type == "parenthesized_expression"
+    assert pisomorph(source_value, target.children[0].children[0].children[2])
+    assert not pisomorph(source_value, target.children[1].children[0].children[2])
+
+
+def test_apted_skips_deep_subtrees():
+    source = path_tree(APTED_MAX_HEIGHT + 1, "x")
+    target = path_tree(APTED_MAX_HEIGHT + 1, "y")
+
+    stats = EditStats()
+    assert list(_minimal_edit(NodeMapping(), source, target, max_size = 10 ** 6, stats = stats)) == []
+    assert stats["editmap.max_height_skips"] == 1
+
+    # Deep trees are still diffed (without APTED)
+    assert len(compute_edit_script(source, target)) > 0
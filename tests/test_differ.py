@@ -0,0 +1,92 @@
+import pytest
+
+import code_diff as cd
+
+from code_diff       import Differ, default_differ
+from code_diff.cache import ParseCache
+from code_diff.utils import TypeMatcher
+
+from code_tokenize.tokens import match_type
+
+# Tests --------------------------------------------------------------
+
+def test_type_matcher():
+    patterns = ["expression_statement", "*_statement", "if_*"]
+    matcher  = TypeMatcher(patterns)
+
+    for node_type in ["expression_statement", "return_statement", "if_clause", "identifier", "statement"]:
+        assert matcher(node_type) == any(match_type(p, node_type) for p in patterns)
+
+
+def test_type_matcher_unsupported():
+    with pytest.raises(ValueError):
+        TypeMatcher(["*_statement_*"])
+
+
+def test_differ_equals_difference():
+    source, target = "x = a + b", "x = a - b"
+    differ = Differ("python")
+
+    expected = cd.difference(source, target, lang = "python")
+    actual   = differ.difference(source, target)
+
+    assert repr(actual) == repr(expected)
+    assert repr(actual.edit_script()) == repr(expected.edit_script())
+    assert actual.is_single_statement == expected.is_single_statement
+
+
+def test_differ_reuses_parser():
+    differ = Differ("python")
+    differ.difference("x = 1", "x = 2")
+    parser = differ._parser
+
+    differ.difference("y = 1", "y = 2")
+    assert differ._parser is parser
+
+
+def test_differ_incremental():
+    source = "def test(a, b):\n    return a + b\n"
+    differ = Differ("python", incremental = True)
+
+    diff = differ.difference(source, source.replace("a + b", "a - b"))
+    assert repr(diff) == "+ -> -"
+
+
+def test_differ_cache():
+    cache  = ParseCache()
+    differ = Differ("python", cache = cache)
+
+    differ.difference("x = 1", "x = 2")
+    differ.difference("x = 1", "x = 3")
+
+    assert cache.stats.hits == 1
+
+
+def test_default_differ():
+    assert default_differ("python") is default_differ("python")
+    assert default_differ("python") is not default_differ("java")
+    assert default_differ("python") is not default_differ("python", compact = True)
+
+
+def test_default_differ_object_options():
+    # Sessions with object options are not shared (and not kept alive)
+    cache = ParseCache()
+
+    assert default_differ("python", cache = cache) is not default_differ("python", cache = cache)
+    assert default_differ("python", cache = cache).cache is cache
+    assert default_differ("python", cache = False) is default_differ("python", cache = False)
+
+
+def test_differ_compact_incremental():
+    with pytest.raises(ValueError):
+        Differ("python", compact = True, incremental = True)
+
+
+def test_differ_native():
+    source, target = "def test(a):\n    return a + 1\n", "def test(a):\n    return a - 1\n"
+
+    expected = Differ("python").difference(source, target)
+    actual   = Differ("python", native = True).difference(source, target)
+
+    assert repr(actual) == repr(expected)
+    assert repr(actual.edit_script()) == repr(expected.edit_script())
@@ -0,0 +1,65 @@
+import code_diff as cd
+
+from code_diff.gumtree import EditStats
+
+
+SOURCE = "def f(a, b):\n    x = a + b\n    return x\n"
+TARGET = "def f(a, b):\n    y = a + b\n    z = y * 2\n    return z\n"
+
+
+# Tests --------------------------------------------------------------
+
+def test_explain_attaches_stats():
+    diff = cd.difference(SOURCE, TARGET, lang = "python")
+
+    edit_script = diff.edit_script(explain = True)
+
+    assert repr(edit_script) == repr(diff.edit_script())
+    assert isinstance(edit_script.stats, EditStats)
+    assert edit_script.stats["isomap.levels"] > 0
+    assert edit_script.stats["editmap.apted"] > 0
+    assert edit_script.stats.maxima["editmap.apted"] > 0
+    assert edit_script.stats["chawathe.lcs"] > 0
+    assert edit_script.stats.maxima["chawathe.lcs"] > 0
+
+
+def test_explain_is_opt_in():
+    edit_script = cd.difference(SOURCE, TARGET, lang = "python").edit_script()
+    assert not hasattr(edit_script, "stats")
+
+
+def test_explain_max_size_skips():
+    diff  = cd.difference(SOURCE, TARGET, lang = "python")
+    stats = EditStats()
+
+    cd.compute_edit_script(diff.source_ast, diff.target_ast, max_size = 1, stats = stats)
+
+    assert stats["editmap.apted"] == 0
+    assert stats["editmap.max_size_skips"] > 0
+
+
+def test_explain_skips_editmap():
+    source_ast = cd.parse_ast("x = a + b\n", lang = "python")
+    target_ast = cd.parse_ast("x = a + b\n", lang = "python")
+
+    # Isomorphic trees
+    stats = EditStats()
+    assert len(cd.compute_edit_script(source_ast, target_ast, stats = stats)) == 0
+    assert stats["isomap.levels"] == 0
+
+    # Single leaf source
+    stats = EditStats()
+    edit_script = cd.compute_edit_script(source_ast.children[0].children[0].children[0], target_ast, stats = stats)
+    assert len(edit_script) > 0
+    assert stats["editmap.apted"] == 0
+
+
+def test_explain_per_region():
+    source = "x = a + b\ny = 1\nz = c\n"
+    target = "x = a + d\ny = 1\nz = e\n"
+
+    edit_script = cd.difference(source, target, lang = "python").edit_script(per_region = True, explain = True)
+
+    assert edit_script.stats["regions.lcs"] > 0
+    assert "regions.lcs" in edit_script.stats.report()
+    assert edit_script.stats.as_dict()["regions.lcs"] == edit_script.stats["regions.lcs"]
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+from code_diff.ast     import parse_ast
+from code_diff.hashing import Mix64Hash, LegacyStringHash, get_hash_engine, set_hash_engine, MASK64
+
+
+source_code = """
+def test(a, b):
+    x = a + b
+    y = a + b
+    return x * y
+"""
+
+# Tests --------------------------------------------------------------
+
+def test_mix64_deterministic():
+    engine = Mix64Hash()
+    assert engine("identifier", []) == Mix64Hash()("identifier", [])
+    assert 0 <= engine("module", [1, 2, 3]) <= MASK64
+
+
+def test_mix64_order_sensitive():
+    engine = Mix64Hash()
+    assert engine("binary_operator", [1, 2]) != engine("binary_operator", [2, 1])
+    assert engine("binary_operator", [1]) != engine("binary_operator", [1, 0])
+
+
+def test_mix64_seed():
+    assert Mix64Hash(seed = 1)("identifier", []) != Mix64Hash(seed = 2)("identifier", [])
+
+
+def test_isomorphic_subtrees():
+    ast = parse_ast(source_code, lang = "python")
+    block = ast.children[0].children[-1]
+
+    x_assign = block.children[0].children[0]
+    y_assign = block.children[1].children[0]
+
+    assert x_assign.children[2].isomorph(y_assign.children[2])
+    assert x_assign.subtree_hash != y_assign.subtree_hash
+
+
+def _hash_in_subprocess(hash_seed):
+    code = "from code_diff.ast import parse_ast; print(parse_ast(%r, lang = 'python').subtree_hash)" % source_code
+    env  = dict(os.environ, PYTHONHASHSEED = str(hash_seed))
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.check_output([sys.executable, "-c", code], env = env).strip()
+
+
+def test_stable_across_processes():
+    assert _hash_in_subprocess(1) == _hash_in_subprocess(2)
+
+
+def test_set_hash_engine():
+    previous = set_hash_engine(LegacyStringHash())
+    try:
+        legacy_hash = parse_ast(source_code, lang = "python").subtree_hash
+    finally:
+        set_hash_engine(previous)
+
+    assert get_hash_engine() is previous
+    assert legacy_hash != parse_ast(source_code, lang = "python").subtree_hash
@@ -0,0 +1,92 @@
+import code_diff as cd
+
+from code_diff.ast         import parse_ast
+from code_diff.incremental import parse_pair, TextEdit
+from code_diff             import incremental
+
+from tests.utils import assert_same_tree
+
+# Util --------------------------------------------------------------
+
+def assert_incremental(source_code, target_code, lang = "python"):
+    source_ast, target_ast = parse_pair(source_code, target_code, lang = lang)
+
+    assert_same_tree(parse_ast(source_code, lang = lang), source_ast, backend = True)
+    assert_same_tree(parse_ast(target_code, lang = lang), target_ast, backend = True)
+
+
+source_code = """
+def first(a, b):
+    # Comment
+    return a + b
+
+def second(x):
+    y = x * 2
+    return test.call("Hello World", y)
+
+def third():
+    return [1, 2, 3]
+"""
+
+# Tests --------------------------------------------------------------
+
+def test_text_edit():
+    edit = TextEdit.between(b"x = 1\ny = 2\n", b"x = 1\ny = 42\n")
+
+    assert edit.start_byte == 10
+    assert edit.old_end_byte == 10
+    assert edit.new_end_byte == 11
+    assert edit.start_point == (1, 4)
+
+
+def test_incremental_update_token():
+    assert_incremental(source_code, source_code.replace("x * 2", "x * 3"))
+
+
+def test_incremental_insert_statement():
+    assert_incremental(source_code, source_code.replace("    y = x * 2\n", "    y = x * 2\n    z = y\n"))
+
+
+def test_incremental_delete_function():
+    assert_incremental(source_code, source_code.replace("def third():\n    return [1, 2, 3]\n", ""))
+
+
+def test_incremental_prepend():
+    assert_incremental(source_code, "import test\n" + source_code)
+
+
+def test_incremental_non_ascii():
+    assert_incremental(source_code, source_code.replace("\"Hello World\"", "\"Hällo Wörld\""))
+
+
+def test_incremental_java():
+    source = "public class Test { int x = 1; int test() { return x + 1; } }"
+    assert_incremental(source, source.replace("x + 1", "x - 1"), lang = "java")
+
+
+def test_incremental_reuses_subtrees(monkeypatch):
+    created = []
+    create_node = incremental.default_create_node
+
+    def counting_create_node(*args, **kwargs):
+        node = create_node(*args, **kwargs)
+        created.append(node)
+        return node
+
+    target_code = source_code.replace("x * 2", "x * 3")
+
+    monkeypatch.setattr(incremental, "default_create_node", counting_create_node)
+    _, target = parse_pair(source_code, target_code, lang = "python")
+
+    # Only the nodes on the path to the edit are rebuilt
+    assert 0 < len(created) < target.subtree_weight // 2
+
+
+def test_incremental_difference():
+    target_code = source_code.replace("x * 2", "x * 3")
+
+    expected = cd.difference(source_code, target_code, lang = "python")
+    actual   = cd.difference(source_code, target_code, lang = "python", incremental = True)
+
+    assert repr(actual) == repr(expected)
+    assert repr(actual.edit_script()) == repr(expected.edit_script())
@@ -0,0 +1,84 @@
+import json
+
+import code_diff as cd
+
+from code_diff            import instrument, Recorder, add_listener, remove_listener
+from code_diff.instrument import span, _NULL_SPAN
+
+
+SOURCE = "def f(a, b):\n    x = a + b\n    return x\n"
+TARGET = "def f(a, b):\n    y = a + b\n    z = y * 2\n    return z\n"
+
+
+# Tests --------------------------------------------------------------
+
+def test_disabled_span_is_null():
+    assert span("parse") is _NULL_SPAN
+
+
+def test_instrument_stages():
+    differ = cd.Differ("python", cache = False)
+
+    with instrument() as recorder:
+        differ.difference(SOURCE, TARGET).edit_script()
+
+    stages = [s.stage for s in recorder.spans]
+
+    for stage in ["difference", "parse", "tree_sitter", "tokenize", "build_ast",
+                    "diff_search", "edit_script", "isomap", "editmap", "chawathe"]:
+        assert stage in stages
+
+    assert all(s.lang == "python" for s in recorder.spans)
+    assert all(s.duration >= 0 for s in recorder.spans)
+
+    # Spans are nested
+    parse = next(s for s in recorder.spans if s.stage == "parse")
+    assert parse.parent.stage == "difference"
+
+    build = next(s for s in recorder.spans if s.stage == "build_ast")
+    assert build.attrs["nodes"] > 0
+
+    # Listener is removed afterwards
+    assert span("parse") is _NULL_SPAN
+
+
+def test_instrument_callback():
+    events = []
+    add_listener(events.append)
+
+    try:
+        cd.difference("x = 1", "x = 2", lang = "python", cache = False).edit_script()
+    finally:
+        remove_listener(events.append)
+
+    assert "edit_script" in [s.stage for s in events]
+
+
+def test_recorder_exports():
+    recorder = Recorder()
+
+    with instrument(recorder):
+        cd.Differ("python", cache = False).difference(SOURCE, TARGET).edit_script()
+
+    summary = recorder.summary()
+    assert summary["difference"]["count"] == 1
+    assert summary["parse"]["count"] == 2
+    assert summary["parse"]["mean"] <= summary["parse"]["max"] + 1e-12
+
+    trace  = json.loads(json.dumps(recorder.chrome_trace()))
+    events = trace["traceEvents"]
+
+    assert len(events) == len(recorder.spans)
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    assert events[0]["args"]["lang"] == "python"
+
+
+def test_span_records_errors():
+    with instrument() as recorder:
+        try:
+            cd.Differ("python").difference("x = 1", "x = 1")
+        except ValueError:
+            pass
+
+    difference = next(s for s in recorder.spans if s.stage == "difference")
+    assert difference.attrs["error"] == "ValueError"
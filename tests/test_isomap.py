@@ -0,0 +1,303 @@
+import copy
+import itertools
+
+import pytest
+
+import code_diff as cd
+
+from code_diff.gumtree        import Delete, compute_edit_mapping, compute_edit_script
+from code_diff.gumtree.isomap import (gumtree_isomap, TopDownMatcher, HeightIndexedList, NodeMapping, NodeMultiMapping,
+                                        create_default_heuristic, _select_candidates, _score_candidates,
+                                        _index_iso_nodes, _map_recursively)
+from code_diff.gumtree.utils  import DiceIndex, VECTORIZE_MIN_TARGETS, subtree_dice, is_one_to_one
+
+
+SOURCE = """
+class A:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.z = x + y
+
+    def f(self):
+        return self.x + 1
+"""
+
+TARGET = """
+class A:
+    def __init__(self, x, y):
+        self.y = y
+        self.x = x
+        self.w = x + y
+
+    def g(self):
+        return self.x + 1
+
+    def f(self):
+        return self.y
+"""
+
+
+def pairwise_isomap(source_ast, target_ast, min_height = 1):
+    # Reference: compares all pairs of nodes on each height level
+    isomorphic_mapping, candidate_mapping = NodeMapping(), NodeMultiMapping()
+    source_index, target_index = _index_iso_nodes(source_ast), _index_iso_nodes(target_ast)
+    source_open, target_open = [source_ast], [target_ast]
+
+    def pop(open_nodes):
+        height = max(n.subtree_height for n in open_nodes)
+        level  = [n for n in open_nodes if n.subtree_height == height]
+        open_nodes[:] = [n for n in open_nodes if n.subtree_height != height]
+        return sorted(level, key = lambda n: n.subtree_hash)
+
+    def height(open_nodes):
+        return max((n.subtree_height for n in open_nodes), default = 0)
+
+    while max(height(source_open), height(target_open)) > min_height:
+        if height(source_open) != height(target_open):
+            side = source_open if height(source_open) > height(target_open) else target_open
+            for node in pop(side): side.extend(node.children)
+            continue
+
+        source_candidates, target_candidates = pop(source_open), pop(target_open)
+        matched = set()
+
+        for source_node, target_node in itertools.product(source_candidates, target_candidates):
+            if source_node.isomorph(target_node):
+                matched.update([source_node, target_node])
+                if source_index[source_node] > 1 or target_index[target_node] > 1:
+                    candidate_mapping.add(source_node, target_node)
+                else:
+                    _map_recursively(isomorphic_mapping, source_node, target_node)
+
+        for node in source_candidates:
+            if node not in matched: source_open.extend(node.children)
+
+        for node in target_candidates:
+            if node not in matched: target_open.extend(node.children)
+
+    heuristic = create_default_heuristic(isomorphic_mapping)
+    for source_node, target_node in _select_candidates(candidate_mapping, heuristic):
+        _map_recursively(isomorphic_mapping, source_node, target_node)
+
+    return isomorphic_mapping
+
+
+# Tests --------------------------------------------------------------
+
+def test_height_indexed_list():
+    ast  = cd.parse_ast("x = a + b\ny = [1, 2]\n", lang = "python")
+    open_nodes = HeightIndexedList(ast)
+
+    assert open_nodes.max() == ast.subtree_height
+    assert open_nodes.pop() == [ast]
+    assert open_nodes.max() == 0
+
+    open_nodes.open(ast)
+    level = open_nodes.pop()
+
+    assert all(n.subtree_height == max(c.subtree_height for c in ast.children) for n in level)
+    assert [n.subtree_hash for n in level] == sorted(n.subtree_hash for n in level)
+
+
+def test_isomap_equals_pairwise():
+    for compact in [False, True]:
+        source_ast = cd.parse_ast(SOURCE, lang = "python", compact = compact)
+        target_ast = cd.parse_ast(TARGET, lang = "python", compact = compact)
+
+        for min_height in [0, 1, 2]:
+            expected = set(pairwise_isomap(source_ast, target_ast, min_height))
+            actual   = set(gumtree_isomap(source_ast, target_ast, min_height))
+
+            assert actual == expected
+            assert len(actual) > 0
+
+
+def test_matcher_resumes_descent():
+    source_ast = cd.parse_ast("foo(a, b)\n", lang = "python")
+    target_ast = cd.parse_ast("bar(c, d)\n", lang = "python")
+
+    matcher = TopDownMatcher(source_ast, target_ast)
+
+    assert len(matcher.match(2)) == 0
+    assert len(matcher.match(1)) == 0
+
+    mapping = matcher.match(0)
+    assert len(mapping) > 0
+    assert set(mapping) == set(gumtree_isomap(source_ast, target_ast, 0))
+
+
+def test_isomap_repeated_subtrees():
+    source = "\n".join("self.a%d = a%d" % (i % 3, i % 3) for i in range(30)) + "\n"
+    target = "\n".join("self.a%d = a%d" % (i % 4, i % 4) for i in range(31)) + "\n"
+
+    source_ast = cd.parse_ast(source, lang = "python")
+    target_ast = cd.parse_ast(target, lang = "python")
+
+    assert set(gumtree_isomap(source_ast, target_ast)) == set(pairwise_isomap(source_ast, target_ast))
+
+
+def _boilerplate(n, k):
+    return "\n".join("def f%d(self, a, b):\n    self.a = a\n    self.b = b\n" % (i % k) for i in range(n)) + "\n"
+
+
+def test_dice_index_equals_subtree_dice():
+    source_ast = cd.parse_ast(_boilerplate(12, 3), lang = "python")
+    target_ast = cd.parse_ast(_boilerplate(14, 4), lang = "python")
+
+    mapping = NodeMapping()
+    for source_node, target_node in zip(source_ast.children, target_ast.children):
+        if source_node.isomorph(target_node): _map_recursively(mapping, source_node, target_node)
+
+    assert is_one_to_one(mapping)
+
+    dice_index   = DiceIndex(mapping)
+    target_nodes = list(target_ast)
+
+    for source_node in [source_ast, source_ast.children[0], source_ast.children[5]]:
+        expected = [subtree_dice(source_node, t, mapping) for t in target_nodes]
+        assert dice_index.dice(source_node, target_nodes) == expected
+
+
+def test_dice_index_vectorized():
+    pytest.importorskip("numpy")
+
+    source_ast = cd.parse_ast(_boilerplate(12, 3), lang = "python")
+    target_ast = cd.parse_ast(_boilerplate(14, 4), lang = "python")
+
+    mapping = NodeMapping()
+    for source_node, target_node in zip(source_ast.children, target_ast.children):
+        if source_node.isomorph(target_node): _map_recursively(mapping, source_node, target_node)
+
+    target_nodes = list(target_ast)
+    assert len(target_nodes) >= VECTORIZE_MIN_TARGETS
+
+    expected = [subtree_dice(source_ast, t, mapping) for t in target_nodes]
+    assert DiceIndex(mapping).dice(source_ast, target_nodes) == expected
+
+
+def test_select_candidates_equals_sorted_selection():
+    source_ast = cd.parse_ast(_boilerplate(10, 2), lang = "python")
+    target_ast = cd.parse_ast(_boilerplate(11, 3), lang = "python")
+
+    candidates = NodeMultiMapping()
+    for source_node, target_node in itertools.product(source_ast.children, target_ast.children):
+        if source_node.isomorph(target_node): candidates.add(source_node, target_node)
+
+    heuristic = create_default_heuristic(NodeMapping())
+    pairs = sorted(candidates, key = lambda p: heuristic(*p), reverse = True)
+
+    expected, source_seen, target_seen = [], set(), set()
+    for source_node, target_node in pairs:
+        if source_node in source_seen: continue
+        source_seen.add(source_node)
+        if target_node in target_seen: continue
+        target_seen.add(target_node)
+        expected.append((source_node, target_node))
+
+    assert list(_select_candidates(candidates, heuristic)) == expected
+    assert list(_select_candidates(candidates, scores = _score_candidates(candidates, NodeMapping()))) == expected
+
+
+def test_node_mapping_one_to_one():
+    source_ast = cd.parse_ast("x = a + b\n", lang = "python")
+    target_ast = cd.parse_ast("x = b + a\n", lang = "python")
+
+    mapping = NodeMapping()
+    mapping.add(source_ast, target_ast)
+    mapping.add(source_ast, target_ast.children[0])  # source is already mapped
+
+    assert len(mapping) == 1
+    assert mapping.dst_of(source_ast) is target_ast
+    assert mapping.src_of(target_ast) is source_ast
+    assert mapping.src_of(target_ast.children[0]) is None
+
+    assert mapping.is_mapped(source_ast) and mapping.is_mapped(dst = target_ast)
+    assert mapping.is_mapped(source_ast, target_ast)
+    assert not mapping.is_mapped(source_ast.children[0])
+
+    # Tuple access of the previous mapping
+    assert (source_ast, None) in mapping and (None, target_ast.children[0]) not in mapping
+    assert list(mapping[source_ast, None]) == [(source_ast, target_ast)]
+    assert len(mapping) == 1
+
+    copied = copy.copy(mapping)
+    copied.add(source_ast.children[0], target_ast.children[0])
+    assert len(copied) == 2 and len(mapping) == 1
+
+
+def test_node_mapping_replace():
+    source_ast = cd.parse_ast("x = a + b\n", lang = "python")
+    target_ast = cd.parse_ast("x = b + a\n", lang = "python")
+
+    mapping = NodeMapping()
+    mapping.add(source_ast, target_ast)
+    mapping.add(source_ast.children[0], target_ast.children[0])
+
+    # Both previous partners become unmapped
+    mapping.replace(source_ast, target_ast.children[0])
+
+    assert len(mapping) == 1
+    assert mapping.dst_of(source_ast) is target_ast.children[0]
+    assert mapping.src_of(target_ast.children[0]) is source_ast
+    assert not mapping.is_mapped(dst = target_ast)
+    assert not mapping.is_mapped(source_ast.children[0])
+
+
+@pytest.mark.parametrize("source, target, expected_length", [
+    ('def to_json(self):\n    output = {"type": self.type, "text": self.text}\n    return output\n',
+     'def to_json(self):\n    output = {"type": self.type, "text": self.output.text}\n    return output\n', 5),
+    ("def __init__(self, src, delegate):\n    self.src = src\n    self.delegate = delegate\n",
+     "def __init__(self, src, delegate):\n    self.src = src\n    self.delegate = (delegate + 1)\n", 7),
+    ("def f(source_ast, target_ast):\n    attribute = target_ast.children[0]\n    return attribute\n",
+     "def f(source_ast, target_ast):\n    attribute = (target_ast + 1).children[0]\n    return attribute\n", 7),
+    ('def f(A, B):\n    if A.type == "parenthesized_expression":\n        A = A.children[1]\n',
+     'def f(A, B):\n    if A.parenthesized_expression.type == "parenthesized_expression":\n        A = A.children[1]\n', 5),
+])
+def test_edit_script_length(source, target, expected_length):
+    # Lengths of the edit scripts computed with the previous (set based) mapping
+    assert len(cd.difference(source, target, lang = "python").edit_script()) == expected_length
+
+
+@pytest.mark.parametrize("source, target", [
+    ("y = x.y.z\n", "y = x.y\n"),
+    ("y = x.y\n", "y = x.y.z\n"),
+    ("y = foo(a)(1)\n", "y = foo(a)\n"),
+])
+def test_editmap_maps_roots(source, target):
+    # The root of one side is isomorphic to a subtree of the other side
+    diff    = cd.difference(source, target, lang = "python")
+    mapping = compute_edit_mapping(diff.source_ast, diff.target_ast)
+
+    assert mapping.dst_of(diff.source_ast) is diff.target_ast
+
+    for operation in diff.edit_script():
+        if isinstance(operation, Delete):
+            assert operation.target_node.position != diff.source_ast.position
+
+
+def test_leaf_to_subtree_maps_roots():
+    source_ast = cd.parse_ast("y = x\n", lang = "python")
+    target_ast = cd.parse_ast("y = foo(x)\n", lang = "python")
+
+    leaf    = source_ast.children[0].children[0].children[2]
+    subtree = target_ast.children[0].children[0].children[2]
+
+    for source, target in [(leaf, subtree), (subtree, leaf)]:
+        mapping = compute_edit_mapping(source, target)
+        assert mapping.dst_of(source) is target
+
+        # No operation is anchored to the fake root of chawathe
+        edit_script = compute_edit_script(source, target)
+        assert len(edit_script) > 0
+        assert all(getattr(operation.target_node, "type", None) != "root" for operation in edit_script)
+
+
+def test_isomap_is_one_to_one():
+    source_ast = cd.parse_ast(_boilerplate(10, 2), lang = "python")
+    target_ast = cd.parse_ast(_boilerplate(11, 3), lang = "python")
+
+    mapping = gumtree_isomap(source_ast, target_ast)
+
+    assert isinstance(mapping, NodeMapping)
+    assert all(mapping.src_of(target_node) is source_node for source_node, target_node in mapping)
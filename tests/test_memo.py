@@ -0,0 +1,67 @@
+import code_diff as cd
+
+from code_diff.memo    import DiffMemo
+from code_diff.gumtree import compute_edit_script
+
+
+SOURCE = "def f(a, b):\n    x = a + b\n    y = x * 2\n    return y\n"
+TARGET = "def f(a, b):\n    x = a + c\n    y = x * 2\n    return y\n"
+
+
+# Tests --------------------------------------------------------------
+
+def test_memo_bounded():
+    memo = DiffMemo(max_entries = 2)
+
+    for i in range(5): memo.get(i, lambda: i)
+
+    assert len(memo) == 2
+    assert memo.get(4, lambda: None) == 4 and memo.hits == 1
+
+
+def test_levels_share_memo():
+    diff = cd.difference(SOURCE, TARGET, lang = "python")
+
+    statement_diff, root_diff = diff.statement_diff(), diff.root_diff()
+    assert statement_diff.memo is diff.memo and root_diff.memo is diff.memo
+
+
+def test_memoized_scripts_are_equal():
+    diff = cd.difference(SOURCE, TARGET, lang = "python")
+
+    first  = diff.root_diff().edit_script()
+    misses = diff.memo.misses
+    second = diff.root_diff().edit_script()
+
+    assert repr(first) == repr(second)
+    assert first is not second
+    assert diff.memo.misses == misses
+
+    # Scripts equal the uncached computation
+    root = diff.root_diff()
+    assert repr(first) == repr(compute_edit_script(root.source_ast, root.target_ast))
+
+
+def test_reuse_root_mapping():
+    diff = cd.difference(SOURCE, TARGET, lang = "python")
+
+    root_script = diff.root_diff().edit_script()
+
+    statement_script = diff.statement_diff().edit_script(reuse_root = True)
+    minimal_script   = diff.edit_script(reuse_root = True)
+
+    # Only the root mapping was computed
+    assert sum(key[0] == "mapping" for key in diff.memo._entries) == 1
+
+    assert repr(statement_script) == repr(diff.statement_diff().edit_script())
+    assert repr(minimal_script) == repr(diff.edit_script())
+    assert repr(root_script) == repr(diff.root_diff().edit_script(reuse_root = True))
+
+
+def test_reuse_root_insertion():
+    source = "x = 1\ny = foo(a)\n"
+    target = "x = 1\ny = foo(a, b)\n"
+
+    diff = cd.difference(source, target, lang = "python")
+
+    assert len(diff.edit_script(reuse_root = True)) == len(diff.edit_script())
@@ -0,0 +1,142 @@
+import code_diff as cd
+
+from code_diff           import Differ, WindowDiff
+from code_diff.prefilter import changed_window
+
+# Util --------------------------------------------------------------
+
+def module(num_functions):
+    return "".join(
+        "@decorator\n"
+        "def function_%d(a, b):\n"
+        "    x = a + %d\n"
+        "    if x > b:\n"
+        "        return x\n"
+        "    else:\n"
+        "        return b\n\n" % (i, i)
+        for i in range(num_functions)
+    )
+
+
+def assert_prefiltered(source, target, compact = False):
+    expected = Differ("python", compact = compact).difference(source, target)
+    actual   = Differ("python", compact = compact, prefilter = True).difference(source, target)
+
+    assert isinstance(actual, WindowDiff)
+    assert repr(actual) == repr(expected)
+    assert actual.source_ast.position == expected.source_ast.position
+    assert actual.target_ast.position == expected.target_ast.position
+    assert repr(actual.edit_script()) == repr(expected.edit_script())
+    assert actual.source_code == expected.source_code
+
+    return actual
+
+
+def assert_fallback(source, target):
+    expected = Differ("python").difference(source, target)
+    actual   = Differ("python", prefilter = True).difference(source, target)
+
+    assert not isinstance(actual, WindowDiff)
+    assert repr(actual) == repr(expected)
+
+
+source_code = module(50)
+
+# Tests --------------------------------------------------------------
+
+def test_window():
+    window = changed_window(source_code, source_code.replace("a + 20", "a + 21"))
+
+    assert window.start == 20 * 8
+    assert window.source_code.startswith("@decorator\ndef function_20")
+    assert window.source_code.count("def ") == 1
+
+
+def test_window_line_continuation():
+    source = source_code + "x = 1 + \\\n2\n\n" + source_code
+    window = changed_window(source, source.replace("\n2\n", "\n3\n"))
+
+    assert window.source_code.startswith("x = 1 + \\\n2\n")
+
+
+def test_window_open_brackets():
+    source = source_code + "x = [\n1,\n2,\n]\n\n" + source_code
+    window = changed_window(source, source.replace("\n2,\n", "\n3,\n"))
+
+    assert window.source_code.startswith("x = [\n1,\n2,\n]\n")
+
+
+def test_window_identical():
+    assert changed_window(source_code, source_code) is None
+
+
+def test_prefilter_update():
+    assert_prefiltered(source_code, source_code.replace("a + 20", "a + 21"))
+
+
+def test_prefilter_compact():
+    assert_prefiltered(source_code, source_code.replace("a + 20", "a + 21"), compact = True)
+
+
+def test_prefilter_else_branch():
+    target_code = source_code.replace("function_20(a, b):\n    x = a + 20\n    if x > b:\n        return x\n    else:\n        return b",
+                                        "function_20(a, b):\n    x = a + 20\n    if x > b:\n        return x\n    else:\n        return a")
+    assert_prefiltered(source_code, target_code)
+
+
+def test_prefilter_insert_statement():
+    diff = assert_prefiltered(source_code, source_code.replace("    x = a + 20\n", "    x = a + 20\n    y = x\n"))
+
+    assert diff.statement_diff().source_ast.type == "function_definition"
+    assert diff.root_diff().source_ast.type == "module"
+    assert diff.root_diff().source_ast.position == ((0, 0), (400, 0))
+
+
+def test_prefilter_top_level_fallback():
+    # Inserted function only changes the module
+    assert_fallback(source_code, source_code.replace("@decorator\ndef function_20", "x = 1\n\n@decorator\ndef function_20"))
+
+
+def test_prefilter_type_change_fallback():
+    # The edit script of if -> while is computed in the module
+    source = module(10) + "if x > 1:\n    y = 2\n\n" + module(10)
+    target = source.replace("if x > 1:", "while x > 1:")
+
+    assert_fallback(source, target)
+
+    expected = Differ("python").difference(source, target)
+    actual   = Differ("python", prefilter = True).difference(source, target)
+    assert repr(actual.edit_script()) == repr(expected.edit_script())
+
+
+def test_prefilter_line_continuation():
+    source = module(10) + "x = 1 + \\\n2\n\n" + module(10)
+    target = source.replace("\n2\n", "\n3\n")
+
+    expected = Differ("python").difference(source, target).statement_diff()
+    actual   = assert_prefiltered(source, target).statement_diff()
+
+    assert repr(actual) == repr(expected)
+    assert actual.source_ast.position == expected.source_ast.position
+
+
+def test_prefilter_inside_string():
+    # The window starts at the statement of the multi-line string
+    source = "x = '''\ndef inner():\n    pass\n'''\n" + source_code
+    target = source.replace("    pass\n", "    return 1\n")
+
+    assert changed_window(source, target).start == 0
+    assert_prefiltered(source, target)
+
+
+def test_prefilter_syntax_error_fallback():
+    assert_fallback(source_code, source_code.replace("x = a + 20", "x = a +* 20"))
+
+
+def test_prefilter_difference():
+    target_code = source_code.replace("a + 20", "a + 21")
+
+    expected = cd.difference(source_code, target_code, lang = "python")
+    actual   = cd.difference(source_code, target_code, lang = "python", prefilter = True)
+
+    assert repr(actual) == repr(expected)
@@ -0,0 +1,83 @@
+import code_diff as cd
+
+from code_diff.gumtree import Update, Insert
+
+# Util --------------------------------------------------------------
+
+source_code = """
+def first(a, b):
+    return a + b
+
+def second(x):
+    y = x * 2
+    return y
+
+def third():
+    return [1, 2, 3]
+"""
+
+# Tests --------------------------------------------------------------
+
+def test_single_region():
+    regions = cd.diff_regions(source_code, source_code.replace("x * 2", "x * 3"), lang = "python")
+
+    assert len(regions) == 1
+    assert repr(regions[0]) == "2 -> 3"
+
+
+def test_identical():
+    assert cd.diff_regions(source_code, source_code, lang = "python") == []
+
+
+def test_distant_regions():
+    target_code = source_code.replace("a + b", "a + c").replace("[1, 2, 3]", "[1, 2, 4]")
+    regions = cd.diff_regions(source_code, target_code, lang = "python")
+
+    assert [repr(r) for r in regions] == ["b -> c", "3 -> 4"]
+
+    # The difference covers both regions
+    diff = cd.difference(source_code, target_code, lang = "python")
+    assert diff.source_ast.type == "module"
+
+
+def test_regions_with_insertion():
+    target_code = source_code.replace("    y = x * 2\n", "    y = x * 2\n    z = y\n")
+    target_code = target_code.replace("a + b", "a + c")
+
+    regions = cd.diff_regions(source_code, target_code, lang = "python")
+
+    assert len(regions) == 2
+    assert repr(regions[0]) == "b -> c"
+    assert regions[1].source_ast.type == "block"
+
+
+def test_regions_with_inserted_function():
+    target_code = source_code.replace("def third", "def inserted():\n    pass\n\ndef third")
+    target_code = target_code.replace("[1, 2, 3]", "[1, 2, 4]")
+
+    regions = cd.diff_regions(source_code, target_code, lang = "python")
+
+    # The insertion can only be attributed to the module
+    assert len(regions) == 1
+    assert regions[0].source_ast.type == "module"
+
+
+def test_stitched_edit_script():
+    target_code = source_code.replace("a + b", "a + c").replace("[1, 2, 3]", "[1, 2, 4]")
+    diff = cd.difference(source_code, target_code, lang = "python")
+
+    script = diff.edit_script(per_region = True)
+
+    assert len(script) == 2
+    assert all(isinstance(op, Update) for op in script)
+    assert [op.value for op in script] == ["c", "4"]
+
+
+def test_stitched_edit_script_insert():
+    target_code = source_code.replace("    y = x * 2\n", "    y = x * 2\n    z = y\n")
+    target_code = target_code.replace("a + b", "a + c")
+
+    script = cd.difference(source_code, target_code, lang = "python").edit_script(per_region = True)
+
+    assert isinstance(script[0], Update)
+    assert any(isinstance(op, Insert) for op in script[1:])
@@ -0,0 +1,84 @@
+import code_diff as cd
+
+from code_diff           import parent_statement, is_single_statement
+from code_diff.ast       import parse_ast
+from code_diff.traversal import bfs
+
+from code_tokenize.tokens import match_type
+
+# Util --------------------------------------------------------------
+
+STATEMENT_TYPES = ["*_statement", "*_definition"]
+
+
+def is_statement(node):
+    return any(match_type(p, node.type) for p in STATEMENT_TYPES)
+
+
+def naive_parent_statement(node):
+    while node is not None and not is_statement(node):
+        node = node.parent
+    return node
+
+
+def naive_is_single_statement(node):
+    if naive_parent_statement(node) is None: return False
+    return not any(is_statement(n) for n in bfs(node) if n is not node)
+
+
+source_code = """
+import os
+
+def test(a, b):
+    if a > b:
+        return [a, b]
+    x = test(b, a)
+    return x
+
+class Test:
+    def method(self):
+        pass
+"""
+
+# Tests --------------------------------------------------------------
+
+def test_parent_statement():
+    ast = parse_ast(source_code, lang = "python")
+
+    for node in bfs(ast):
+        assert parent_statement(STATEMENT_TYPES, node) is naive_parent_statement(node)
+
+
+def test_is_single_statement():
+    ast = parse_ast(source_code, lang = "python")
+
+    for node in bfs(ast):
+        assert is_single_statement(STATEMENT_TYPES, node) == naive_is_single_statement(node)
+
+
+def test_statement_compact():
+    ast = parse_ast(source_code, lang = "python", compact = True)
+
+    for node in bfs(ast):
+        assert parent_statement(STATEMENT_TYPES, node) is naive_parent_statement(node)
+
+
+def test_statement_diff():
+    diff = cd.difference(source_code, source_code.replace("test(b, a)", "test(a, b)"), lang = "python")
+
+    assert diff.is_single_statement
+    assert diff.statement_diff().source_ast.type == "expression_statement"
+    assert diff.statement_diff().is_single_statement
+
+
+def test_statement_queries_are_local():
+    ast = parse_ast(source_code, lang = "python")
+
+    function, class_definition = ast.children[1], ast.children[2]
+    leaf = function.children[-1].children[0].children[0]
+
+    assert parent_statement(STATEMENT_TYPES, leaf).type == "if_statement"
+    assert not is_single_statement(STATEMENT_TYPES, function)
+
+    # Only the queried nodes and their ancestors are annotated
+    assert all(not hasattr(node, "_statement_info") for node in bfs(class_definition))
@@ -0,0 +1,157 @@
+import struct
+
+import pytest
+
+import code_diff as cd
+
+from code_diff.ast     import ASTNode, parse_ast
+from code_diff.cache   import ParseCache
+from code_diff.compact import CompactNode
+from code_diff.hashing import set_hash_engine, LegacyStringHash
+from code_diff.store   import dumps, loads, DirectoryStore, SQLiteStore, StaleFormatError, store_key
+from code_diff         import cache as cache_module
+
+from tests.utils import assert_same_tree
+
+source_code = """
+def test(a, b):
+    # Comment
+    return a + b * "Hällo Wörld"
+"""
+
+# Tests --------------------------------------------------------------
+
+def test_roundtrip():
+    ast = parse_ast(source_code, lang = "python")
+    assert_same_tree(ast, loads(dumps(ast)))
+
+
+def test_roundtrip_compact():
+    ast = parse_ast(source_code, lang = "python", compact = True)
+    assert_same_tree(ast, loads(dumps(ast)))
+
+
+def test_reject_version():
+    data = bytearray(dumps(parse_ast(source_code, lang = "python")))
+    struct.pack_into("<I", data, 8, 0)
+
+    with pytest.raises(StaleFormatError):
+        loads(bytes(data))
+
+
+def test_reject_hash_engine():
+    data = dumps(parse_ast(source_code, lang = "python"))
+
+    previous = set_hash_engine(LegacyStringHash())
+    try:
+        with pytest.raises(StaleFormatError):
+            loads(data)
+    finally:
+        set_hash_engine(previous)
+
+
+def test_store_key_contains_hash_engine():
+    key = store_key(source_code, "python")
+
+    previous = set_hash_engine(LegacyStringHash())
+    try:
+        assert store_key(source_code, "python") != key
+    finally:
+        set_hash_engine(previous)
+
+
+def test_directory_store(tmp_path):
+    store = DirectoryStore(str(tmp_path))
+    key   = store_key(source_code, "python")
+    ast   = parse_ast(source_code, lang = "python")
+
+    assert store.get(key) is None
+    store.put(key, ast)
+
+    assert key in store
+    assert_same_tree(ast, store.get(key))
+
+
+def test_directory_store_removes_invalid(tmp_path):
+    store = DirectoryStore(str(tmp_path))
+    key   = store_key(source_code, "python")
+    store.put(key, parse_ast(source_code, lang = "python"))
+
+    with open(store._file_path(key), "wb") as f: f.write(b"invalid")
+
+    assert store.get(key) is None
+    assert key not in store
+
+
+def test_sqlite_store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "asts.db"))
+    key   = store_key(source_code, "python")
+    ast   = parse_ast(source_code, lang = "python")
+
+    store.put(key, ast)
+    assert_same_tree(ast, store.get(key))
+
+    store.close()
+
+
+def test_cache_loads_from_store(tmp_path, monkeypatch):
+    ParseCache(store = DirectoryStore(str(tmp_path))).parse(source_code, lang = "python")
+
+    # A new process would start with an empty in-memory cache
+    def fail_parse(*args, **kwargs): raise AssertionError("Parsed although stored")
+    monkeypatch.setattr(cache_module, "parse_ast", fail_parse)
+
+    cache = ParseCache(store = DirectoryStore(str(tmp_path)))
+    ast   = cache.parse(source_code, lang = "python", compact = True)
+
+    assert cache.stats.loads == 1
+    monkeypatch.undo()
+    assert_same_tree(parse_ast(source_code, lang = "python"), ast)
+
+
+def test_cache_materializes_stored_ast_on_request(tmp_path):
+    ParseCache(store = DirectoryStore(str(tmp_path))).parse(source_code, lang = "python")
+
+    cache = ParseCache(store = DirectoryStore(str(tmp_path)))
+    ast   = cache.parse(source_code, lang = "python")
+
+    entry = cache.get(cache.cache_key(source_code, "python"))
+    assert isinstance(entry.ast, CompactNode)
+    assert isinstance(ast, ASTNode)
+    assert_same_tree(parse_ast(source_code, lang = "python"), ast)
+
+
+def test_difference_with_store(tmp_path):
+    target_code = source_code.replace("a + b", "a - b")
+    expected    = cd.difference(source_code, target_code, lang = "python")
+
+    for _ in range(2):
+        cd.enable_parse_cache(store = DirectoryStore(str(tmp_path)))
+        try:
+            actual = cd.difference(source_code, target_code, lang = "python")
+        finally:
+            cd.disable_parse_cache()
+
+        assert repr(actual) == repr(expected)
+        assert repr(actual.edit_script()) == repr(expected.edit_script())
+
+
+def test_sstub_pattern_with_store(tmp_path):
+    pairs = [
+        ("x = foo(a)\n", "x = bar(a)\n"),
+        ("x = obj.foo(a)\n", "x = obj.bar(a)\n"),
+        ("x = obj.foo(a)\n", "x = other.foo(a)\n"),
+        ("if a and b:\n    pass\n", "if a and c:\n    pass\n"),
+    ]
+    expected = [cd.difference(s, t, lang = "python").sstub_pattern() for s, t in pairs]
+
+    for _ in range(2):
+        cd.enable_parse_cache(store = DirectoryStore(str(tmp_path)))
+        try:
+            actual  = [cd.difference(s, t, lang = "python").sstub_pattern() for s, t in pairs]
+            batched = [result.value for result in cd.difference_many(pairs, lang = "python", output = "sstub")]
+        finally:
+            cd.disable_parse_cache()
+
+        assert actual == expected
+        assert batched == [pattern.name for pattern in expected]
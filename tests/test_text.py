@@ -0,0 +1,82 @@
+import os
+
+import code_diff as cd
+
+from code_diff     import tokenize_tree
+from code_diff.ast import parse_ast, default_create_node
+
+# Util --------------------------------------------------------------
+
+def recursive_tokenize(ast):
+    tokens = []
+    if ast.text: tokens.append(ast.text)
+
+    for child in ast.children:
+        tokens.append(recursive_tokenize(child))
+
+    return " ".join(tokens)
+
+
+source_code = """
+def test(a, b):
+    # Comment
+    return a + b * "Hällo"
+"""
+
+# Tests --------------------------------------------------------------
+
+def test_tokenize_tree():
+    package_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "code_diff")
+
+    with open(os.path.join(package_dir, "ast.py"), "r") as f:
+        ast = parse_ast(f.read(), lang = "python")
+
+    assert tokenize_tree(ast) == recursive_tokenize(ast)
+
+
+def test_tokenize_empty_inner_nodes():
+    ast = default_create_node("a", [default_create_node("b", []), default_create_node("c", [], text = "x")])
+    assert tokenize_tree(ast) == recursive_tokenize(ast)
+
+
+def test_tokenize_deep_tree():
+    ast = default_create_node("leaf", [], text = "x")
+    for _ in range(5000):
+        ast = default_create_node("node", [ast], text = "y")
+
+    assert tokenize_tree(ast) == " ".join(["y"] * 5000 + ["x"])
+
+
+def test_tokenize_max_length():
+    ast = parse_ast(source_code, lang = "python")
+    assert tokenize_tree(ast, max_length = 10) == recursive_tokenize(ast)[:10] + "..."
+
+
+def test_source_span():
+    target_code = source_code.replace("a + b", "a + c")
+    diff = cd.difference(source_code, target_code, lang = "python")
+
+    assert diff.source_code == "b"
+    assert diff.target_code == "c"
+    assert isinstance(diff.source_span, memoryview)
+
+    root = diff.root_diff()
+    assert root.source_code == source_code.lstrip("\n")
+
+
+def test_source_span_non_ascii():
+    target_code = source_code.replace("Hällo", "Hallö")
+    diff = cd.difference(source_code, target_code, lang = "python")
+
+    assert diff.source_code == "\"Hällo\""
+    assert diff.target_code == "\"Hallö\""
+
+
+def test_source_span_cached():
+    cd.enable_parse_cache()
+    try:
+        for _ in range(2):
+            diff = cd.difference(source_code, source_code.replace("a + b", "a + c"), lang = "python")
+            assert diff.statement_diff().source_code == "return a + b * \"Hällo\""
+    finally:
+        cd.disable_parse_cache()
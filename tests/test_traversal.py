@@ -0,0 +1,89 @@
+from code_diff.ast       import parse_ast
+from code_diff.traversal import bfs, level_order, preorder, postorder, traversal_index
+from code_diff.traversal import depth, descendants, descendant_range, is_ancestor
+
+# Util --------------------------------------------------------------
+
+def recursive_preorder(node):
+    yield node
+    for child in node.children: yield from recursive_preorder(child)
+
+
+def recursive_postorder(node):
+    for child in node.children: yield from recursive_postorder(child)
+    yield node
+
+
+ast = parse_ast("""
+def test(a, b):
+    if a > b:
+        return [a, b]
+    return test(b, a)
+""", lang = "python")
+
+# Tests --------------------------------------------------------------
+
+def test_preorder():
+    assert list(preorder(ast)) == list(recursive_preorder(ast))
+
+
+def test_postorder():
+    assert list(postorder(ast)) == list(recursive_postorder(ast))
+
+
+def test_bfs():
+    nodes = list(bfs(ast))
+
+    assert len(nodes) == ast.subtree_weight
+    assert nodes[0] is ast
+    assert nodes[1:len(ast.children) + 1] == ast.children
+
+
+def test_level_order():
+    levels = list(level_order(ast))
+
+    assert len(levels) == ast.subtree_height
+    assert [n for level in levels for n in level] == list(bfs(ast))
+
+
+def test_traversal_index_is_cached():
+    index = traversal_index(ast)
+
+    assert index is traversal_index(ast)
+    assert index.preorder  == list(recursive_preorder(ast))
+    assert index.postorder == list(recursive_postorder(ast))
+
+
+def test_traversal_compact():
+    compact = parse_ast("x = [1, 2, f(3)]", lang = "python", compact = True)
+    assert [n.type for n in postorder(compact)] == [n.type for n in recursive_postorder(compact)]
+
+
+def test_descendants():
+    for node in bfs(ast):
+        assert descendants(node) == list(recursive_preorder(node))[1:]
+
+        start, end = descendant_range(node)
+        assert end - start == node.subtree_weight - 1
+
+
+def test_depth():
+    assert depth(ast) == 0
+
+    for node in bfs(ast):
+        for child in node.children:
+            assert depth(child) == depth(node) + 1
+
+
+def test_is_ancestor():
+    nodes = list(bfs(ast))
+
+    for a in nodes:
+        expected = set(descendants(a))
+        for b in nodes:
+            assert is_ancestor(a, b) == (b in expected)
+
+
+def test_is_ancestor_other_tree():
+    other = parse_ast("x = 1", lang = "python")
+    assert not is_ancestor(ast, other.children[0])
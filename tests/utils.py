@@ -0,0 +1,31 @@
+# Test utils --------------------------------------------------------------
+
+def assert_same_tree(expected, actual, backend = False, same_backend = False):
+    """
+    Asserts that both ASTs have the same structure, labels, positions and subtree metrics
+
+    Parent relations of the actual AST are checked, too. If backend is set,
+    the backend nodes have to be of the same type. If same_backend is set,
+    they have to be identical.
+    """
+    if expected is None:
+        assert actual is None
+        return
+
+    stack = [(expected, actual)]
+    while len(stack) > 0:
+        a, b = stack.pop()
+
+        assert a.type == b.type
+        assert a.text == b.text
+        assert tuple(map(tuple, a.position)) == tuple(map(tuple, b.position))
+        if backend or same_backend: assert a.backend.type == b.backend.type
+        if same_backend: assert a.backend == b.backend
+        assert a.subtree_hash   == b.subtree_hash
+        assert a.subtree_height == b.subtree_height
+        assert a.subtree_weight == b.subtree_weight
+        assert len(a.children)  == len(b.children)
+
+        for c in b.children: assert c.parent is b
+
+        stack.extend(zip(a.children, b.children))